@@ -0,0 +1,213 @@
+"""
+Attendance analytics for Academia AI Backend
+Maintains daily, weekly and monthly attendance rollups per course, per
+student and per status so that chart queries never scan raw attendance rows.
+"""
+
+from datetime import date, datetime, timedelta
+
+import maintenance
+import partitions
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Rollup scopes; 'all' rows use scope_id 0
+SCOPES = ('all', 'course', 'student')
+
+# Default number of buckets a chart can render comfortably
+DEFAULT_MAX_POINTS = 60
+
+# Upper bound on buckets when a granularity is requested explicitly
+MAX_BUCKETS = 1000
+
+# SQL expressions mapping an attendance date to the start of its period
+_PERIOD_SQL = {
+    'day': 'date(date)',
+    'week': "date(date, '-6 days', 'weekday 1')",
+    'month': "date(date, 'start of month')",
+}
+
+
+def init_rollup_tables(cursor):
+    """Create the rollup table used by the analytics endpoints."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_rollups (
+            granularity TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            scope_id INTEGER NOT NULL,
+            period_start DATE NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, scope, scope_id, period_start, status)
+        ) WITHOUT ROWID
+    ''')
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD string into a date."""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def period_start(day, granularity):
+    """Return the first day of the period containing ``day``."""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    raise ValueError(f'Unknown granularity: {granularity}')
+
+
+def next_period(day, granularity):
+    """Return the start of the period after the one starting on ``day``."""
+    if granularity == 'day':
+        return day + timedelta(days=1)
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def period_starts(start, end, granularity):
+    """Return every period start between ``start`` and ``end`` inclusive."""
+    periods = []
+    current = period_start(start, granularity)
+    while current <= end:
+        periods.append(current)
+        current = next_period(current, granularity)
+    return periods
+
+
+def choose_granularity(start, end, max_points=DEFAULT_MAX_POINTS):
+    """Return the finest granularity that keeps the series within ``max_points`` buckets."""
+    for granularity in GRANULARITIES:
+        if len(period_starts(start, end, granularity)) <= max_points:
+            return granularity
+    return 'month'
+
+
+def _scope_keys(student_id, course_id):
+    keys = [('all', 0), ('student', student_id)]
+    if course_id is not None:
+        keys.append(('course', course_id))
+    return keys
+
+
+def record_attendance_change(cursor, student_id, course_id, day, old_status, new_status):
+    """Move one attendance mark from ``old_status`` to ``new_status`` in every rollup.
+
+    ``old_status`` is None for a new mark. Must be called in the same
+    transaction as the attendance write so the rollups never drift.
+    """
+    if old_status == new_status:
+        return
+    if isinstance(day, str):
+        day = parse_date(day)
+
+    changes = []
+    for granularity in GRANULARITIES:
+        start = period_start(day, granularity).isoformat()
+        for scope, scope_id in _scope_keys(student_id, course_id):
+            if old_status is not None:
+                changes.append((granularity, scope, scope_id, start, old_status, -1))
+            changes.append((granularity, scope, scope_id, start, new_status, 1))
+
+    cursor.executemany('''
+        INSERT INTO attendance_rollups (granularity, scope, scope_id, period_start, status, count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (granularity, scope, scope_id, period_start, status)
+        DO UPDATE SET count = count + excluded.count
+    ''', changes)
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup from every attendance partition and the archive."""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM attendance_rollups')
+    scope_columns = {'all': None, 'course': 'course_id', 'student': 'student_id'}
+
+    # Archived terms are decompressed into a temp table so their history is kept
+    source = partitions.VIEW
+    if maintenance.materialize_archive(conn):
+        source = f'(SELECT date, status, course_id, student_id FROM {partitions.VIEW} UNION ALL ' \
+                 'SELECT date, status, course_id, student_id FROM temp.attendance_archived)'
+
+    for granularity, period_sql in _PERIOD_SQL.items():
+        for scope, column in scope_columns.items():
+            scope_sql = column or '0'
+            where_sql = f'WHERE {column} IS NOT NULL' if column else ''
+            group_sql = f'{column}, period, status' if column else 'period, status'
+            cursor.execute(f'''
+                INSERT INTO attendance_rollups (granularity, scope, scope_id, period_start, status, count)
+                SELECT ?, ?, {scope_sql}, {period_sql} AS period, status, COUNT(*)
+                FROM {source}
+                {where_sql}
+                GROUP BY {group_sql}
+            ''', (granularity, scope))
+
+    cursor.execute('DROP TABLE IF EXISTS temp.attendance_archived')
+    conn.commit()
+
+
+def ensure_rollups(conn):
+    """Build the rollups on first start when attendance already has rows."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM attendance_rollups LIMIT 1')
+    if cursor.fetchone():
+        return
+    cursor.execute(f'SELECT 1 FROM {partitions.VIEW} LIMIT 1')
+    if cursor.fetchone():
+        rebuild_rollups(conn)
+
+
+def attendance_series(conn, start, end, granularity=None, scope='all', scope_id=0,
+                      max_points=DEFAULT_MAX_POINTS):
+    """Return bucketed status counts between ``start`` and ``end`` from the rollups.
+
+    Buckets are aligned to calendar periods, so the first and last weekly or
+    monthly buckets cover the whole period containing ``start`` and ``end``.
+    """
+    if granularity is None:
+        granularity = choose_granularity(start, end, max_points)
+    periods = period_starts(start, end, granularity)
+    if len(periods) > MAX_BUCKETS:
+        raise ValueError(f'Range spans more than {MAX_BUCKETS} {granularity} buckets')
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT period_start, status, count
+        FROM attendance_rollups
+        WHERE granularity = ? AND scope = ? AND scope_id = ?
+          AND period_start BETWEEN ? AND ?
+          AND count > 0
+    ''', (granularity, scope, scope_id, periods[0].isoformat(), periods[-1].isoformat()))
+
+    counts = {}
+    statuses = set()
+    for period, status, count in cursor.fetchall():
+        counts.setdefault(period, {})[status] = count
+        statuses.add(status)
+
+    buckets = []
+    totals = dict.fromkeys(sorted(statuses), 0)
+    for period in periods:
+        key = period.isoformat()
+        bucket_counts = counts.get(key, {})
+        bucket = {'period': key, 'total': sum(bucket_counts.values())}
+        for status in totals:
+            bucket[status] = bucket_counts.get(status, 0)
+            totals[status] += bucket[status]
+        buckets.append(bucket)
+
+    return {
+        'granularity': granularity,
+        'scope': scope,
+        'scope_id': scope_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'statuses': sorted(statuses),
+        'totals': totals,
+        'buckets': buckets
+    }
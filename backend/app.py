@@ -4,27 +4,120 @@ Academia AI - Education Management System Backend
 A Flask-based backend for managing educational institutions, attendance, schedules, and more.
 """
 
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, g, request, jsonify, send_from_directory, session
 from flask_cors import CORS
 from datetime import datetime, timedelta
+import gzip
 import json
+import mimetypes
 import os
 import sqlite3
+import threading
+import time
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
+import logging
 from functools import wraps
 
-app = Flask(__name__)
+from config.config import (
+    DATABASE_PATH, SLOW_QUERY_THRESHOLD_MS,
+    TENANTS_ENABLED, TENANT_DB_DIR, TENANT_HEADER, TENANT_BASE_DOMAIN, TENANT_AUTO_CREATE, TENANT_SAMPLE_DATA,
+    TENANT_MAX_OPEN, TENANT_IDLE_SECONDS, TENANT_POOL_SIZE, TENANT_MAX_CONCURRENT, TENANT_WAIT_SECONDS,
+    ACCESS_TOKEN_MINUTES, REFRESH_TOKEN_DAYS, SESSION_REVOCATION_SYNC_SECONDS,
+    PROFILE_OUTPUT_DIR, PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_HEADER,
+    PROXY_FIX_HOPS, RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_DB_PATH, RATE_LIMIT_DEFAULT, RATE_LIMITS,
+    PATTERNS_HISTORY_DAYS, PATTERNS_RELOAD_SECONDS, ROLL_CALL_HISTORY_DAYS, ROLL_CALL_CACHE_SIZE,
+    SYNC_WINDOW_DAYS, SYNC_MAX_BATCH, SYNC_DELTA_LIMIT,
+    RISK_PIPELINE_INTERVAL_SECONDS, RISK_WINDOW_WEEKS, RISK_HALF_LIFE_WEEKS, RISK_TREND_WEEKS,
+    RISK_MIN_SESSIONS, RISK_SCORE_EPSILON,
+    MODEL_CONFIG, MODEL_SYNC_SECONDS, MODEL_TRAIN_FOLDS, MODEL_TRAIN_L2,
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_QUANTUM,
+    TERM_START_MONTHS, MAINTENANCE_INTERVAL_SECONDS, MAINTENANCE_BACKUP_DIR, MAINTENANCE_BACKUPS_KEPT,
+    MAINTENANCE_BACKUP_PAGES, MAINTENANCE_BACKUP_SLEEP_SECONDS, MAINTENANCE_VACUUM_PAGES,
+    MAINTENANCE_HOT_TERMS, MAINTENANCE_ARCHIVE_CHUNK_ROWS,
+    AUDIT_FLUSH_SECONDS, AUDIT_BATCH_SIZE, AUDIT_MAX_BUFFERED, AUDIT_HOT_DAYS,
+    JOB_WORKERS, JOB_POLL_SECONDS, JOB_SWEEP_ALL_SECONDS, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF_SECONDS, JOB_RETENTION_DAYS,
+    EVENTS_MAX_SUBSCRIBERS, EVENTS_QUEUE_SIZE, EVENTS_REPLAY_SIZE, EVENTS_HEARTBEAT_SECONDS, EVENTS_TICKET_SECONDS,
+    FRONTEND_DIR, STATIC_ASSET_DIRS, STATIC_BUILD_DIR, STATIC_URL_PREFIX, STATIC_MAX_AGE,
+    STATIC_OPTIMIZE, STATIC_USE_X_SENDFILE, STATIC_BUILD_ON_START
+)
+import analytics
+import attendance_patterns
+import audit
+import enrollments
+import events
+import feature_store
+import jobs
+import maintenance
+import metrics
+import partitions
+import prediction
+import profiling
+import rate_limit
+import risk
+import rollcall
+import sessions
+import static_assets
+import sync
+import tenants
+import terms
+
+app = Flask(__name__, static_folder=None)
 app.config['SECRET_KEY'] = 'academia_ai_secret_key_2024'
 app.config['JWT_SECRET_KEY'] = 'academia_jwt_secret_2024'
+app.config['USE_X_SENDFILE'] = STATIC_USE_X_SENDFILE
+if PROXY_FIX_HOPS > 0:
+    # Rate limits and tenant routing see the client, not the proxy
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_HOPS, x_proto=PROXY_FIX_HOPS, x_host=PROXY_FIX_HOPS)
 CORS(app)
+access_logger = logging.getLogger('academia.access')
+metrics.set_slow_query_threshold(SLOW_QUERY_THRESHOLD_MS)
+rate_limiter = rate_limit.RateLimiter(
+    rate_limit.create_backend(RATE_LIMIT_BACKEND, RATE_LIMIT_DB_PATH), RATE_LIMITS, RATE_LIMIT_DEFAULT
+)
+tenant_registry = tenants.TenantRegistry(
+    lambda handle: open_tenant(handle),
+    db_dir=TENANT_DB_DIR if TENANTS_ENABLED else None,
+    default_path=None if TENANTS_ENABLED else DATABASE_PATH,
+    max_open=TENANT_MAX_OPEN, idle_seconds=TENANT_IDLE_SECONDS, pool_size=TENANT_POOL_SIZE,
+    max_concurrent=TENANT_MAX_CONCURRENT, create_missing=TENANT_AUTO_CREATE,
+    busy=lambda handle: handle.services['events'].has_subscribers()
+)
+# Services holding per-worker state read from one database; each resolves to the active tenant's
+revoked_sessions = LocalProxy(lambda: tenant_registry.current().services['revoked_sessions'])
+pattern_service = LocalProxy(lambda: tenant_registry.current().services['patterns'])
+model_registry = LocalProxy(lambda: tenant_registry.current().services['models'])
+event_broker = LocalProxy(lambda: tenant_registry.current().services['events'])
+maintenance_runner = LocalProxy(lambda: tenant_registry.current().services['maintenance'])
+roll_call_sheets = LocalProxy(lambda: tenant_registry.current().services['roll_call'])
+# Keyed by model fingerprint, so tenants share it safely
+prediction_cache = prediction.PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_QUANTUM, MODEL_CONFIG)
+# Models are trained on the same attendance input risk scoring feeds them
+attendance_feature = prediction.AttendanceFeature(RISK_WINDOW_WEEKS, RISK_HALF_LIFE_WEEKS, RISK_TREND_WEEKS)
+risk_pipeline = risk.RiskPipeline(
+    lambda: model_registry.current(get_db), MODEL_CONFIG['performance_thresholds'], attendance_feature,
+    min_sessions=RISK_MIN_SESSIONS, score_epsilon=RISK_SCORE_EPSILON
+)
+# Buffers are kept per database path, so one writer serves every tenant
+audit_writer = audit.AuditWriter(AUDIT_BATCH_SIZE, AUDIT_FLUSH_SECONDS, AUDIT_MAX_BUFFERED)
+job_queue = jobs.JobQueue(JOB_LEASE_SECONDS, JOB_RETRY_BACKOFF_SECONDS, JOB_MAX_ATTEMPTS)
+
+def get_db():
+    """Borrow an instrumented connection to the active tenant's database; close() returns it."""
+    return tenant_registry.current().connect()
 
 # Database initialization
 def init_db():
     """Initialize the SQLite database with required tables."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
+    # Only takes effect on a new database; maintenance.py converts existing ones
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -66,21 +159,8 @@ def init_db():
         )
     ''')
     
-    # Attendance table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER,
-            course_id INTEGER,
-            date DATE NOT NULL,
-            status TEXT NOT NULL,
-            marked_by INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (id),
-            FOREIGN KEY (course_id) REFERENCES courses (id),
-            FOREIGN KEY (marked_by) REFERENCES users (id)
-        )
-    ''')
+    # Attendance is stored one table per term; partitions.py creates them on first use
+    partitions.init_partition_tables(cursor)
     
     # Schedule table
     cursor.execute('''
@@ -96,16 +176,46 @@ def init_db():
         )
     ''')
     
+    # Course enrollments and seat counts; a new table is filled from attendance
+    enrollments.init_enrollment_tables(cursor)
+    rollcall.init_roll_call_tables(cursor)
+    
+    # Login sessions and refresh tokens
+    sessions.init_session_tables(cursor)
+    
+    # Attendance analytics rollups
+    analytics.init_rollup_tables(cursor)
+    
+    # Early-warning risk scores
+    risk.init_risk_tables(cursor)
+    
+    # Versioned prediction features
+    feature_store.init_feature_tables(cursor)
+    
+    # Recorded outcomes and trained prediction models
+    prediction.init_prediction_tables(cursor)
+    
+    # Attendance archive and maintenance history
+    maintenance.init_maintenance_tables(cursor)
+    
+    # Background job queue
+    jobs.init_job_tables(cursor)
+    
+    # Append-only log of attendance changes
+    audit.init_audit_tables(cursor)
+    
+    # Mark clocks and applied operations for offline sync
+    sync.init_sync_tables(cursor)
+    
     conn.commit()
+    partitions.migrate_legacy_table(conn, TERM_START_MONTHS)
+    analytics.ensure_rollups(conn)
     conn.close()
 
-# Initialize database on startup
-init_db()
-
 # Sample data insertion
 def insert_sample_data():
     """Insert sample data for demonstration."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Check if sample data already exists
@@ -160,33 +270,269 @@ def insert_sample_data():
     conn.commit()
     conn.close()
 
-# Insert sample data
-insert_sample_data()
+def open_tenant(handle):
+    """Bring a tenant's database up to date and build its per-worker services."""
+    init_db()
+    if handle.name == tenants.DEFAULT or TENANT_SAMPLE_DATA:
+        insert_sample_data()
+    return {
+        'revoked_sessions': sessions.RevocationList(ACCESS_TOKEN_MINUTES * 60, SESSION_REVOCATION_SYNC_SECONDS),
+        'patterns': attendance_patterns.AttendancePatterns(PATTERNS_HISTORY_DAYS, PATTERNS_RELOAD_SECONDS),
+        'models': prediction.ModelRegistry(MODEL_CONFIG['prediction_weights'], MODEL_SYNC_SECONDS),
+        'events': events.EventBroker(
+            queue_size=EVENTS_QUEUE_SIZE, replay_size=EVENTS_REPLAY_SIZE, max_subscribers=EVENTS_MAX_SUBSCRIBERS
+        ),
+        'roll_call': rollcall.SheetCache(ROLL_CALL_CACHE_SIZE, ROLL_CALL_HISTORY_DAYS),
+        'maintenance': maintenance.Maintenance(
+            handle.db_path, MAINTENANCE_BACKUP_DIR, TERM_START_MONTHS, MAINTENANCE_HOT_TERMS,
+            MAINTENANCE_BACKUPS_KEPT, MAINTENANCE_BACKUP_PAGES, MAINTENANCE_BACKUP_SLEEP_SECONDS,
+            MAINTENANCE_VACUUM_PAGES, MAINTENANCE_ARCHIVE_CHUNK_ROWS, AUDIT_HOT_DAYS
+        )
+    }
+
+# Initialize the database and sample data on startup; tenants are opened on first request
+if not TENANTS_ENABLED:
+    tenant_registry.get(tenants.DEFAULT)
+
+# Request instrumentation
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.begin_request()
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+    sql = metrics.end_request()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    
+    metrics.REQUEST_LATENCY.observe(elapsed, request.method, route, str(response.status_code))
+    metrics.REQUEST_SQL_QUERIES.observe(sql['queries'], request.method, route)
+    metrics.REQUEST_ROWS.observe(sql['rows'], request.method, route)
+    tenant = tenants.active()
+    if tenant is not None:
+        tenants.record_request(tenant.name, response.status_code, elapsed, sql['queries'])
+    access_logger.info(
+        '%s %s %s', request.method, request.path, response.status_code,
+        extra={
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'sql_queries': sql['queries'],
+            'sql_ms': round(sql['sql_seconds'] * 1000, 2),
+            'remote_addr': request.remote_addr,
+            'tenant': tenant.name if tenant else None
+        }
+    )
+    
+    response.headers['Server-Timing'] = (
+        f"db;dur={sql['sql_seconds'] * 1000:.2f};desc=\"{sql['queries']} queries\", "
+        f"total;dur={elapsed * 1000:.2f}"
+    )
+    return response
+
+# Rate limiting
+@app.before_request
+def check_rate_limit():
+    # Runs before any hook or handler that touches the database or hashes passwords
+    if not RATE_LIMIT_ENABLED or request.url_rule is None or request.method == 'OPTIONS':
+        return None
+    if not request.path.startswith('/api/'):
+        return None
+    
+    claims = decode_token(allow_ticket=True, check_revoked=False)
+    user = claims.get('user_id') if claims else None
+    if user is not None and TENANTS_ENABLED:
+        # User ids are only unique within a tenant
+        user = f"{claims.get('tenant')}:{user}"
+    limited = rate_limiter.check(f'{request.method} {request.url_rule.rule}', request.remote_addr, user)
+    if limited is None:
+        return None
+    
+    _, retry_after = limited
+    response = jsonify({'message': 'Too many requests, please retry later', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+# Tenant routing
+# Routes that never touch a tenant database
+TENANTLESS_PATHS = {'/api/health', '/api/metrics'}
+
+@app.before_request
+def enter_tenant():
+    if request.url_rule is None or request.method == 'OPTIONS':
+        return None
+    if not request.path.startswith('/api/') or request.path in TENANTLESS_PATHS:
+        return None
+    
+    try:
+        name = tenants.DEFAULT
+        if TENANTS_ENABLED:
+            claims = decode_token(allow_ticket=True, check_revoked=False)
+            name = tenants.resolve_name(
+                request.headers.get(TENANT_HEADER), request.host, claims.get('tenant') if claims else None,
+                TENANT_BASE_DOMAIN
+            )
+            if name is None:
+                return jsonify({'message': f'Institution not specified; send the {TENANT_HEADER} header'}), 400
+        g.tenant_token = tenant_registry.enter(tenant_registry.get(name), TENANT_WAIT_SECONDS)
+    except tenants.UnknownTenant as e:
+        return jsonify({'message': str(e)}), 404
+    except tenants.TenantBusy as e:
+        response = jsonify({'message': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    return None
+
+@app.teardown_request
+def leave_tenant(error=None):
+    token = g.pop('tenant_token', None)
+    if token is not None:
+        tenant_registry.leave(token)
 
 # JWT token decorator
+# Purpose claim of the tickets that open the event stream
+TICKET_PURPOSE = 'events'
+
+def decode_token(allow_ticket=False, check_revoked=True):
+    """Return the claims of the request's bearer token, or None if it is missing or invalid.
+    
+    With ``allow_ticket`` a stream ticket in the query string is accepted
+    when there is no Authorization header.
+    """
+    header = request.headers.get('Authorization')
+    if header:
+        token, purpose = header.split(' ')[-1], None  # Remove 'Bearer ' prefix
+    elif allow_ticket and request.args.get('ticket'):
+        token, purpose = request.args['ticket'], TICKET_PURPOSE
+    else:
+        return None
+    
+    try:
+        claims = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+    except Exception:
+        return None
+    # Tickets end up in URLs and logs, so they only open the event stream and access tokens never go there
+    if claims.get('purpose') != purpose:
+        return None
+    
+    # A token is only good for the tenant that issued it
+    tenant = tenants.active()
+    if TENANTS_ENABLED and tenant is not None and claims.get('tenant') != tenant.name:
+        return None
+    if check_revoked and claims.get('sid') and revoked_sessions.is_revoked(claims['sid'], get_db):
+        return None
+    return claims
+
+def issue_access_token(user_id, email, session_id):
+    return jwt.encode({
+        'user_id': user_id,
+        'email': email,
+        'sid': session_id,
+        'tenant': tenant_registry.current().name,
+        'exp': datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    }, app.config['JWT_SECRET_KEY'], algorithm='HS256')
+
+def issue_stream_ticket(claims):
+    """Return a short-lived token that only opens the event stream, for clients that cannot send headers."""
+    return jwt.encode({
+        'user_id': claims['user_id'],
+        'email': claims.get('email'),
+        'sid': claims.get('sid'),
+        'tenant': claims.get('tenant'),
+        'purpose': TICKET_PURPOSE,
+        'exp': datetime.utcnow() + timedelta(seconds=EVENTS_TICKET_SECONDS)
+    }, app.config['JWT_SECRET_KEY'], algorithm='HS256')
+
+def start_session(user_id, email):
+    """Open a session and return its access and refresh tokens."""
+    conn = get_db()
+    session_id, refresh_token = sessions.create_session(conn, user_id, REFRESH_TOKEN_DAYS * 24 * 60 * 60)
+    conn.close()
+    return {
+        'token': issue_access_token(user_id, email, session_id),
+        'refresh_token': refresh_token,
+        'expires_in': ACCESS_TOKEN_MINUTES * 60
+    }
+
+def get_user_from_request(allow_ticket=False):
+    """Return the user identified by the request's bearer token, or None."""
+    claims = decode_token(allow_ticket)
+    if not claims:
+        return None
+    return get_user_by_id(claims['user_id'])
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
+        if not request.headers.get('Authorization'):
             return jsonify({'message': 'Token is missing'}), 401
         
-        try:
-            token = token.split(' ')[1]  # Remove 'Bearer ' prefix
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            current_user = get_user_by_id(data['user_id'])
-            if not current_user:
-                return jsonify({'message': 'Invalid token'}), 401
-        except:
+        current_user = get_user_from_request()
+        if not current_user:
             return jsonify({'message': 'Invalid token'}), 401
         
         return f(current_user, *args, **kwargs)
     return decorated
 
+def teacher_required(f):
+    @wraps(f)
+    @token_required
+    def decorated(current_user, *args, **kwargs):
+        if current_user['role'] not in ('teacher', 'admin'):
+            return jsonify({'message': 'Teacher access required'}), 403
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+def admin_required(f):
+    @wraps(f)
+    @token_required
+    def decorated(current_user, *args, **kwargs):
+        if current_user['role'] != 'admin':
+            return jsonify({'message': 'Admin access required'}), 403
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+# Single-request profiling
+@app.before_request
+def start_request_profile():
+    if PROFILE_HEADER not in request.headers:
+        return
+    user = get_user_from_request()
+    if not user or user['role'] != 'admin':
+        return
+    
+    try:
+        g.profiler = profiling.SamplingProfiler(
+            interval=PROFILE_SAMPLE_INTERVAL_MS / 1000,
+            thread_ids=[threading.get_ident()]
+        ).start()
+    except profiling.ProfilerBusy:
+        g.profiler = None
+
+@app.after_request
+def finish_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.stop()
+        label = f"{request.method}-{request.path}"
+        path = profiler.write(PROFILE_OUTPUT_DIR, label)
+        response.headers['X-Profile-Output'] = path.name
+    return response
+
+@app.teardown_request
+def abandon_request_profile(error=None):
+    profiler = g.pop('profiler', None)
+    if profiler:
+        profiler.stop()
+
 # Database helper functions
 def get_user_by_id(user_id):
     """Get user by ID."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT id, name, email, role, avatar FROM users WHERE id = ?', (user_id,))
     user = cursor.fetchone()
@@ -204,7 +550,7 @@ def get_user_by_id(user_id):
 
 def get_user_by_email(email):
     """Get user by email."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT id, name, email, password_hash, role, avatar FROM users WHERE email = ?', (email,))
     user = cursor.fetchone()
@@ -235,16 +581,9 @@ def login():
     if not user or not check_password_hash(user['password_hash'], data['password']):
         return jsonify({'message': 'Invalid email or password'}), 401
     
-    # Generate JWT token
-    token = jwt.encode({
-        'user_id': user['id'],
-        'email': user['email'],
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }, app.config['JWT_SECRET_KEY'], algorithm='HS256')
-    
     return jsonify({
         'message': 'Login successful',
-        'token': token,
+        **start_session(user['id'], user['email']),
         'user': {
             'id': user['id'],
             'name': user['name'],
@@ -268,46 +607,88 @@ def register():
         return jsonify({'message': 'User with this email already exists'}), 409
     
     # Create new user
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     password_hash = generate_password_hash(data['password'])
     avatar = data.get('name', '').split()[0][0].upper() if data.get('name') else 'U'
+    # Admin routes trust the stored role, so self-registered accounts never choose their own
+    role = 'user'
     
     cursor.execute('''
         INSERT INTO users (name, email, password_hash, role, avatar)
         VALUES (?, ?, ?, ?, ?)
-    ''', (data['name'], data['email'], password_hash, data.get('role', 'user'), avatar))
+    ''', (data['name'], data['email'], password_hash, role, avatar))
     
     user_id = cursor.lastrowid
     conn.commit()
     conn.close()
     
-    # Generate token for new user
-    token = jwt.encode({
-        'user_id': user_id,
-        'email': data['email'],
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }, app.config['JWT_SECRET_KEY'], algorithm='HS256')
-    
     return jsonify({
         'message': 'Registration successful',
-        'token': token,
+        **start_session(user_id, data['email']),
         'user': {
             'id': user_id,
             'name': data['name'],
             'email': data['email'],
-            'role': data.get('role', 'user'),
+            'role': role,
             'avatar': avatar
         }
     }), 201
 
+@app.route('/api/auth/refresh', methods=['POST'])
+def refresh_token():
+    """Exchange a refresh token for a new access token and refresh token."""
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get('refresh_token'):
+        return jsonify({'message': 'Refresh token is required'}), 400
+    
+    conn = get_db()
+    try:
+        session_id, user_id, email, new_refresh_token = sessions.rotate_session(
+            conn, data['refresh_token'], REFRESH_TOKEN_DAYS * 24 * 60 * 60
+        )
+    except sessions.InvalidRefreshToken as e:
+        return jsonify({'message': str(e)}), 401
+    finally:
+        conn.close()
+    
+    return jsonify({
+        'token': issue_access_token(user_id, email, session_id),
+        'refresh_token': new_refresh_token,
+        'expires_in': ACCESS_TOKEN_MINUTES * 60
+    })
+
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout(current_user):
+    """End the current session, or every session of the user with {"all": true}."""
+    data = request.get_json(silent=True) or {}
+    claims = decode_token()
+    
+    conn = get_db()
+    if data.get('all'):
+        revoked = sessions.revoke_user_sessions(conn, current_user['id'])
+    elif claims.get('sid'):
+        revoked_at = sessions.revoke_session(conn, claims['sid'])
+        revoked = [(claims['sid'], revoked_at)] if revoked_at else []
+    else:
+        revoked = []
+    conn.close()
+    
+    # Take effect in this worker immediately; others catch up on their next sync
+    for session_id, revoked_at in revoked:
+        revoked_sessions.add(session_id, revoked_at)
+    
+    return jsonify({'message': 'Logged out successfully', 'sessions_revoked': len(revoked)})
+
 # Dashboard routes
 @app.route('/api/dashboard/stats', methods=['GET'])
 @token_required
 def get_dashboard_stats(current_user):
     """Get dashboard statistics."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get total students
@@ -319,13 +700,15 @@ def get_dashboard_stats(current_user):
     total_courses = cursor.fetchone()[0]
     
     # Get today's attendance
-    today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('SELECT COUNT(*) FROM attendance WHERE date = ?', (today,))
+    today = datetime.now().date()
+    cursor.execute(f'SELECT COUNT(*) FROM {partitions.source(conn, today, today)} WHERE date = ?',
+                   (today.isoformat(),))
     today_attendance = cursor.fetchone()[0]
     
     # Get total attendance this week
-    week_start = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime('%Y-%m-%d')
-    cursor.execute('SELECT COUNT(*) FROM attendance WHERE date >= ?', (week_start,))
+    week_start = today - timedelta(days=today.weekday())
+    cursor.execute(f'SELECT COUNT(*) FROM {partitions.source(conn, week_start)} WHERE date >= ?',
+                   (week_start.isoformat(),))
     week_attendance = cursor.fetchone()[0]
     
     conn.close()
@@ -341,12 +724,19 @@ def get_dashboard_stats(current_user):
 @app.route('/api/attendance', methods=['GET'])
 @token_required
 def get_attendance(current_user):
-    """Get attendance data."""
-    conn = sqlite3.connect('academia_ai.db')
+    """Get attendance data, for the current term unless start and end are given."""
+    try:
+        start = analytics.parse_date(request.args['start']) if 'start' in request.args \
+            else terms.term_start(datetime.now().date(), TERM_START_MONTHS)
+        end = analytics.parse_date(request.args['end']) if 'end' in request.args else None
+    except ValueError:
+        return jsonify({'message': 'Dates must be YYYY-MM-DD'}), 400
+    
+    conn = get_db()
     cursor = conn.cursor()
     
-    # Get attendance with student and course information
-    cursor.execute('''
+    # Get attendance with student and course information, reading only the terms in range
+    cursor.execute(f'''
         SELECT 
             a.id,
             s.name,
@@ -355,11 +745,12 @@ def get_attendance(current_user):
             a.status,
             a.date,
             c.abbreviation as course
-        FROM attendance a
+        FROM {partitions.source(conn, start, end)} a
         JOIN students s ON a.student_id = s.id
         LEFT JOIN courses c ON a.course_id = c.id
+        WHERE a.date >= ? AND a.date <= ?
         ORDER BY a.date DESC, s.name
-    ''')
+    ''', (start.isoformat(), end.isoformat() if end else '9999-12-31'))
     
     attendance_records = []
     for row in cursor.fetchall():
@@ -385,51 +776,537 @@ def mark_attendance(current_user):
     
     if not data or not data.get('student_id') or not data.get('status'):
         return jsonify({'message': 'Student ID and status are required'}), 400
+    if data['status'] not in sync.STATUSES:
+        return jsonify({'message': f"Status must be one of {', '.join(sync.STATUSES)}"}), 400
+    course_id = data.get('course_id')
+    if course_id is not None and (not isinstance(course_id, int) or isinstance(course_id, bool)):
+        return jsonify({'message': 'course_id must be an integer'}), 400
     
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Check if student exists
-    cursor.execute('SELECT id FROM students WHERE student_id = ?', (data['student_id'],))
+    cursor.execute('SELECT id, name FROM students WHERE student_id = ?', (data['student_id'],))
     student = cursor.fetchone()
     if not student:
         conn.close()
         return jsonify({'message': 'Student not found'}), 404
     
-    # Check if attendance already marked for today
+    if course_id is not None:
+        cursor.execute('SELECT 1 FROM courses WHERE id = ?', (course_id,))
+        if not cursor.fetchone():
+            conn.close()
+            return jsonify({'message': 'Course not found'}), 404
+    
+    # Check if attendance already marked for today, in this course when one is given
     today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT id FROM attendance 
-        WHERE student_id = ? AND date = ?
-    ''', (student[0], today))
+    table = partitions.partition_for(conn, today, TERM_START_MONTHS)
+    cursor.execute(f'''
+        SELECT id, status, course_id FROM {table} 
+        WHERE student_id = ? AND date = ? AND course_id IS ?
+    ''', (student[0], today, course_id))
     
     existing_attendance = cursor.fetchone()
     
     if existing_attendance:
         # Update existing attendance
-        cursor.execute('''
-            UPDATE attendance 
+        cursor.execute(f'''
+            UPDATE {table} 
             SET status = ?, marked_by = ?
             WHERE id = ?
         ''', (data['status'], current_user['id'], existing_attendance[0]))
+        old_status = existing_attendance[1]
     else:
         # Create new attendance record
-        cursor.execute('''
-            INSERT INTO attendance (student_id, course_id, date, status, marked_by)
+        cursor.execute(f'''
+            INSERT INTO {table} (student_id, course_id, date, status, marked_by)
             VALUES (?, ?, ?, ?, ?)
-        ''', (student[0], data.get('course_id'), today, data['status'], current_user['id']))
+        ''', (student[0], course_id, today, data['status'], current_user['id']))
+        old_status = None
+    
+    # Keep analytics rollups and roll-call sheets in step within the same transaction
+    analytics.record_attendance_change(cursor, student[0], course_id, today, old_status, data['status'])
+    rollcall.invalidate(cursor, course_id, today)
+    sync.record(cursor, student[0], course_id, today, data['status'], time.time())
     
     conn.commit()
     conn.close()
     
+    pattern_service.record(student[0], course_id, today, data['status'])
+    audit_writer.record(
+        tenant_registry.current().db_path, student[0], course_id, today, old_status, data['status'], current_user['id']
+    )
+    event_broker.publish('attendance', {
+        'student_id': data['student_id'],
+        'name': student[1],
+        'course_id': course_id,
+        'date': today,
+        'status': data['status'],
+        'previous_status': old_status,
+        'marked_by': current_user['name']
+    }, course_id)
+    if old_status is None:
+        event_broker.publish('stats', {'today_attendance': 1, 'week_attendance': 1})
+    
     return jsonify({'message': 'Attendance marked successfully'})
 
+@app.route('/api/attendance/sync', methods=['POST'])
+@token_required
+def sync_attendance(current_user):
+    """Apply a batch of marks queued offline and return the marks changed since the client's token."""
+    data = request.get_json(silent=True) or {}
+    client_id = data.get('client_id')
+    since = data.get('since', 0)
+    marks = data.get('marks', [])
+    course_ids = data.get('courses') or []
+    
+    if not isinstance(client_id, str) or not client_id or len(client_id) > 64:
+        return jsonify({'message': 'client_id is required'}), 400
+    if not isinstance(since, int) or isinstance(since, bool) or since < 0:
+        return jsonify({'message': 'since must be a sync token'}), 400
+    if not isinstance(marks, list) or len(marks) > SYNC_MAX_BATCH:
+        return jsonify({'message': f'marks must be a list of at most {SYNC_MAX_BATCH}'}), 400
+    if not all(isinstance(mark, dict) and isinstance(mark.get('op_id'), str) for mark in marks):
+        return jsonify({'message': 'Every mark needs an op_id'}), 400
+    if not isinstance(course_ids, list) or not all(isinstance(course_id, int) for course_id in course_ids):
+        return jsonify({'message': 'courses must be a list of course ids'}), 400
+    
+    conn = get_db()
+    try:
+        results, changes = sync.apply(conn, client_id, marks, current_user['id'], TERM_START_MONTHS, SYNC_WINDOW_DAYS)
+        token, delta, more = sync.changes_since(conn, since, client_id, course_ids, SYNC_DELTA_LIMIT)
+    finally:
+        conn.close()
+    
+    db_path = tenant_registry.current().db_path
+    today = datetime.now().date()
+    week_start = (today - timedelta(days=today.weekday())).isoformat()
+    for change in changes:
+        pattern_service.record(change['student_id'], change['course_id'], change['date'], change['status'])
+        audit_writer.record(
+            db_path, change['student_id'], change['course_id'], change['date'], change['previous_status'],
+            change['status'], current_user['id'], source='sync'
+        )
+        event_broker.publish('attendance', {
+            'student_id': change['student_code'],
+            'name': change['name'],
+            'course_id': change['course_id'],
+            'date': change['date'],
+            'status': change['status'],
+            'previous_status': change['previous_status'],
+            'marked_by': current_user['name']
+        }, change['course_id'])
+    new_marks = [change['date'] for change in changes if change['previous_status'] is None]
+    if new_marks:
+        event_broker.publish('stats', {
+            'today_attendance': sum(1 for day in new_marks if day == today.isoformat()),
+            'week_attendance': sum(1 for day in new_marks if day >= week_start)
+        })
+    
+    outcomes = []
+    for op_id, (outcome, reason) in results.items():
+        outcomes.append({'op_id': op_id, 'outcome': outcome})
+        if reason:
+            outcomes[-1]['reason'] = reason
+    
+    return jsonify({
+        'results': outcomes,
+        'token': token,
+        'changes': delta,
+        'more': more
+    })
+
+# Analytics routes
+@app.route('/api/analytics/attendance', methods=['GET'])
+@token_required
+def get_attendance_analytics(current_user):
+    """Get bucketed attendance counts for charts."""
+    try:
+        end = analytics.parse_date(request.args['end']) if 'end' in request.args else datetime.now().date()
+        start = analytics.parse_date(request.args['start']) if 'start' in request.args else end - timedelta(days=29)
+        max_points = int(request.args.get('max_points', analytics.DEFAULT_MAX_POINTS))
+    except ValueError:
+        return jsonify({'message': 'Dates must be YYYY-MM-DD and max_points an integer'}), 400
+    
+    if start > end:
+        return jsonify({'message': 'start must not be after end'}), 400
+    if max_points < 1:
+        return jsonify({'message': 'max_points must be positive'}), 400
+    
+    granularity = request.args.get('granularity')
+    if granularity is not None and granularity not in analytics.GRANULARITIES:
+        return jsonify({'message': f"granularity must be one of {', '.join(analytics.GRANULARITIES)}"}), 400
+    
+    scope, scope_id = 'all', 0
+    if request.args.get('course_id'):
+        scope, scope_id = 'course', request.args.get('course_id', type=int)
+    elif request.args.get('student_id'):
+        scope, scope_id = 'student', request.args.get('student_id', type=int)
+    if scope_id is None:
+        return jsonify({'message': 'course_id and student_id must be integers'}), 400
+    
+    conn = get_db()
+    try:
+        series = analytics.attendance_series(conn, start, end, granularity, scope, scope_id, max_points)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    finally:
+        conn.close()
+    
+    return jsonify(series)
+
+# Live event routes
+@app.route('/api/events/ticket', methods=['POST'])
+@token_required
+def create_stream_ticket(current_user):
+    """Issue a short-lived ticket for opening the event stream."""
+    return jsonify({'ticket': issue_stream_ticket(decode_token()), 'expires_in': EVENTS_TICKET_SECONDS})
+
+@app.route('/api/events/stream', methods=['GET'])
+def stream_events():
+    """Stream attendance marks, new students and dashboard stat deltas as server-sent events."""
+    # EventSource cannot set headers, so it authenticates with a ticket from /api/events/ticket
+    current_user = get_user_from_request(allow_ticket=True)
+    if not current_user:
+        return jsonify({'message': 'Ticket is missing or invalid'}), 401
+    
+    try:
+        course_ids = [int(course_id) for course_id in request.args.get('courses', '').split(',') if course_id]
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'message': 'courses and last_event_id must be integers'}), 400
+    
+    # The stream outlives the request, so hold on to this tenant's broker itself
+    broker = event_broker._get_current_object()
+    try:
+        subscription = broker.subscribe(events.subscriber_topics(course_ids), last_event_id)
+    except events.TooManySubscribers as e:
+        return jsonify({'message': str(e)}), 503
+    
+    response = Response(
+        broker.stream(subscription, EVENTS_HEARTBEAT_SECONDS), mimetype='text/event-stream'
+    )
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    # Lets the ASGI entry point stream this on the event loop instead of a thread
+    response.event_subscription = subscription
+    response.event_broker = broker
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Attendance pattern routes
+def attach_student_details(records):
+    """Add name and student code to records keyed by the students table id."""
+    if not records:
+        return records
+    ids = [record['student_id'] for record in records]
+    conn = get_db()
+    cursor = conn.cursor()
+    details = {}
+    # Stay below SQLite's bound parameter limit
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cursor.execute(
+            f"SELECT id, name, student_id FROM students WHERE id IN ({','.join('?' * len(chunk))})", chunk
+        )
+        details.update({row[0]: row[1:] for row in cursor.fetchall()})
+    conn.close()
+    
+    for record in records:
+        name, code = details.get(record['student_id'], (None, None))
+        record['id'] = record.pop('student_id')
+        record['name'] = name
+        record['student_id'] = code
+    return records
+
+@app.route('/api/attendance/streaks', methods=['GET'])
+@token_required
+def get_absence_streaks(current_user):
+    """Get students whose current run of consecutive absences reaches min_streak."""
+    min_streak = request.args.get('min_streak', 3, type=int)
+    course_id = request.args.get('course_id', type=int)
+    limit = request.args.get('limit', 100, type=int)
+    if min_streak < 1 or limit < 1:
+        return jsonify({'message': 'min_streak and limit must be positive integers'}), 400
+    
+    streaks = pattern_service.streaks(get_db, min_streak, course_id)
+    return jsonify({
+        'min_streak': min_streak,
+        'total': len(streaks),
+        'students': attach_student_details(streaks[:limit])
+    })
+
+@app.route('/api/attendance/rolling', methods=['GET'])
+@token_required
+def get_rolling_attendance(current_user):
+    """Get rolling attendance percentages, or one student's daily series with student_id."""
+    window = request.args.get('window', 30, type=int)
+    course_id = request.args.get('course_id', type=int)
+    if window < 1 or window > PATTERNS_HISTORY_DAYS:
+        return jsonify({'message': f'window must be between 1 and {PATTERNS_HISTORY_DAYS} days'}), 400
+    
+    if request.args.get('student_id'):
+        student_id = request.args.get('student_id', type=int)
+        try:
+            end = analytics.parse_date(request.args['end']) if 'end' in request.args else None
+            start = analytics.parse_date(request.args['start']) if 'start' in request.args else None
+        except ValueError:
+            return jsonify({'message': 'Dates must be YYYY-MM-DD'}), 400
+        if student_id is None:
+            return jsonify({'message': 'student_id must be an integer'}), 400
+        series = pattern_service.rolling_series(get_db, student_id, window, start, end, course_id)
+        return jsonify({'student_id': student_id, 'window': window, 'series': series})
+    
+    below = request.args.get('below', 100.0, type=float)
+    limit = request.args.get('limit', 100, type=int)
+    rates = [rate for rate in pattern_service.rolling_rates(get_db, window, course_id) if rate['percentage'] < below]
+    rates.sort(key=lambda rate: rate['percentage'])
+    return jsonify({
+        'window': window,
+        'total': len(rates),
+        'students': attach_student_details(rates[:max(limit, 0)])
+    })
+
+@app.route('/api/attendance/heatmap', methods=['GET'])
+@token_required
+def get_attendance_heatmap(current_user):
+    """Get course-by-day attendance counts and rates."""
+    try:
+        end = analytics.parse_date(request.args['end']) if 'end' in request.args else datetime.now().date()
+        start = analytics.parse_date(request.args['start']) if 'start' in request.args else end - timedelta(days=27)
+        course_ids = [int(c) for c in request.args.get('course_id', '').split(',') if c] or None
+    except ValueError:
+        return jsonify({'message': 'Dates must be YYYY-MM-DD and course_id comma-separated integers'}), 400
+    if start > end:
+        return jsonify({'message': 'start must not be after end'}), 400
+    if (end - start).days >= PATTERNS_HISTORY_DAYS:
+        return jsonify({'message': f'Range must be shorter than {PATTERNS_HISTORY_DAYS} days'}), 400
+    
+    conn = get_db()
+    heatmap = attendance_patterns.course_heatmap(conn, start, end, course_ids)
+    conn.close()
+    return jsonify(heatmap)
+
+# Risk scoring routes
+@app.route('/api/risk/students', methods=['GET'])
+@token_required
+def get_risk_students(current_user):
+    """Get scored students in one risk bucket, highest risk first, a page at a time."""
+    bucket = request.args.get('bucket', risk.AT_RISK)
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    if bucket != 'all' and bucket not in risk.BUCKETS:
+        return jsonify({'message': f"bucket must be one of: all, {', '.join(risk.BUCKETS)}"}), 400
+    if page < 1 or not 1 <= per_page <= 500:
+        return jsonify({'message': 'page must be positive and per_page between 1 and 500'}), 400
+    
+    conn = get_db()
+    total, students = risk.list_students(conn, list(risk.BUCKETS) if bucket == 'all' else [bucket], page, per_page)
+    run = risk.latest_run(conn)
+    conn.close()
+    
+    return jsonify({
+        'bucket': bucket,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'run': run,
+        'students': students
+    })
+
+@job_queue.handler('risk_run')
+def risk_run_job(job, payload):
+    conn = get_db()
+    try:
+        job.progress(0, 'Scoring students')
+        return risk_pipeline.run(conn)
+    finally:
+        conn.close()
+
+@app.route('/api/risk/run', methods=['POST'])
+@admin_required
+def run_risk_pipeline(current_user):
+    """Queue a rescoring of every student instead of waiting for the scheduler."""
+    return submit_job(current_user, 'risk_run')
+
+# Feature store routes
+@app.route('/api/features', methods=['POST'])
+@teacher_required
+def load_features(current_user):
+    """Store prediction features for many students as a new version."""
+    data = request.get_json(silent=True) or {}
+    records = data.get('students')
+    if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+        return jsonify({'message': 'students must be a non-empty list of feature records'}), 400
+    
+    conn = get_db()
+    try:
+        feature_store.resolve_student_codes(conn, records)
+        version = feature_store.bulk_load(conn, records, data.get('source') or f"api:{current_user['email']}")
+    except feature_store.InvalidFeatures as e:
+        return jsonify({'message': str(e)}), 400
+    finally:
+        conn.close()
+    
+    return jsonify({'message': 'Features stored successfully', 'version': version, 'rows': len(records)}), 201
+
+@app.route('/api/features/versions', methods=['GET'])
+@token_required
+def get_feature_versions(current_user):
+    """List the most recent feature versions."""
+    limit = request.args.get('limit', 20, type=int)
+    conn = get_db()
+    versions = feature_store.list_versions(conn, max(1, min(limit, 100)))
+    conn.close()
+    return jsonify(versions)
+
+@app.route('/api/students/<int:student_id>/features', methods=['GET'])
+@token_required
+def get_student_features(current_user, student_id):
+    """Get one student's features as of a version, the latest by default."""
+    version = request.args.get('version', type=int)
+    conn = get_db()
+    try:
+        batch = feature_store.read_features(conn, version, [student_id])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 404
+    finally:
+        conn.close()
+    
+    return jsonify({
+        'id': student_id,
+        'version': batch.version,
+        'features': feature_store.to_records(batch)[0]
+    })
+
+# Prediction routes
+def performance_label(score):
+    """Map a predicted performance to the label shown by the prediction page."""
+    thresholds = MODEL_CONFIG['performance_thresholds']
+    for name in ('excellent', 'good', 'average'):
+        if score >= thresholds[name]:
+            return name.capitalize()
+    return 'Poor'
+
+@app.route('/api/predict', methods=['POST'])
+@token_required
+def predict_performance(current_user):
+    """Predict performance from prediction form inputs, filling gaps from a stored student."""
+    data = request.get_json(silent=True) or {}
+    stored = None
+    if data.get('student_id'):
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM students WHERE student_id = ?', (data['student_id'],))
+        student = cursor.fetchone()
+        if student:
+            stored = prediction.build_features(conn, [student[0]], attendance_feature)[0][0]
+        conn.close()
+        if not student:
+            return jsonify({'message': 'Student not found'}), 404
+    
+    try:
+        row = prediction.form_features(data, stored)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    model = model_registry.current(get_db)
+    
+    def predict():
+        score = float(model.predict(row[None, :])[0])
+        return {
+            'performance': performance_label(score),
+            'score': round(score, 4),
+            'model_version': model.version,
+            'contributions': model.contributions(row)
+        }
+    
+    return jsonify(prediction_cache.get_or_compute(model, row, predict))
+
+@app.route('/api/outcomes', methods=['POST'])
+@teacher_required
+def record_outcomes(current_user):
+    """Record performance outcomes (0-100) that models are trained against."""
+    data = request.get_json(silent=True) or {}
+    records = data.get('students')
+    if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+        return jsonify({'message': 'students must be a non-empty list of outcome records'}), 400
+    
+    conn = get_db()
+    try:
+        feature_store.resolve_student_codes(conn, records)
+        stored = prediction.record_outcomes(
+            conn, [(r['id'], r.get('score')) for r in records], data.get('source') or f"api:{current_user['email']}"
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    finally:
+        conn.close()
+    
+    return jsonify({'message': 'Outcomes recorded successfully', 'rows': stored}), 201
+
+@app.route('/api/models', methods=['GET'])
+@admin_required
+def get_models(current_user):
+    """List trained prediction models with their cross-validation metrics."""
+    conn = get_db()
+    models = prediction.list_models(conn)
+    conn.close()
+    return jsonify({'models': models, 'prediction_cache': prediction_cache.stats()})
+
+@app.route('/api/models/train', methods=['POST'])
+@admin_required
+def train_model(current_user):
+    """Queue training a model on the recorded outcomes, activating it unless told not to."""
+    data = request.get_json(silent=True) or {}
+    try:
+        folds = int(data.get('folds', MODEL_TRAIN_FOLDS))
+        l2 = float(data.get('l2', MODEL_TRAIN_L2))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'folds must be an integer and l2 a number'}), 400
+    if folds < 2 or l2 < 0:
+        return jsonify({'message': 'folds must be at least 2 and l2 not negative'}), 400
+    
+    return submit_job(current_user, 'train_model', {
+        'folds': folds, 'l2': l2,
+        'feature_version': data.get('feature_version'), 'activate': bool(data.get('activate', True))
+    })
+
+@job_queue.handler('train_model')
+def train_model_job(job, payload):
+    conn = get_db()
+    try:
+        job.progress(0, 'Training on recorded outcomes')
+        return prediction.train(
+            conn, MODEL_CONFIG['prediction_weights'], attendance_feature, payload['folds'], payload['l2'],
+            payload['feature_version'], payload['activate']
+        )
+    except ValueError as e:
+        # Too few outcomes or an unknown feature version; retrying will not help
+        raise jobs.JobError(str(e))
+    finally:
+        conn.close()
+
+@app.route('/api/models/<int:version>/activate', methods=['POST'])
+@admin_required
+def activate_model(current_user, version):
+    """Serve an earlier or newly trained model; workers switch within MODEL_SYNC_SECONDS."""
+    conn = get_db()
+    found = prediction.activate_model(conn, version)
+    conn.close()
+    if not found:
+        return jsonify({'message': 'Model not found'}), 404
+    return jsonify({'message': f'Model {version} activated', 'version': version})
+
 # Students routes
 @app.route('/api/students', methods=['GET'])
 @token_required
 def get_students(current_user):
     """Get all students."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('SELECT id, name, student_id, email, avatar FROM students ORDER BY name')
@@ -457,7 +1334,7 @@ def add_student(current_user):
     if not data or not data.get('name') or not data.get('student_id'):
         return jsonify({'message': 'Name and student ID are required'}), 400
     
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Check if student ID already exists
@@ -478,6 +1355,15 @@ def add_student(current_user):
     conn.commit()
     conn.close()
     
+    event_broker.publish('student', {
+        'id': student_id,
+        'name': data['name'],
+        'student_id': data['student_id'],
+        'email': data.get('email'),
+        'avatar': avatar
+    })
+    event_broker.publish('stats', {'total_students': 1})
+    
     return jsonify({
         'message': 'Student added successfully',
         'student_id': student_id
@@ -488,7 +1374,7 @@ def add_student(current_user):
 @token_required
 def get_courses(current_user):
     """Get all courses."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -500,9 +1386,11 @@ def get_courses(current_user):
             c.room,
             c.section,
             c.max_students,
-            u.name as professor_name
+            u.name as professor_name,
+            COALESCE(s.enrolled, 0)
         FROM courses c
         LEFT JOIN users u ON c.professor_id = u.id
+        LEFT JOIN course_seats s ON s.course_id = c.id
         ORDER BY c.abbreviation
     ''')
     
@@ -516,7 +1404,8 @@ def get_courses(current_user):
             'room': row[4],
             'section': row[5],
             'max_students': row[6],
-            'professor_name': row[7]
+            'professor_name': row[7],
+            'enrolled': row[8]
         })
     
     conn.close()
@@ -532,7 +1421,7 @@ def add_course(current_user):
     if not data or not data.get('abbreviation') or not data.get('title'):
         return jsonify({'message': 'Abbreviation and title are required'}), 400
     
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -552,17 +1441,147 @@ def add_course(current_user):
     conn.commit()
     conn.close()
     
+    event_broker.publish('stats', {'total_courses': 1})
+    
     return jsonify({
         'message': 'Course added successfully',
         'course_id': course_id
     }), 201
 
+# Enrollment routes
+def publish_enrollment(course_id, changes):
+    """Tell a course's subscribers the enrollment status of students a request touched."""
+    if changes:
+        event_broker.publish('enrollment', {
+            'course_id': course_id,
+            'changes': [{'student_id': student_id, 'status': status} for student_id, status in changes.items()]
+        }, course_id)
+
+@app.route('/api/courses/<int:course_id>/roster', methods=['GET'])
+@token_required
+def get_course_roster(current_user, course_id):
+    """Get a course's enrolled students, or its waitlist in queue order with status=waitlisted."""
+    status = request.args.get('status', 'enrolled')
+    if status not in ('enrolled', 'waitlisted'):
+        return jsonify({'message': 'status must be enrolled or waitlisted'}), 400
+    
+    conn = get_db()
+    counts = enrollments.seat_counts(conn, course_id)
+    students = enrollments.roster(conn, course_id, status) if counts else None
+    conn.close()
+    
+    if not counts:
+        return jsonify({'message': 'Course not found'}), 404
+    return jsonify({
+        'course_id': course_id,
+        'max_students': counts[0],
+        'enrolled': counts[1],
+        'waitlisted': counts[2],
+        'students': students
+    })
+
+@app.route('/api/courses/<int:course_id>/roll-call', methods=['GET'])
+@token_required
+def get_roll_call(current_user, course_id):
+    """Get a course's roll-call sheet for a date (default today) with each student's recent attendance."""
+    try:
+        day = analytics.parse_date(request.args['date']) if 'date' in request.args else datetime.now().date()
+    except ValueError:
+        return jsonify({'message': 'Dates must be YYYY-MM-DD'}), 400
+    
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT abbreviation, title FROM courses WHERE id = ?', (course_id,))
+        course = cursor.fetchone()
+        if not course:
+            return jsonify({'message': 'Course not found'}), 404
+        sheet = roll_call_sheets.get(conn, course_id, day)
+    finally:
+        conn.close()
+    
+    return jsonify({**sheet, 'abbreviation': course[0], 'title': course[1]})
+
+@app.route('/api/courses/<int:course_id>/enrollments', methods=['POST'])
+@teacher_required
+def enroll_students(current_user, course_id):
+    """Enroll students while seats last; the rest join the waitlist in the order given."""
+    data = request.get_json(silent=True) or {}
+    student_ids = data.get('student_ids', [data['student_id']] if 'student_id' in data else None)
+    if (not isinstance(student_ids, list) or not student_ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in student_ids)):
+        return jsonify({'message': 'student_ids must be a non-empty list of student ids'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT 1 FROM courses WHERE id = ?', (course_id,))
+        if not cursor.fetchone():
+            return jsonify({'message': 'Course not found'}), 404
+        cursor.execute(f"SELECT id FROM students WHERE id IN ({', '.join('?' * len(set(student_ids)))})",
+                       list(set(student_ids)))
+        unknown = set(student_ids) - {row[0] for row in cursor.fetchall()}
+        if unknown:
+            return jsonify({'message': f'Unknown students: {sorted(unknown)}'}), 400
+        statuses, promoted = enrollments.enroll(conn, course_id, student_ids)
+    finally:
+        conn.close()
+    
+    publish_enrollment(course_id, {**statuses, **{student_id: 'enrolled' for student_id in promoted}})
+    return jsonify({
+        'message': 'Enrollment processed',
+        'enrolled': [i for i in statuses if statuses[i] == 'enrolled'],
+        'waitlisted': [i for i in statuses if statuses[i] == 'waitlisted'],
+        'promoted': promoted
+    }), 201
+
+@app.route('/api/courses/<int:course_id>/enrollments/<int:student_id>', methods=['DELETE'])
+@teacher_required
+def drop_enrollment(current_user, course_id, student_id):
+    """Drop a student from a course or its waitlist; a freed seat goes to the waitlist."""
+    conn = get_db()
+    previous, promoted = enrollments.drop(conn, course_id, student_id)
+    conn.close()
+    
+    if previous is None:
+        return jsonify({'message': 'Enrollment not found'}), 404
+    publish_enrollment(course_id, {student_id: 'dropped', **{i: 'enrolled' for i in promoted}})
+    return jsonify({'message': 'Enrollment dropped', 'previous_status': previous, 'promoted': promoted})
+
+@app.route('/api/courses/<int:course_id>/capacity', methods=['PUT'])
+@admin_required
+def update_course_capacity(current_user, course_id):
+    """Change a course's max_students; raising it promotes the waitlist at once."""
+    data = request.get_json(silent=True) or {}
+    max_students = data.get('max_students')
+    if max_students is not None and (not isinstance(max_students, int) or isinstance(max_students, bool)
+                                     or max_students < 0):
+        return jsonify({'message': 'max_students must be a non-negative integer, or null for no limit'}), 400
+    
+    conn = get_db()
+    promoted = enrollments.set_capacity(conn, course_id, max_students)
+    conn.close()
+    
+    if promoted is None:
+        return jsonify({'message': 'Course not found'}), 404
+    publish_enrollment(course_id, {i: 'enrolled' for i in promoted})
+    return jsonify({'message': 'Capacity updated', 'max_students': max_students, 'promoted': promoted})
+
+@app.route('/api/students/<int:student_id>/courses', methods=['GET'])
+@token_required
+def get_student_courses(current_user, student_id):
+    """Get the courses a student is enrolled or waitlisted in."""
+    conn = get_db()
+    courses = enrollments.student_courses(conn, student_id)
+    conn.close()
+    return jsonify(courses)
+
 # Calendar routes
 @app.route('/api/calendar/events', methods=['GET'])
 @token_required
 def get_calendar_events(current_user):
     """Get calendar events."""
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get courses with schedule information
@@ -607,7 +1626,7 @@ def update_profile(current_user):
     """Update user profile."""
     data = request.get_json()
     
-    conn = sqlite3.connect('academia_ai.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Update user information
@@ -637,6 +1656,342 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+# Admin profiling routes
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def profile_worker(current_user):
+    """Sample every thread of this worker for N seconds."""
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        seconds = float(data.get('seconds', 10))
+        interval_ms = float(data.get('interval_ms', PROFILE_SAMPLE_INTERVAL_MS))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'seconds and interval_ms must be numbers'}), 400
+    
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return jsonify({'message': f'seconds must be between 0 and {PROFILE_MAX_SECONDS}'}), 400
+    if interval_ms <= 0:
+        return jsonify({'message': 'interval_ms must be positive'}), 400
+    
+    try:
+        profiler, path = profiling.sample_worker(seconds, interval_ms / 1000, PROFILE_OUTPUT_DIR)
+    except profiling.ProfilerBusy:
+        return jsonify({'message': 'A profiling session is already running'}), 409
+    
+    return jsonify({
+        'message': 'Profile captured successfully',
+        'profile': path.name,
+        'pid': os.getpid(),
+        'duration': round(profiler.duration, 3),
+        'samples': profiler.sample_count,
+        'format': 'collapsed'
+    })
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def get_profiles(current_user):
+    """List captured profiles."""
+    return jsonify(profiling.list_profiles(PROFILE_OUTPUT_DIR))
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def download_profile(current_user, name):
+    """Download a captured profile in collapsed stack format."""
+    return send_from_directory(PROFILE_OUTPUT_DIR, name, mimetype='text/plain', as_attachment=True)
+
+# Admin maintenance routes
+@app.route('/api/admin/maintenance', methods=['POST'])
+@admin_required
+def run_maintenance(current_user):
+    """Queue backup, vacuum and archive tasks to run now."""
+    data = request.get_json(silent=True) or {}
+    tasks = data.get('tasks') or list(maintenance.TASKS)
+    if not isinstance(tasks, list) or any(task not in maintenance.TASKS for task in tasks):
+        return jsonify({'message': f"tasks must be a list of: {', '.join(maintenance.TASKS)}"}), 400
+    
+    return submit_job(current_user, 'maintenance', {'tasks': tasks}, priority=-10)
+
+@job_queue.handler('maintenance')
+def maintenance_job(job, payload):
+    job.progress(0, f"Running {', '.join(payload['tasks'])}")
+    return maintenance_runner.run(payload['tasks'])
+
+@app.route('/api/admin/archive', methods=['GET'])
+@admin_required
+def get_archived_attendance(current_user):
+    """Get archived attendance rows for a date range, or a per-term summary without one."""
+    conn = get_db()
+    try:
+        if 'start' not in request.args and 'end' not in request.args:
+            return jsonify({'terms': maintenance.archive_summary(conn)})
+        start = analytics.parse_date(request.args['start']) if 'start' in request.args else None
+        end = analytics.parse_date(request.args['end']) if 'end' in request.args else None
+        rows = maintenance.archived_attendance(
+            conn, start, end, request.args.get('student_id', type=int), request.args.get('course_id', type=int)
+        )
+    except ValueError:
+        return jsonify({'message': 'Dates must be YYYY-MM-DD'}), 400
+    finally:
+        conn.close()
+    
+    return jsonify({'total': len(rows), 'attendance': rows})
+
+# Background job routes
+def submit_job(current_user, kind, payload=None, priority=0):
+    """Queue a job for the active tenant and answer 202 with where to poll it."""
+    data = request.get_json(silent=True) or {}
+    priority = data.get('priority', priority)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        return jsonify({'message': 'priority must be an integer'}), 400
+    
+    conn = get_db()
+    job = job_queue.submit(conn, kind, payload, priority, created_by=current_user['id'])
+    conn.close()
+    
+    response = jsonify({'message': 'Job queued', 'job': job})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response
+
+def visible_job(conn, current_user, job_id):
+    """Return a job if the user may see it: admins see every job, others their own."""
+    job = jobs.get_job(conn, job_id)
+    if job and (current_user['role'] == 'admin' or job['created_by'] == current_user['id']):
+        return job
+    return None
+
+@app.route('/api/jobs', methods=['GET'])
+@token_required
+def get_jobs(current_user):
+    """List recent background jobs, optionally by status."""
+    status = request.args.get('status')
+    if status is not None and status not in jobs.STATUSES:
+        return jsonify({'message': f"status must be one of: {', '.join(jobs.STATUSES)}"}), 400
+    limit = request.args.get('limit', 50, type=int)
+    
+    conn = get_db()
+    job_list = jobs.list_jobs(
+        conn, status, None if current_user['role'] == 'admin' else current_user['id'], max(1, min(limit, 200))
+    )
+    conn.close()
+    return jsonify({'jobs': job_list})
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_job(current_user, job_id):
+    """Get a background job's status, progress and, once finished, its result or error."""
+    conn = get_db()
+    job = visible_job(conn, current_user, job_id)
+    conn.close()
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<int:job_id>', methods=['DELETE'])
+@token_required
+def cancel_job(current_user, job_id):
+    """Cancel a queued or running job; running ones stop at their next progress report."""
+    conn = get_db()
+    try:
+        job = visible_job(conn, current_user, job_id)
+        if not job:
+            return jsonify({'message': 'Job not found'}), 404
+        if job['status'] in jobs.FINISHED:
+            return jsonify({'message': f"Job already {job['status']}", 'job': job}), 409
+        job = jobs.cancel(conn, job_id)
+    finally:
+        conn.close()
+    
+    if job['status'] != 'cancelled':
+        # Finished while we were looking
+        return jsonify({'message': f"Job already {job['status']}", 'job': job}), 409
+    return jsonify({'message': 'Job cancelled', 'job': job})
+
+# Audit routes
+@app.route('/api/audit/attendance', methods=['GET'])
+@admin_required
+def get_attendance_audit(current_user):
+    """Get the history of attendance changes, newest first, by student, course and attendance date."""
+    try:
+        start = analytics.parse_date(request.args['start']) if 'start' in request.args else None
+        end = analytics.parse_date(request.args['end']) if 'end' in request.args else None
+    except ValueError:
+        return jsonify({'message': 'Dates must be YYYY-MM-DD'}), 400
+    limit = request.args.get('limit', 1000, type=int)
+    
+    # Changes made through this worker are visible at once; other workers' within AUDIT_FLUSH_SECONDS
+    db_path = tenant_registry.current().db_path
+    audit_writer.flush(db_path)
+    conn = get_db()
+    entries = audit.query(
+        conn, request.args.get('student_id', type=int), request.args.get('course_id', type=int),
+        start, end, max(1, min(limit, 10000))
+    )
+    conn.close()
+    return jsonify({'total': len(entries), 'changes': entries})
+
+# Metrics endpoint
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Expose request and SQL metrics in Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Scheduled jobs
+# Every worker runs them for every tenant; claim_run lets one worker per tenant run each interval
+def scheduled_risk_run(handle):
+    conn = get_db()
+    try:
+        risk_pipeline.run(conn, min_interval=RISK_PIPELINE_INTERVAL_SECONDS * 0.9)
+    finally:
+        conn.close()
+
+def scheduled_maintenance(handle):
+    if maintenance_runner.run(min_interval=MAINTENANCE_INTERVAL_SECONDS * 0.9) is None:
+        return
+    conn = get_db()
+    try:
+        jobs.purge_finished(conn, time.time() - JOB_RETENTION_DAYS * 24 * 60 * 60)
+        sync.purge(conn, SYNC_WINDOW_DAYS)
+    finally:
+        conn.close()
+
+# When each job thread last looked at every tenant rather than just the open ones
+last_full_job_sweep = {}
+
+def sweep_jobs(worker):
+    """Run at most one queued job per tenant; returns how many ran."""
+    now = time.monotonic()
+    names = tenant_registry.open_names()
+    if now - last_full_job_sweep.get(worker, float('-inf')) >= JOB_SWEEP_ALL_SECONDS:
+        last_full_job_sweep[worker] = now
+        names = None
+    
+    def run_next_job(handle):
+        conn = get_db()
+        try:
+            return job_queue.run_next(conn, worker)
+        finally:
+            conn.close()
+    
+    return sum(tenant_registry.run_each(run_next_job, names).values())
+
+# Frontend routes
+# Loaded by start_background_services(), or by the first request for a page or asset
+asset_manifest = None
+built_assets = set()
+assets_lock = threading.Lock()
+
+def load_assets():
+    """Build the frontend assets, or load the existing build when STATIC_BUILD_ON_START is off."""
+    global asset_manifest, built_assets
+    with assets_lock:
+        if asset_manifest is not None:
+            return asset_manifest
+        if STATIC_BUILD_ON_START:
+            manifest = static_assets.ensure_built(FRONTEND_DIR, STATIC_ASSET_DIRS, STATIC_BUILD_DIR, STATIC_OPTIMIZE)
+        else:
+            manifest = static_assets.load_manifest(STATIC_BUILD_DIR)
+            if manifest is None:
+                raise RuntimeError(f'No built assets in {STATIC_BUILD_DIR}; run static_assets.py before starting the app')
+        built_assets = set(manifest['assets'].values())
+        asset_manifest = manifest
+        return manifest
+
+background_services_started = False
+
+def start_background_services():
+    """Build the frontend assets and start the schedulers, audit writer and job workers.
+
+    Entry points call this once before serving; importing the app alone,
+    as tests, benchmarks and tools do, starts no threads.
+    """
+    global background_services_started
+    if background_services_started:
+        return
+    background_services_started = True
+    load_assets()
+    if RISK_PIPELINE_INTERVAL_SECONDS > 0:
+        tenant_registry.start_scheduler(scheduled_risk_run, RISK_PIPELINE_INTERVAL_SECONDS)
+    if MAINTENANCE_INTERVAL_SECONDS > 0:
+        tenant_registry.start_scheduler(scheduled_maintenance, MAINTENANCE_INTERVAL_SECONDS)
+    if AUDIT_FLUSH_SECONDS > 0:
+        audit_writer.start()
+    if JOB_WORKERS > 0:
+        job_queue.start_workers(JOB_WORKERS, JOB_POLL_SECONDS, sweep_jobs)
+
+# Rendered pages keyed by filename: (source mtime, etag, html, gzipped html)
+page_cache = {}
+
+def render_page(filename):
+    """Return a frontend page with asset references rewritten to fingerprinted URLs."""
+    path = FRONTEND_DIR / filename
+    mtime = path.stat().st_mtime
+    cached = page_cache.get(filename)
+    if cached and cached[0] == mtime:
+        return cached
+    
+    html = static_assets.rewrite_references(
+        path.read_text(encoding='utf-8'), load_assets(), STATIC_URL_PREFIX, page=filename
+    )
+    body = html.encode('utf-8')
+    cached = (mtime, static_assets.fingerprint(body), body, gzip.compress(body, mtime=0))
+    page_cache[filename] = cached
+    return cached
+
+@app.route('/', methods=['GET'])
+def serve_index():
+    """Serve the frontend landing page."""
+    return serve_page('index')
+
+@app.route('/<page>.html', methods=['GET'])
+def serve_page(page):
+    """Serve a frontend page."""
+    filename = f'{page}.html'
+    if not (FRONTEND_DIR / filename).is_file():
+        return jsonify({'message': 'Resource not found'}), 404
+    
+    _, etag, body, gzipped = render_page(filename)
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(gzipped, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='text/html')
+    
+    # Pages must be revalidated so new asset fingerprints are picked up
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response.make_conditional(request)
+
+@app.route(f'{STATIC_URL_PREFIX}/<path:filename>', methods=['GET'])
+def serve_static(filename):
+    """Serve a fingerprinted asset, preferring a pre-compressed variant."""
+    load_assets()
+    if filename in built_assets:
+        built, cache_control = filename, f'public, max-age={STATIC_MAX_AGE}, immutable'
+    elif filename in asset_manifest['assets']:
+        # Unfingerprinted name, e.g. from a hand-written link
+        built, cache_control = asset_manifest['assets'][filename], 'no-cache'
+    else:
+        return jsonify({'message': 'Resource not found'}), 404
+    
+    encoding, stored = static_assets.choose_encoding(
+        request.headers.get('Accept-Encoding'), STATIC_BUILD_DIR, built
+    )
+    mimetype = mimetypes.guess_type(built)[0] or 'application/octet-stream'
+    
+    # send_from_directory hands the open file to wsgi.file_wrapper, which
+    # servers such as gunicorn turn into a zero-copy sendfile()
+    response = send_from_directory(
+        STATIC_BUILD_DIR, stored, mimetype=mimetype, download_name=os.path.basename(built)
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -649,4 +2004,5 @@ def internal_error(error):
 if __name__ == '__main__':
     print("Academia AI - Education Management System Backend")
     print("Starting server...")
+    start_background_services()
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for Academia AI Backend
+Serves the same Flask routes from an asyncio event loop. Route handlers and
+their blocking SQLite work run on a bounded thread pool, while live event
+streams are awaited on the loop and hold no thread while idle.
+
+Run with any ASGI server, e.g.:
+    cd backend && uvicorn asgi:application --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from config.config import ASGI_WORKER_THREADS, EVENTS_HEARTBEAT_SECONDS
+from app import app, start_background_services
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope and its request body into a WSGI environ."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI carries paths as latin-1 decoded bytes
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'content-length':
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def dispatch(flask_app, environ):
+    """Run a request through Flask and return the finished response object.
+
+    Mirrors ``Flask.wsgi_app`` so before/after/teardown hooks behave exactly
+    as under a WSGI server, but hands back the response instead of calling
+    it, so the caller can decide how to send the body.
+    """
+    ctx = flask_app.request_context(environ)
+    error = None
+    try:
+        try:
+            ctx.push()
+            response = flask_app.full_dispatch_request()
+        except Exception as e:
+            error = e
+            response = flask_app.handle_exception(e)
+        except:  # noqa: E722 - propagate but still pop the context
+            error = sys.exc_info()[1]
+            raise
+        return response
+    finally:
+        if error is not None and flask_app.should_ignore_error(error):
+            error = None
+        ctx.pop(error)
+
+
+class AsyncApp:
+    """ASGI application wrapping the Flask app."""
+
+    def __init__(self, flask_app, worker_threads=ASGI_WORKER_THREADS, heartbeat=EVENTS_HEARTBEAT_SECONDS):
+        self.flask_app = flask_app
+        self.heartbeat = heartbeat
+        self.worker_threads = worker_threads
+        self.executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix='academia-asgi')
+        self._slots = None
+        # dispatch() bypasses wsgi_app, so apply the app's ProxyFix to each environ here
+        fix = flask_app.wsgi_app if isinstance(flask_app.wsgi_app, ProxyFix) else None
+        self.proxy_fix = fix and ProxyFix(
+            lambda environ, start_response: environ, fix.x_for, fix.x_proto, fix.x_host, fix.x_port, fix.x_prefix
+        )
+
+    async def run_sync(self, func, *args):
+        """Run blocking ``func`` on the worker pool.
+
+        Waiting for a slot happens on the event loop, so a burst of requests
+        queues as cheap coroutines instead of piling up in the executor.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.worker_threads)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise NotImplementedError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    start_background_services()
+                except Exception as exc:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(exc)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        environ = build_environ(scope, bytes(body))
+        if self.proxy_fix is not None:
+            environ = self.proxy_fix(environ, None)
+        response = await self.run_sync(dispatch, self.flask_app, environ)
+
+        subscription = getattr(response, 'event_subscription', None)
+        if subscription is not None:
+            # Closing the Flask response unsubscribes, so always close it
+            try:
+                await self._start(send, response.status_code, response.headers.to_wsgi_list())
+                chunks = response.event_broker.stream_async(subscription, self.heartbeat)
+                await self._send_until_disconnect(receive, send, chunks)
+            finally:
+                response.close()
+            return
+
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        # In-memory bodies are sent straight from the loop; only streamed ones may block
+        in_memory = response.is_sequence
+        try:
+            await self._start(send, int(status.split(' ', 1)[0]), headers)
+            iterator = iter(app_iter)
+            while True:
+                chunk = next(iterator, None) if in_memory else await self.run_sync(next, iterator, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(app_iter, 'close'):
+                if in_memory:
+                    app_iter.close()
+                else:
+                    await self.run_sync(app_iter.close)
+
+    async def _start(self, send, status_code, headers):
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+
+    async def _send_until_disconnect(self, receive, send, chunks):
+        """Send text chunks from an async iterator until it ends or the client goes away."""
+        async def pump():
+            async for chunk in chunks:
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(wait_for_disconnect())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await chunks.aclose()
+
+
+application = AsyncApp(app)
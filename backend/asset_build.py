@@ -0,0 +1,518 @@
+"""
+Asset optimisation for Academia AI Backend
+Minifies the frontend's JavaScript and CSS, splits global.js into a shared
+core plus per-page bundles, and strips CSS rules no page can match.
+"""
+
+import gzip
+import re
+from pathlib import Path
+
+CORE_BUNDLE = 'core'
+
+# Page bundles smaller than this are folded into the core to save a request
+MIN_PAGE_BUNDLE_BYTES = 1024
+
+# Words after which a '/' starts a regular expression rather than a division
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw'}
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+
+# Whitespace next to these characters can always be dropped
+_JS_TIGHT = re.compile(r' ?([{}()\[\];,:=&|?]) ?')
+# Line breaks after '{;,([=:?&|' or before '})],.;:?&|' are never statement boundaries
+_JS_JOIN = re.compile(r'(?<=[{;,(\[=:?&|])\n|\n(?=[})\],.;:?&|])')
+
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_$][\w$]*')
+_CLASS_TOKEN_RE = re.compile(r'[A-Za-z_][\w-]*')
+_FUNCTION_RE = re.compile(r'^(?:\s*//[^\n]*\n|\s*/\*.*?\*/)*\s*(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)', re.S)
+_PAGE_DISPATCH_RE = re.compile(r"case\s+'([\w-]+\.html)'\s*:\s*([A-Za-z_$][\w$]*)\s*\(\s*\)")
+_INLINE_SCRIPT_RE = re.compile(r'<script(?![^>]*\bsrc=)[^>]*>(.*?)</script>', re.S | re.I)
+_EVENT_ATTR_RE = re.compile(r'\son\w+\s*=\s*"([^"]*)"', re.I)
+_CLASS_ATTR_RE = re.compile(r'\sclass\s*=\s*"([^"]*)"', re.I)
+_ID_ATTR_RE = re.compile(r'\sid\s*=\s*"([^"]*)"', re.I)
+_UNQUOTED_RE = re.compile(r'[^\'"]*')
+
+
+# JavaScript scanning
+
+def _skip_quoted(src, i, quote):
+    j = i + 1
+    while j < len(src):
+        if src[j] == '\\':
+            j += 2
+        elif src[j] == quote:
+            return j + 1
+        elif src[j] == '\n' and quote != '`':
+            return j
+        else:
+            j += 1
+    return j
+
+
+def _skip_template(src, i):
+    j = i + 1
+    while j < len(src):
+        c = src[j]
+        if c == '\\':
+            j += 2
+        elif c == '`':
+            return j + 1
+        elif c == '$' and src.startswith('{', j + 1):
+            j = _skip_braces(src, j + 2)
+        else:
+            j += 1
+    return j
+
+
+def _skip_braces(src, j):
+    """Return the index just past the '}' closing a template expression."""
+    depth = 1
+    while j < len(src) and depth:
+        c = src[j]
+        if c in '\'"':
+            j = _skip_quoted(src, j, c)
+            continue
+        if c == '`':
+            j = _skip_template(src, j)
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        j += 1
+    return j
+
+
+def _skip_regex(src, i):
+    """Return the end of a regex literal starting at ``i``, or None if it is not one."""
+    j, in_class = i + 1, False
+    while j < len(src):
+        c = src[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '\n':
+            return None
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            j += 1
+            while j < len(src) and src[j].isalpha():
+                j += 1
+            return j
+        j += 1
+    return None
+
+
+def tokenize_js(src):
+    """Split JavaScript into ('code' | 'string' | 'regex' | 'comment', text) tokens."""
+    tokens = []
+    code_start = i = 0
+    last_word, last_char = '', ''
+
+    def flush(end):
+        if end > code_start:
+            tokens.append(('code', src[code_start:end]))
+
+    while i < len(src):
+        c = src[i]
+        end, kind = None, None
+        if c == '/' and src.startswith('//', i):
+            end = src.find('\n', i)
+            end, kind = (len(src) if end == -1 else end), 'comment'
+        elif c == '/' and src.startswith('/*', i):
+            end = src.find('*/', i + 2)
+            end, kind = (len(src) if end == -1 else end + 2), 'comment'
+        elif c in '\'"':
+            end, kind = _skip_quoted(src, i, c), 'string'
+        elif c == '`':
+            end, kind = _skip_template(src, i), 'string'
+        elif c == '/' and (last_char in _REGEX_PRECEDERS or last_word in _REGEX_KEYWORDS or not last_char):
+            end = _skip_regex(src, i)
+            kind = 'regex' if end else None
+
+        if kind:
+            flush(i)
+            tokens.append((kind, src[i:end]))
+            if kind != 'comment':
+                last_char, last_word = ')', ''
+            code_start = i = end
+            continue
+
+        if c.isalnum() or c in '_$':
+            match = _IDENTIFIER_RE.match(src, i)
+            if match:
+                last_word, last_char = match.group(0), 'a'
+                i = match.end()
+                continue
+        if not c.isspace():
+            last_char, last_word = c, ''
+        i += 1
+
+    flush(len(src))
+    return tokens
+
+
+def _minify_code(text):
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r' ?\n\s*', '\n', text)
+    text = _JS_TIGHT.sub(r'\1', text)
+    return _JS_JOIN.sub('', text)
+
+
+def minify_js(src):
+    """Strip comments and redundant whitespace while keeping statement-ending newlines."""
+    parts = []
+    for kind, text in tokenize_js(src):
+        if kind == 'comment':
+            text = '\n' if '\n' in text or text.startswith('//') else ' '
+            kind = 'code'
+        if kind == 'code' and parts and parts[-1][0] == 'code':
+            # Merge neighbouring code so whitespace rules see whole runs
+            parts[-1] = ('code', parts[-1][1] + text)
+        else:
+            parts.append((kind, text))
+
+    result = ''.join(_minify_code(text) if kind == 'code' else text for kind, text in parts)
+    return result.strip() + '\n'
+
+
+def split_top_level(src):
+    """Split a script into top-level statements, keeping leading comments attached."""
+    chunks = []
+    depth = 0
+    chunk_start = 0
+    offset = 0
+    for kind, text in tokenize_js(src):
+        if kind == 'code':
+            for index, c in enumerate(text):
+                if c in '({[':
+                    depth += 1
+                elif c in ')}]':
+                    depth -= 1
+                if depth == 0 and c in ';}':
+                    # A statement ends here only if nothing but a comment follows on the line
+                    position = offset + index + 1
+                    line_end = src.find('\n', position)
+                    line_end = len(src) if line_end == -1 else line_end + 1
+                    rest = src[position:line_end].strip()
+                    if rest and not rest.startswith('//'):
+                        continue
+                    chunks.append(src[chunk_start:line_end])
+                    chunk_start = line_end
+        offset += len(text)
+    if src[chunk_start:].strip():
+        chunks.append(src[chunk_start:])
+    return chunks
+
+
+def _identifiers(text):
+    return set(_IDENTIFIER_RE.findall(text))
+
+
+def split_bundles(src, pages):
+    """Split ``src`` into a shared core and per-page bundles.
+
+    ``pages`` maps page filenames to the inline JavaScript they contain.
+    Page entry points are read from the ``case 'page.html': initX()`` dispatch
+    in the script. Functions reachable from more than one page go to the core;
+    functions no statement or page can reach are dropped.
+    Returns ({bundle name: source}, [dropped function names]).
+    """
+    chunks = split_top_level(src)
+    functions = {}
+    statements = []
+    order = []
+    for chunk in chunks:
+        match = _FUNCTION_RE.match(chunk)
+        if match:
+            # Later declarations win in JavaScript, so keep duplicates together
+            functions.setdefault(match.group(1), []).append(chunk)
+            order.append(('function', match.group(1), chunk))
+        else:
+            statements.append(chunk)
+            order.append(('statement', None, chunk))
+
+    names = set(functions)
+    calls = {name: (_identifiers(''.join(bodies)) & names) - {name} for name, bodies in functions.items()}
+    entries = {page: entry for page, entry in _PAGE_DISPATCH_RE.findall(src) if entry in names}
+    entry_names = set(entries.values())
+
+    def reachable(roots, stop):
+        seen, stack = set(), [root for root in roots if root not in stop]
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            stack.extend(callee for callee in calls[name] if callee not in seen and callee not in stop)
+        return seen
+
+    core_roots = set()
+    for statement in statements:
+        core_roots |= _identifiers(statement) & names
+    core = reachable(core_roots, entry_names)
+
+    page_functions = {}
+    for page, inline_js in pages.items():
+        roots = _identifiers(inline_js) & names
+        if page in entries:
+            roots.add(entries[page])
+        page_functions[page] = reachable(roots, core)
+
+    usage = {}
+    for found in page_functions.values():
+        for name in found:
+            usage[name] = usage.get(name, 0) + 1
+    shared = {name for name, count in usage.items() if count > 1}
+    core |= shared
+
+    bundles = {CORE_BUNDLE: []}
+    owner = {name: CORE_BUNDLE for name in core}
+    for page, found in page_functions.items():
+        bundle = Path(page).stem
+        bundles[bundle] = []
+        for name in found - core:
+            owner[name] = bundle
+
+    for kind, name, chunk in order:
+        if kind == 'statement':
+            bundles[CORE_BUNDLE].append(chunk)
+        elif name in owner:
+            bundles[owner[name]].append(chunk)
+
+    dropped = sorted(names - set(owner))
+    return {bundle: ''.join(parts) for bundle, parts in bundles.items()}, dropped
+
+
+# CSS processing
+
+def _strip_css_comments(css):
+    return re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+
+
+def _css_blocks(css):
+    """Yield (prelude, body) pairs for the top-level rules of ``css``; body is None for statements."""
+    i = 0
+    while i < len(css):
+        brace = css.find('{', i)
+        semicolon = css.find(';', i)
+        if brace == -1 and semicolon == -1:
+            break
+        if semicolon != -1 and (brace == -1 or semicolon < brace):
+            yield css[i:semicolon].strip(), None
+            i = semicolon + 1
+            continue
+        depth, j = 1, brace + 1
+        while j < len(css) and depth:
+            if css[j] in '\'"':
+                j = _skip_quoted(css, j, css[j])
+                continue
+            if css[j] == '{':
+                depth += 1
+            elif css[j] == '}':
+                depth -= 1
+            j += 1
+        yield css[i:brace].strip(), css[brace + 1:j - 1]
+        i = j
+
+
+def _split_outside(text, separator):
+    """Split ``text`` on ``separator`` where it is outside quotes and parentheses."""
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(text):
+        c = text[i]
+        if c in '\'"':
+            i = _skip_quoted(text, i, c)
+            continue
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _collapse_whitespace(text):
+    """Collapse whitespace runs outside quoted strings."""
+    out, i = [], 0
+    while i < len(text):
+        if text[i] in '\'"':
+            end = _skip_quoted(text, i, text[i])
+        else:
+            end = _UNQUOTED_RE.match(text, i).end()
+            out.append(re.sub(r'\s+', ' ', text[i:end]))
+            i = end
+            continue
+        out.append(text[i:end])
+        i = end
+    return ''.join(out).strip()
+
+
+def _minify_declarations(body):
+    declarations = []
+    for declaration in _split_outside(body, ';'):
+        declaration = _collapse_whitespace(declaration)
+        if not declaration:
+            continue
+        prop, _, value = declaration.partition(':')
+        declarations.append(f'{prop.strip()}:{value.strip()}')
+    return ';'.join(declarations)
+
+
+def _minify_selector(selector):
+    selector = ' '.join(selector.split())
+    return re.sub(r'\s*([>+~,])\s*', r'\1', selector)
+
+
+def selector_is_used(selector, used_names, used_prefixes):
+    """Return True if every class and id in ``selector`` may appear on some page."""
+    required = re.sub(r':not\([^)]*\)', '', selector)
+    required = re.sub(r'\[[^\]]*\]', '', required)
+    for name in re.findall(r'[.#](-?[_a-zA-Z][\w-]*)', required):
+        if name not in used_names and not any(name.startswith(prefix) for prefix in used_prefixes):
+            return False
+    return True
+
+
+def process_css(css, used_names=None, used_prefixes=()):
+    """Minify ``css``; when ``used_names`` is given also drop rules no page can match."""
+    out = []
+    for prelude, body in _css_blocks(_strip_css_comments(css)):
+        if body is None:
+            out.append(' '.join(prelude.split()) + ';')
+        elif prelude.startswith(('@media', '@supports', '@layer', '@container')):
+            inner = process_css(body, used_names, used_prefixes)
+            if inner:
+                out.append(f"{' '.join(prelude.split())}{{{inner}}}")
+        elif prelude.startswith('@'):
+            if prelude.startswith(('@keyframes', '@-webkit-keyframes')):
+                frames = ''.join(
+                    f'{_minify_selector(frame)}{{{_minify_declarations(decls)}}}'
+                    for frame, decls in _css_blocks(body) if decls is not None
+                )
+                out.append(f"{' '.join(prelude.split())}{{{frames}}}")
+            else:
+                out.append(f"{' '.join(prelude.split())}{{{_minify_declarations(body)}}}")
+        else:
+            selectors = [s.strip() for s in prelude.split(',') if s.strip()]
+            if used_names is not None:
+                selectors = [s for s in selectors if selector_is_used(s, used_names, used_prefixes)]
+            declarations = _minify_declarations(body)
+            if selectors and declarations:
+                out.append(f"{_minify_selector(','.join(selectors))}{{{declarations}}}")
+    return ''.join(out)
+
+
+def collect_used_names(html_pages, scripts):
+    """Return (names, prefixes) of every class and id a page or script may use."""
+    names, prefixes = set(), set()
+    scripts = list(scripts)
+    for html in html_pages:
+        for attribute in _CLASS_ATTR_RE.findall(html):
+            names.update(attribute.split())
+        names.update(_ID_ATTR_RE.findall(html))
+        scripts.extend(_INLINE_SCRIPT_RE.findall(html))
+        scripts.extend(_EVENT_ATTR_RE.findall(html))
+    for script in scripts:
+        for token in _CLASS_TOKEN_RE.findall(script):
+            # Fragments such as `toast--${type}` are class name prefixes
+            (prefixes if token.endswith('-') else names).add(token)
+    return names, prefixes
+
+
+# Build entry point
+
+def gzip_size(content):
+    return len(gzip.compress(content, compresslevel=9, mtime=0))
+
+
+def optimize(frontend_dir, sources, core_script='js/global.js', stylesheet='style/style.css'):
+    """Minify and split the collected sources.
+
+    Returns (sources, page_assets, report): the rewritten {path: bytes}
+    sources, {page: {original path: [bundle paths]}} for pages that load the
+    split script, and a size report.
+    """
+    frontend_dir = Path(frontend_dir)
+    html_pages = {path.name: path.read_text(encoding='utf-8') for path in sorted(frontend_dir.glob('*.html'))}
+    optimized = dict(sources)
+    page_assets = {}
+    report = {'files': {}, 'pages': {}, 'dropped_functions': []}
+
+    def record(path, before, after):
+        report['files'][path] = {
+            'original_bytes': len(before),
+            'bytes': len(after),
+            'gzip_bytes': gzip_size(after)
+        }
+
+    scripts = [content.decode('utf-8') for path, content in sources.items() if path.endswith('.js')]
+
+    for path, content in sources.items():
+        if path.endswith('.js'):
+            minified = minify_js(content.decode('utf-8')).encode('utf-8')
+            optimized[path] = minified
+            record(path, content, minified)
+
+    if core_script in sources:
+        loading_pages = {
+            page: '\n'.join(_INLINE_SCRIPT_RE.findall(html) + _EVENT_ATTR_RE.findall(html))
+            for page, html in html_pages.items() if core_script in html
+        }
+        bundles, dropped = split_bundles(sources[core_script].decode('utf-8'), loading_pages)
+        report['dropped_functions'] = dropped
+        for bundle, code in list(bundles.items()):
+            if bundle != CORE_BUNDLE and len(minify_js(code)) < MIN_PAGE_BUNDLE_BYTES:
+                bundles[CORE_BUNDLE] += code
+                del bundles[bundle]
+        stem = core_script[:-len('.js')]
+        for bundle, code in bundles.items():
+            bundle_path = f'{stem}.{bundle}.js'
+            minified = minify_js(code).encode('utf-8')
+            optimized[bundle_path] = minified
+            record(bundle_path, code.encode('utf-8'), minified)
+        for page in loading_pages:
+            page_bundles = [f'{stem}.{CORE_BUNDLE}.js']
+            if Path(page).stem in bundles:
+                page_bundles.append(f'{stem}.{Path(page).stem}.js')
+            page_assets[page] = {core_script: page_bundles}
+
+    if stylesheet in sources:
+        used_names, used_prefixes = collect_used_names(html_pages.values(), scripts)
+        css = process_css(sources[stylesheet].decode('utf-8'), used_names, used_prefixes).encode('utf-8')
+        optimized[stylesheet] = css
+        record(stylesheet, sources[stylesheet], css)
+
+    for page, html in html_pages.items():
+        before = [path for path in (core_script, stylesheet) if path in html and path in sources]
+        after = []
+        for path in before:
+            after.extend(page_assets.get(page, {}).get(path, [path]))
+        report['pages'][page] = {
+            'original_gzip_bytes': sum(gzip_size(sources[path]) for path in before),
+            'gzip_bytes': sum(gzip_size(optimized[path]) for path in after)
+        }
+
+    return optimized, page_assets, report
+
+
+def format_report(report):
+    """Render a size report as a plain-text table."""
+    lines = [f"{'File':<32}{'Original':>12}{'Minified':>12}{'Gzipped':>12}"]
+    for path, sizes in sorted(report['files'].items()):
+        lines.append(f"{path:<32}{sizes['original_bytes']:>12,}{sizes['bytes']:>12,}{sizes['gzip_bytes']:>12,}")
+    lines.append('')
+    lines.append(f"{'Page (JS + CSS, gzipped)':<32}{'Before':>12}{'After':>12}")
+    for page, sizes in sorted(report['pages'].items()):
+        lines.append(f"{page:<32}{sizes['original_gzip_bytes']:>12,}{sizes['gzip_bytes']:>12,}")
+    if report['dropped_functions']:
+        lines.append('')
+        lines.append('Unreferenced functions dropped: ' + ', '.join(report['dropped_functions']))
+    return '\n'.join(lines)
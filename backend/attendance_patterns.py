@@ -0,0 +1,368 @@
+"""
+Attendance pattern service for Academia AI Backend
+Keeps recent attendance in date-indexed numpy arrays, one row per student and
+course and one column per day, so absence streaks, rolling attendance percentages and
+course-by-day heatmaps are vectorised array operations rather than scans of
+the attendance partitions. Heatmaps are packed from the daily course rollups.
+"""
+
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import partitions
+
+logger = logging.getLogger(__name__)
+# Status codes stored in the grid; 0 means no mark for that student and day
+NO_MARK, PRESENT, LATE, ABSENT, OTHER = 0, 1, 2, 3, 4
+STATUS_CODES = {'present': PRESENT, 'late': LATE, 'absent': ABSENT}
+STATUS_NAMES = {PRESENT: 'present', LATE: 'late', ABSENT: 'absent'}
+NO_COURSE = -1
+
+# Spare day columns so marks after the last reload do not force a resize
+SPARE_DAYS = 31
+
+
+class AttendanceGrid:
+    """Status of every mark per day from ``start`` onwards, one row per student and course.
+
+    Each course a student is marked in gets its own row, so marks in
+    different courses on the same day never overwrite each other.
+    """
+
+    def __init__(self, start, days, pairs=0):
+        self.start = start
+        self.status = np.zeros((max(pairs, 16), days), dtype=np.int8)
+        self.row_students = np.zeros(self.status.shape[0], dtype=np.int64)
+        self.row_courses = np.full(self.status.shape[0], NO_COURSE, dtype=np.int64)
+        self.rows = {}
+
+    @property
+    def days(self):
+        return self.status.shape[1]
+
+    def column(self, day):
+        return (day - self.start).days
+
+    def day(self, column):
+        return self.start + timedelta(days=int(column))
+
+    def row(self, student_id, course_id):
+        """Return the row of a student's marks in a course, adding one when the pair is new."""
+        key = (student_id, NO_COURSE if course_id is None else course_id)
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.rows)
+            if row >= self.status.shape[0]:
+                extra = self.status.shape[0]
+                self.status = np.vstack([self.status, np.zeros((extra, self.days), dtype=np.int8)])
+                self.row_students = np.concatenate([self.row_students, np.zeros(extra, dtype=np.int64)])
+                self.row_courses = np.concatenate([self.row_courses, np.full(extra, NO_COURSE, dtype=np.int64)])
+            self.row_students[row], self.row_courses[row] = key
+            self.rows[key] = row
+        return row
+
+    def shift_to(self, last_day):
+        """Slide the window forward so that ``last_day`` has a column, dropping the oldest days."""
+        shift = self.column(last_day) - self.days + 1
+        if shift <= 0:
+            return
+        shift += SPARE_DAYS
+        keep = max(self.days - shift, 0)
+        status = np.zeros_like(self.status)
+        if keep:
+            status[:, :keep] = self.status[:, -keep:]
+        self.status = status
+        self.start += timedelta(days=shift)
+
+    def set(self, student_id, course_id, day, status):
+        if day < self.start:
+            return
+        self.shift_to(day)
+        row = self.row(student_id, course_id)
+        self.status[row, self.column(day)] = STATUS_CODES.get(status, OTHER)
+
+    def window(self, start, end, course_id=None, student_id=None):
+        """Return (status, first column, student ids) of the rows for the days ``start``..``end``.
+
+        With ``course_id`` only that course's rows are kept, one per
+        student; without it a student has a row per course.
+        """
+        first = max(self.column(start), 0)
+        last = min(self.column(end), self.days - 1)
+        n = len(self.rows)
+        keep = np.ones(n, dtype=bool)
+        if course_id is not None:
+            keep &= self.row_courses[:n] == course_id
+        if student_id is not None:
+            keep &= self.row_students[:n] == student_id
+        rows = np.nonzero(keep)[0]
+        if last < first:
+            return np.zeros((len(rows), 0), dtype=np.int8), first, self.row_students[rows]
+        return self.status[rows, first:last + 1], first, self.row_students[rows]
+
+
+def load_grid(conn, start, end):
+    """Build a grid from the attendance rows dated ``start``..``end``."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT student_id, course_id, date, status
+        FROM {partitions.source(conn, start)}
+        WHERE date >= ? AND student_id IS NOT NULL
+        ORDER BY id
+    ''', (start.isoformat(),))
+    rows = cursor.fetchall()
+    # SQLite keeps whatever a column is given, so leave out marks whose course is not an id
+    usable = [row for row in rows if row[1] is None or isinstance(row[1], int)]
+    if len(usable) < len(rows):
+        logger.warning('Skipped %d attendance rows with a non-integer course_id', len(rows) - len(usable))
+        rows = usable
+
+    days = (end - start).days + 1 + SPARE_DAYS
+    if not rows:
+        return AttendanceGrid(start, days)
+
+    student_ids, course_ids, dates, statuses = zip(*rows)
+    pairs = np.column_stack([
+        np.array(student_ids, dtype=np.int64),
+        np.array([NO_COURSE if c is None else c for c in course_ids], dtype=np.int64)
+    ])
+    unique_pairs, row_index = np.unique(pairs, axis=0, return_inverse=True)
+    row_index = row_index.reshape(-1)
+    columns = (np.array(dates, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    unique_statuses, status_index = np.unique(np.array(statuses), return_inverse=True)
+    codes = np.array([STATUS_CODES.get(s, OTHER) for s in unique_statuses], dtype=np.int8)[status_index]
+
+    grid = AttendanceGrid(start, days, len(unique_pairs))
+    grid.row_students[:len(unique_pairs)] = unique_pairs[:, 0]
+    grid.row_courses[:len(unique_pairs)] = unique_pairs[:, 1]
+    grid.rows = {(int(student_id), int(course_id)): row for row, (student_id, course_id) in enumerate(unique_pairs)}
+    keep = (columns >= 0) & (columns < days)
+    # Rows are ordered by id, so a later mark for the same student, course and day wins
+    grid.status[row_index[keep], columns[keep]] = codes[keep]
+    return grid
+
+
+# Which status a day shows when a student's courses disagree: any attendance beats an absence
+_DAY_RANK = np.array([0, 4, 3, 2, 1], dtype=np.int8)  # indexed by status code
+_RANK_STATUS = np.array([NO_MARK, OTHER, ABSENT, LATE, PRESENT], dtype=np.int8)  # indexed by rank
+
+
+def by_student(status, row_students):
+    """Fold per-course rows into one row per student: (student ids, per-day status).
+
+    A day counts as attended if the student attended any course that day,
+    and as absent only if every mark that day is an absence.
+    """
+    student_ids, index = np.unique(row_students, return_inverse=True)
+    ranks = np.zeros((len(student_ids), status.shape[1]), dtype=np.int8)
+    np.maximum.at(ranks, index.reshape(-1), _DAY_RANK[status])
+    return student_ids, _RANK_STATUS[ranks]
+
+
+def course_heatmap(conn, start, end, course_ids=None):
+    """Return per-course, per-day mark counts and attendance rates between ``start`` and ``end``.
+
+    Read from the daily course rollups rather than the grid: a student can
+    have marks in several courses on one day, and every one of them counts.
+    """
+    days = (end - start).days + 1
+    sql = '''
+        SELECT scope_id, period_start, status, count
+        FROM attendance_rollups
+        WHERE granularity = 'day' AND scope = 'course'
+          AND period_start BETWEEN ? AND ?
+          AND count > 0
+    '''
+    params = [start.isoformat(), end.isoformat()]
+    if course_ids is not None:
+        sql += f" AND scope_id IN ({','.join('?' * len(course_ids))})"
+        params.extend(course_ids)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+
+    if rows:
+        scope_ids, periods, statuses, counts = zip(*rows)
+    else:
+        scope_ids, periods, statuses, counts = (), (), (), ()
+    course_values, course_index = np.unique(np.array(scope_ids, dtype=np.int64), return_inverse=True)
+    columns = (np.array(periods, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    cells = course_index * days + columns
+    counts = np.array(counts, dtype=np.int64)
+    statuses = np.array(statuses, dtype=object)
+
+    def matrix(mask):
+        return np.bincount(cells[mask], weights=counts[mask], minlength=len(course_values) * days).reshape(-1, days)
+
+    by_status = {name: matrix(statuses == name) for name in STATUS_NAMES.values()}
+    total = matrix(np.ones(len(counts), dtype=bool))
+    attended = by_status['present'] + by_status['late']
+    rates = np.divide(attended * 100.0, total, out=np.full(total.shape, np.nan), where=total > 0)
+
+    return {
+        'dates': [(start + timedelta(days=i)).isoformat() for i in range(days)],
+        'courses': [{
+            'course_id': int(course_id),
+            'total': total[i].astype(int).tolist(),
+            **{name: values[i].astype(int).tolist() for name, values in by_status.items()},
+            'rates': [None if np.isnan(rate) else round(float(rate), 1) for rate in rates[i]]
+        } for i, course_id in enumerate(course_values)]
+    }
+
+
+def absence_runs(status):
+    """Return (current, longest, current run start column) of consecutive absences per row.
+
+    Days without a mark are skipped rather than ending a run, so a streak
+    counts missed sessions, not calendar days.
+    """
+    if status.shape[1] == 0:
+        empty = np.zeros(status.shape[0], dtype=np.int64)
+        return empty, empty, empty - 1
+
+    absent = status == ABSENT
+    attended = (status != NO_MARK) & ~absent
+    columns = np.arange(status.shape[1])
+
+    # Absences since the last attended session
+    last_attended = np.where(attended, columns, -1).max(axis=1, initial=-1)
+    trailing = absent & (columns[None, :] > last_attended[:, None])
+    current = trailing.sum(axis=1)
+    run_start = np.where(current > 0, trailing.argmax(axis=1), -1)
+
+    # Running absence count, reset at every attended session
+    absences = np.cumsum(absent, axis=1)
+    resets = np.maximum.accumulate(np.where(attended, absences, 0), axis=1)
+    longest = (absences - resets).max(axis=1, initial=0)
+    return current, longest, run_start
+
+
+def attendance_rates(status):
+    """Return (attended, marked) session counts per row; late counts as attended."""
+    attended = ((status == PRESENT) | (status == LATE)).sum(axis=1)
+    marked = (status != NO_MARK).sum(axis=1)
+    return attended, marked
+
+
+class AttendancePatterns:
+    """Thread-safe pattern queries over an in-memory attendance grid.
+
+    The grid is loaded on first use, updated by ``record`` as marks are
+    written, and reloaded every ``reload_seconds`` to pick up marks written
+    by other workers or bulk imports.
+    """
+
+    def __init__(self, history_days=365, reload_seconds=300):
+        self.history_days = history_days
+        self.reload_seconds = reload_seconds
+        self._grid = None
+        self._loaded_at = 0.0
+        self._pending = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self, connect):
+        if self._grid is not None and time.time() - self._loaded_at < self.reload_seconds:
+            return
+        with self._load_lock:
+            if self._grid is not None and time.time() - self._loaded_at < self.reload_seconds:
+                return
+            # Marks recorded while the load runs are replayed onto the new grid
+            with self._lock:
+                self._pending = []
+            today = date.today()
+            conn = connect()
+            try:
+                grid = load_grid(conn, today - timedelta(days=self.history_days - 1), today)
+            finally:
+                conn.close()
+            with self._lock:
+                for mark in self._pending:
+                    grid.set(*mark)
+                self._pending = None
+                self._grid = grid
+                self._loaded_at = time.time()
+
+    def record(self, student_id, course_id, day, status):
+        """Apply one attendance mark; call after it has been committed."""
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((student_id, course_id, day, status))
+            if self._grid is not None:
+                self._grid.set(student_id, course_id, day, status)
+
+    def streaks(self, connect, min_streak=3, course_id=None, as_of=None):
+        """Return students whose current run of absences is at least ``min_streak`` sessions."""
+        self._ensure_loaded(connect)
+        as_of = as_of or date.today()
+        with self._lock:
+            grid = self._grid
+            status, first, row_students = grid.window(grid.start, as_of, course_id)
+            start_day = grid.day(first)
+        student_ids, status = by_student(status, row_students)
+        current, longest, run_start = absence_runs(status)
+
+        matches = np.nonzero(current >= min_streak)[0]
+        matches = matches[np.argsort(-current[matches], kind='stable')]
+        return [{
+            'student_id': int(student_ids[row]),
+            'current_streak': int(current[row]),
+            'longest_streak': int(longest[row]),
+            'streak_started': (start_day + timedelta(days=int(run_start[row]))).isoformat()
+        } for row in matches]
+
+    def rolling_rates(self, connect, window_days=30, course_id=None, as_of=None):
+        """Return each student's attendance percentage over the last ``window_days`` days."""
+        self._ensure_loaded(connect)
+        as_of = as_of or date.today()
+        with self._lock:
+            grid = self._grid
+            status, _, row_students = grid.window(as_of - timedelta(days=window_days - 1), as_of, course_id)
+            # Every course session counts, so sum each student's rows
+            attended, marked = attendance_rates(status)
+        student_ids, index = np.unique(row_students, return_inverse=True)
+        index = index.reshape(-1)
+        attended = np.bincount(index, weights=attended, minlength=len(student_ids)).astype(np.int64)
+        marked = np.bincount(index, weights=marked, minlength=len(student_ids)).astype(np.int64)
+
+        rates = np.divide(attended * 100.0, marked, out=np.zeros(len(marked)), where=marked > 0)
+        return [{
+            'student_id': int(student_ids[row]),
+            'attended': int(attended[row]),
+            'sessions': int(marked[row]),
+            'percentage': round(float(rates[row]), 1)
+        } for row in np.nonzero(marked)[0]]
+
+    def rolling_series(self, connect, student_id, window_days=30, start=None, end=None, course_id=None):
+        """Return the daily trailing ``window_days`` attendance percentage of one student."""
+        self._ensure_loaded(connect)
+        end = end or date.today()
+        start = start or end - timedelta(days=29)
+        with self._lock:
+            grid = self._grid
+            status, first, _ = grid.window(start - timedelta(days=window_days - 1), end, course_id, student_id)
+            if not len(status):
+                return []
+            # The student's sessions per day, summed over their courses
+            daily_attended = ((status == PRESENT) | (status == LATE)).sum(axis=0)
+            daily_marked = (status != NO_MARK).sum(axis=0)
+            first_day = grid.day(first)
+
+        # Cumulative sums turn every trailing window into one subtraction
+        attended = np.concatenate([[0], np.cumsum(daily_attended)])
+        marked = np.concatenate([[0], np.cumsum(daily_marked)])
+        ends = np.arange(max((start - first_day).days, 0), len(daily_marked)) + 1
+        begins = np.maximum(ends - window_days, 0)
+        window_attended = attended[ends] - attended[begins]
+        window_marked = marked[ends] - marked[begins]
+        return [{
+            'date': (first_day + timedelta(days=int(column - 1))).isoformat(),
+            'sessions': int(sessions),
+            'percentage': round(float(done) * 100 / sessions, 1) if sessions else None
+        } for column, done, sessions in zip(ends, window_attended, window_marked)]
@@ -0,0 +1,335 @@
+"""
+Attendance audit log for Academia AI Backend
+Every attendance change is appended to attendance_audit: when, who, which
+student, course and day, and the status before and after. Marking only
+appends to an in-memory buffer; a background thread writes buffers in
+batches. Rows are all integers, with timestamps in milliseconds, days
+numbered from the epoch and statuses interned in audit_codes. Old time
+ranges are compacted into compressed column blocks that stay queryable.
+"""
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import date, timedelta
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BLOCK_ENCODING = 'json-delta-columns+zlib'
+COLUMNS = ('id', 'changed_at', 'student_id', 'course_id', 'day', 'old_status', 'new_status', 'changed_by', 'source')
+EPOCH = date(1970, 1, 1)
+
+AUDIT_BUFFERED = metrics.registry.gauge('academia_audit_buffered', 'Audit entries waiting to be written')
+AUDIT_WRITTEN = metrics.registry.counter('academia_audit_written_total', 'Audit entries written')
+AUDIT_FLUSH_DURATION = metrics.registry.histogram(
+    'academia_audit_flush_duration_seconds', 'Time spent writing one batch of audit entries'
+)
+
+
+def day_number(day):
+    """Return ``day`` (a date or YYYY-MM-DD string) as days since 1970-01-01."""
+    day = date.fromisoformat(day) if isinstance(day, str) else day
+    return (day - EPOCH).days
+
+
+def day_from_number(number):
+    return (EPOCH + timedelta(days=number)).isoformat()
+
+
+def init_audit_tables(cursor):
+    """Create the audit log, its compacted blocks and the status code dictionary."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_codes (
+            code INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_audit (
+            id INTEGER PRIMARY KEY,
+            changed_at INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            course_id INTEGER,
+            day INTEGER NOT NULL,
+            old_status INTEGER,
+            new_status INTEGER NOT NULL,
+            changed_by INTEGER,
+            source INTEGER
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_audit_student ON attendance_audit (student_id, day)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_audit_day ON attendance_audit (day)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_audit_blocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_day INTEGER NOT NULL,
+            last_day INTEGER NOT NULL,
+            row_count INTEGER NOT NULL,
+            encoding TEXT NOT NULL,
+            data BLOB NOT NULL,
+            compacted_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_attendance_audit_blocks_days
+        ON attendance_audit_blocks (first_day, last_day)
+    ''')
+    # Entries are never changed; rows only leave attendance_audit when compaction moves them to a block
+    for table in ('attendance_audit', 'attendance_audit_blocks'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_append_only BEFORE UPDATE ON {table}
+            BEGIN
+                SELECT RAISE(ABORT, '{table} is append-only');
+            END
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS attendance_audit_blocks_keep BEFORE DELETE ON attendance_audit_blocks
+        BEGIN
+            SELECT RAISE(ABORT, 'attendance_audit_blocks is append-only');
+        END
+    ''')
+
+
+def _codes(cursor, names):
+    """Return {name: code} for ``names``, adding the ones not seen before."""
+    cursor.executemany('INSERT OR IGNORE INTO audit_codes (name) VALUES (?)', [(name,) for name in names])
+    cursor.execute(f"SELECT name, code FROM audit_codes WHERE name IN ({', '.join('?' * len(names))})", names)
+    return dict(cursor.fetchall())
+
+
+def write_entries(conn, entries):
+    """Append (changed_at, student_id, course_id, day, old_status, new_status, changed_by, source) entries.
+
+    changed_at is in seconds, day a date or YYYY-MM-DD string and the
+    statuses and source plain strings. Commits.
+    """
+    cursor = conn.cursor()
+    try:
+        names = sorted({name for entry in entries for name in (entry[4], entry[5], entry[7]) if name is not None})
+        codes = _codes(cursor, names) if names else {}
+        cursor.executemany('''
+            INSERT INTO attendance_audit
+                (changed_at, student_id, course_id, day, old_status, new_status, changed_by, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (round(changed_at * 1000), student_id, course_id, day_number(day), codes.get(old_status),
+             codes[new_status], changed_by, codes.get(source))
+            for changed_at, student_id, course_id, day, old_status, new_status, changed_by, source in entries
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _decoded(rows, names):
+    """Turn stored integer rows into API dicts."""
+    return [{
+        'id': row[0],
+        'changed_at': row[1] / 1000,
+        'student_id': row[2],
+        'course_id': row[3],
+        'date': day_from_number(row[4]),
+        'old_status': names.get(row[5]),
+        'new_status': names.get(row[6]),
+        'changed_by': row[7],
+        'source': names.get(row[8])
+    } for row in rows]
+
+
+def _encode_block(rows):
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)}
+    # Ids and timestamps grow almost monotonically, so their deltas compress far better
+    for name in ('id', 'changed_at'):
+        values = columns[name]
+        columns[name] = values[:1] + [b - a for a, b in zip(values, values[1:])]
+    return zlib.compress(json.dumps(columns, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def _decode_block(encoding, data):
+    if encoding != BLOCK_ENCODING:
+        raise ValueError(f'Unknown audit block encoding: {encoding}')
+    columns = json.loads(zlib.decompress(data))
+    for name in ('id', 'changed_at'):
+        total, values = 0, []
+        for delta in columns[name]:
+            total += delta
+            values.append(total)
+        columns[name] = values
+    return list(zip(*(columns[name] for name in COLUMNS)))
+
+
+def query(conn, student_id=None, course_id=None, start=None, end=None, limit=1000):
+    """Return audit entries for changes to attendance dated ``start``..``end``, newest change first.
+
+    Live entries come from the indexes; compacted ones from the blocks
+    overlapping the date range.
+    """
+    where, params = [], []
+    if student_id is not None:
+        where.append('student_id = ?')
+        params.append(student_id)
+    if course_id is not None:
+        where.append('course_id = ?')
+        params.append(course_id)
+    first = day_number(start) if start is not None else None
+    last = day_number(end) if end is not None else None
+    if first is not None:
+        where.append('day >= ?')
+        params.append(first)
+    if last is not None:
+        where.append('day <= ?')
+        params.append(last)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT {', '.join(COLUMNS)} FROM attendance_audit
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY id DESC LIMIT ?
+    ''', params + [limit])
+    rows = cursor.fetchall()
+
+    if len(rows) < limit:
+        block_where, block_params = [], []
+        if first is not None:
+            block_where.append('last_day >= ?')
+            block_params.append(first)
+        if last is not None:
+            block_where.append('first_day <= ?')
+            block_params.append(last)
+        cursor.execute(f'''
+            SELECT encoding, data FROM attendance_audit_blocks
+            {'WHERE ' + ' AND '.join(block_where) if block_where else ''}
+            ORDER BY id DESC
+        ''', block_params)
+        for encoding, data in cursor.fetchall():
+            rows.extend(
+                row for row in _decode_block(encoding, data)
+                if (student_id is None or row[2] == student_id) and (course_id is None or row[3] == course_id)
+                and (first is None or row[4] >= first) and (last is None or row[4] <= last)
+            )
+        rows.sort(key=lambda row: row[0], reverse=True)
+        rows = rows[:limit]
+
+    cursor.execute('SELECT code, name FROM audit_codes')
+    return _decoded(rows, dict(cursor.fetchall()))
+
+
+def compact(conn, before, block_rows=50000):
+    """Move entries for attendance dated before ``before`` into compressed blocks, a month at a time.
+
+    Each block is its own short transaction. Returns entries compacted.
+    """
+    cursor = conn.cursor()
+    compacted = 0
+    cutoff = day_number(before)
+    while True:
+        cursor.execute('SELECT MIN(day) FROM attendance_audit WHERE day < ?', (cutoff,))
+        first = cursor.fetchone()[0]
+        if first is None:
+            break
+        month = date.fromisoformat(day_from_number(first)).replace(day=1)
+        next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        cursor.execute(f'''
+            SELECT {', '.join(COLUMNS)} FROM attendance_audit
+            WHERE day >= ? AND day < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (day_number(month), min(day_number(next_month), cutoff), block_rows))
+        rows = cursor.fetchall()
+        try:
+            cursor.execute('''
+                INSERT INTO attendance_audit_blocks (first_day, last_day, row_count, encoding, data, compacted_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (min(row[4] for row in rows), max(row[4] for row in rows), len(rows), BLOCK_ENCODING,
+                  _encode_block(rows), time.time()))
+            cursor.executemany('DELETE FROM attendance_audit WHERE id = ?', [(row[0],) for row in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        compacted += len(rows)
+    return compacted
+
+
+class AuditWriter:
+    """Buffers audit entries per database and writes them in batches.
+
+    record() only appends to a list, so marking attendance never waits on
+    the audit table. A daemon thread writes every ``flush_seconds``, or as
+    soon as a database has ``batch_size`` entries waiting; entries still
+    buffered at exit are written then. A buffer that reaches
+    ``max_buffered`` is written by the recording thread itself, so a
+    stalled writer slows marking down rather than dropping entries.
+    Entries buffered when the process is killed are lost.
+    """
+
+    def __init__(self, batch_size=500, flush_seconds=1.0, max_buffered=10000):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffered = max_buffered
+        self._buffers = defaultdict(list)
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, db_path, student_id, course_id, day, old_status, new_status, changed_by, source='api'):
+        entry = (time.time(), student_id, course_id, day, old_status, new_status, changed_by, source)
+        with self._lock:
+            buffer = self._buffers[db_path]
+            buffer.append(entry)
+            waiting = len(buffer)
+            self._buffered += 1
+            AUDIT_BUFFERED.set(value=self._buffered)
+        if waiting >= self.max_buffered or self._thread is None:
+            self.flush(db_path)
+        elif waiting >= self.batch_size:
+            self._wake.set()
+
+    def pending(self, db_path):
+        with self._lock:
+            return len(self._buffers.get(db_path, ()))
+
+    def flush(self, db_path=None):
+        """Write the entries buffered for ``db_path``, or for every database."""
+        with self._lock:
+            paths = [db_path] if db_path is not None else list(self._buffers)
+            batches = [(path, self._buffers.pop(path)) for path in paths if self._buffers.get(path)]
+        for path, entries in batches:
+            started = time.perf_counter()
+            conn = sqlite3.connect(path, timeout=30)
+            try:
+                write_entries(conn, entries)
+            except Exception:
+                # Put them back ahead of anything recorded meanwhile and try again next time
+                with self._lock:
+                    self._buffers[path][:0] = entries
+                logger.exception('Writing %s audit entries to %s failed', len(entries), path)
+                continue
+            finally:
+                conn.close()
+            with self._lock:
+                self._buffered -= len(entries)
+                AUDIT_BUFFERED.set(value=self._buffered)
+            AUDIT_WRITTEN.inc(amount=len(entries))
+            AUDIT_FLUSH_DURATION.observe(time.perf_counter() - started)
+
+    def start(self):
+        """Start the background writer and make sure buffered entries are written at exit."""
+        def loop():
+            while True:
+                self._wake.wait(self.flush_seconds)
+                self._wake.clear()
+                self.flush()
+
+        self._thread = threading.Thread(target=loop, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+        return self._thread
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Academia AI - API Benchmark Suite
+Drives every /api route through the Flask test client and a real threaded
+server, then writes p50/p95/p99 latency, throughput, peak RSS and the status
+codes seen to a JSON baseline file that can be compared between runs with
+compare.py. Any response outside 2xx/3xx counts as an error.
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import analytics
+import datagen
+import prediction
+import sessions
+
+ADMIN_CREDENTIALS = {'email': 'admin@academia.edu', 'password': 'admin123'}
+SKIPPED_METHODS = {'HEAD', 'OPTIONS'}
+# Long-lived streams never finish a request; bench_concurrency.py covers them
+STREAMING_ROUTES = {'/api/events/stream'}
+# A worker captures one profile at a time, so these run one request after another
+SERIAL_ROUTES = {('POST', '/api/admin/profile')}
+
+# Request builders for routes that need a body or URL arguments.
+# Each builder receives the iteration number and returns (path, json_body),
+# or (path, json_body, headers) to send other headers than the admin's.
+REQUEST_BUILDERS = {
+    ('POST', '/api/auth/login'): lambda i: ('/api/auth/login', ADMIN_CREDENTIALS),
+    ('POST', '/api/auth/register'): lambda i: ('/api/auth/register', {
+        'name': f'Bench User {i}',
+        'email': f'bench.{os.getpid()}.{time.time_ns()}.{i}@academia.edu',
+        'password': 'bench-password'
+    }),
+    ('POST', '/api/attendance'): lambda i: ('/api/attendance', {
+        'student_id': datagen.student_code(i % 100),
+        'status': datagen.STATUSES[i % len(datagen.STATUSES)],
+        'course_id': 1
+    }),
+    # A classroom's worth of marks queued offline, plus the delta since the start
+    ('POST', '/api/attendance/sync'): lambda i: ('/api/attendance/sync', {
+        'client_id': f'bench-{os.getpid()}',
+        'since': 0,
+        'marks': [{
+            'op_id': f'{time.time_ns()}-{i}-{n}',
+            'student_id': datagen.student_code(n),
+            'course_id': 1,
+            'date': datetime.now().date().isoformat(),
+            'status': datagen.STATUSES[(i + n) % len(datagen.STATUSES)],
+            'client_ts': time.time()
+        } for n in range(25)]
+    }),
+    ('POST', '/api/students'): lambda i: ('/api/students', {
+        'name': f'Bench Student {i}',
+        'student_id': f'X{os.getpid()}{time.time_ns()}{i}',
+        'email': f'bench.student.{i}@student.edu'
+    }),
+    ('POST', '/api/courses'): lambda i: ('/api/courses', {
+        'abbreviation': f'BN{i % 100}',
+        'title': f'Bench Course {i}',
+        'max_students': 30
+    }),
+    ('POST', '/api/courses/<int:course_id>/enrollments'): lambda i: ('/api/courses/1/enrollments', {
+        'student_ids': [1 + i % 100]
+    }),
+    ('POST', '/api/predict'): lambda i: ('/api/predict', {
+        'attendance': 60 + i % 40,
+        'test_scores': 50 + i % 50,
+        'study_hours': i % 40,
+        'parental_support': ('Low', 'Medium', 'High')[i % 3],
+        'activities': ('Yes', 'No')[i % 2]
+    }),
+    ('PUT', '/api/profile'): lambda i: ('/api/profile', {'name': 'Admin User', 'avatar': 'A'}),
+    ('PUT', '/api/courses/<int:course_id>/capacity'): lambda i: ('/api/courses/1/capacity', {
+        'max_students': 40 + i % 2
+    }),
+    ('POST', '/api/features'): lambda i: ('/api/features', {
+        'students': [{
+            'student_id': datagen.student_code((i + n) % 100),
+            'test_scores': 40 + (i + n) % 60,
+            'study_hours': (i + n) % 40,
+            'parental_support': ('Low', 'Medium', 'High')[n % 3],
+            'activities': ('Yes', 'No')[n % 2]
+        } for n in range(25)]
+    }),
+    ('POST', '/api/outcomes'): lambda i: ('/api/outcomes', {
+        'students': [{'student_id': datagen.student_code((i + n) % 100), 'score': 40 + (i + n) % 60}
+                     for n in range(25)]
+    }),
+    # Jobs are only queued; main() runs the server without job workers
+    ('POST', '/api/risk/run'): lambda i: ('/api/risk/run', None),
+    ('POST', '/api/models/train'): lambda i: ('/api/models/train', {'folds': 2, 'activate': False}),
+    ('POST', '/api/admin/maintenance'): lambda i: ('/api/admin/maintenance', {'tasks': ['audit']}),
+    ('POST', '/api/admin/profile'): lambda i: ('/api/admin/profile', {'seconds': 0.05}),
+    ('POST', '/api/models/<int:version>/activate'): lambda i: (
+        f"/api/models/{URL_ARGUMENT_DEFAULTS['version']}/activate", None
+    ),
+    ('POST', '/api/events/ticket'): lambda i: ('/api/events/ticket', None),
+}
+
+# Default values for URL arguments of parameterised routes; Fixtures.prepare() adds the ids it creates
+URL_ARGUMENT_DEFAULTS = {
+    'course_id': 1,
+    'student_id': 1,
+}
+
+
+class Fixtures:
+    """Creates the sessions, jobs, enrollments, models and profiles that routes changing state need.
+
+    Every refresh, logout, cancel and drop needs a session, job or enrollment
+    of its own, so their builders make one per request, outside the timed part.
+    """
+
+    def __init__(self, client, db_path, headers):
+        self.client = client
+        self.db_path = db_path
+        self.headers = headers
+        conn = sqlite3.connect(db_path)
+        cursor = conn.execute('SELECT id FROM users WHERE email = ?', (ADMIN_CREDENTIALS['email'],))
+        self.user_id = cursor.fetchone()[0]
+        conn.close()
+
+    def prepare(self):
+        """Create a model, a profile and a job for the parameterised routes to point at."""
+        # Imported here because importing the app reads the environment set up in main()
+        from app import MODEL_CONFIG, attendance_feature
+        outcomes = [{'student_id': datagen.student_code(n), 'score': 40 + n % 60} for n in range(100)]
+        self.client.post('/api/outcomes', json={'students': outcomes}, headers=self.headers)
+        conn = sqlite3.connect(self.db_path)
+        model = prediction.train(conn, MODEL_CONFIG['prediction_weights'], attendance_feature, folds=2)
+        conn.close()
+        profile = self.client.post('/api/admin/profile', json={'seconds': 0.05}, headers=self.headers)
+        URL_ARGUMENT_DEFAULTS.update(
+            version=model['version'], name=profile.get_json()['profile'], job_id=self.queued_job()
+        )
+
+    def refresh_token(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return sessions.create_session(conn, self.user_id, 60 * 60)[1]
+        finally:
+            conn.close()
+
+    def session_headers(self):
+        tokens = self.client.post('/api/auth/refresh', json={'refresh_token': self.refresh_token()}).get_json()
+        return {'Authorization': f"Bearer {tokens['token']}"}
+
+    def queued_job(self):
+        return self.client.post('/api/risk/run', headers=self.headers).get_json()['job']['id']
+
+    def enrolled_student(self, i):
+        student_id = 1 + i % 100
+        self.client.post('/api/courses/1/enrollments', json={'student_ids': [student_id]}, headers=self.headers)
+        return student_id
+
+    def builders(self):
+        """Return the request builders that need a fresh session, job or enrollment each time."""
+        return {
+            ('POST', '/api/auth/refresh'): lambda i: ('/api/auth/refresh', {'refresh_token': self.refresh_token()}),
+            ('POST', '/api/auth/logout'): lambda i: ('/api/auth/logout', None, self.session_headers()),
+            ('DELETE', '/api/jobs/<int:job_id>'): lambda i: (f'/api/jobs/{self.queued_job()}', None),
+            ('DELETE', '/api/courses/<int:course_id>/enrollments/<int:student_id>'): lambda i: (
+                f'/api/courses/1/enrollments/{self.enrolled_student(i)}', None
+            ),
+        }
+
+
+def percentile(sorted_values, pct):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in kilobytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def summarize(latencies, elapsed, statuses):
+    """Build the result record for one route from its latencies in seconds and response statuses."""
+    values = sorted(latencies)
+    to_ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'requests': len(values),
+        'errors': sum(1 for status in statuses if not 200 <= status < 400),
+        'statuses': {str(status): statuses.count(status) for status in sorted(set(statuses))},
+        'p50_ms': to_ms(percentile(values, 50)),
+        'p95_ms': to_ms(percentile(values, 95)),
+        'p99_ms': to_ms(percentile(values, 99)),
+        'mean_ms': to_ms(sum(values) / len(values)) if values else None,
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed > 0 else None,
+        'peak_rss_kb': peak_rss_kb()
+    }
+
+
+def discover_routes(app, builders):
+    """Return (key, builder) pairs for every /api route and the keys that were skipped."""
+    routes, skipped = [], []
+    adapter = app.url_map.bind('localhost')
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if not rule.rule.startswith('/api') or rule.rule in STREAMING_ROUTES:
+            continue
+        for method in sorted(rule.methods - SKIPPED_METHODS):
+            key = (method, rule.rule)
+            if key in builders:
+                routes.append((key, builders[key]))
+            elif method in ('GET', 'DELETE') and all(arg in URL_ARGUMENT_DEFAULTS for arg in rule.arguments):
+                values = {arg: URL_ARGUMENT_DEFAULTS[arg] for arg in rule.arguments}
+                path = adapter.build(rule.endpoint, values, method=method)
+                routes.append((key, lambda i, path=path: (path, None)))
+            else:
+                skipped.append(f'{method} {rule.rule}')
+    return routes, skipped
+
+
+def report_route(mode, method, rule, result):
+    errors = f" errors={result['errors']} {result['statuses']}" if result['errors'] else ''
+    print(f"  {mode} {method:6} {rule:40} p50={result['p50_ms']}ms{errors}")
+
+
+def run_client_mode(app, routes, headers, iterations, warmup):
+    """Benchmark each route in-process through the Flask test client."""
+    client = app.test_client()
+    results = {}
+    for (method, rule), build in routes:
+        latencies, statuses = [], []
+        for i in range(warmup + iterations):
+            path, body, *request_headers = build(i)
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body, headers=(request_headers or [headers])[0])
+            elapsed = time.perf_counter() - start
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            statuses.append(response.status_code)
+        results[f'{method} {rule}'] = summarize(latencies, sum(latencies), statuses)
+        report_route('client', method, rule, results[f'{method} {rule}'])
+    return results
+
+
+def run_server_mode(app, routes, headers, iterations, warmup, concurrency):
+    """Benchmark each route against a real threaded HTTP server."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    port = server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def send(method, path, body, *extra_headers):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        payload = json.dumps(body) if body is not None else None
+        request_headers = dict((extra_headers or (headers,))[0])
+        if payload is not None:
+            request_headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        conn.request(method, path, body=payload, headers=request_headers)
+        response = conn.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - start
+        conn.close()
+        return elapsed, response.status
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for (method, rule), build in routes:
+                for i in range(warmup):
+                    send(method, *build(i))
+                requests = [build(warmup + i) for i in range(iterations)]
+                run = map if (method, rule) in SERIAL_ROUTES else pool.map
+                wall_start = time.perf_counter()
+                outcomes = list(run(lambda req: send(method, *req), requests))
+                wall = time.perf_counter() - wall_start
+                latencies = [elapsed for elapsed, _ in outcomes]
+                results[f'{method} {rule}'] = summarize(latencies, wall, [status for _, status in outcomes])
+                report_route('server', method, rule, results[f'{method} {rule}'])
+    finally:
+        server.shutdown()
+    return results
+
+
+def rebuild_derived_tables(db_path):
+    """Bring tables derived from attendance up to date after bulk generation."""
+    conn = sqlite3.connect(db_path)
+    analytics.rebuild_rollups(conn)
+    # Imported here because importing the app reads the environment set up in main()
+    from app import risk_pipeline
+    risk_pipeline.run(conn)
+    conn.close()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=backend_dir, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Academia AI API')
+    parser.add_argument('--scale', choices=sorted(datagen.SCALES), default='tiny')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=200, help='Measured requests per route')
+    parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per route')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads in server mode')
+    parser.add_argument('--mode', choices=['client', 'server', 'both'], default='both')
+    parser.add_argument('--output', default='benchmark_baseline.json', help='Where to write the JSON results')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='academia-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    # Benchmarks deliberately exceed the production request budgets
+    os.environ['RATE_LIMIT_ENABLED'] = 'False'
+    os.environ['PROFILE_OUTPUT_DIR'] = os.path.join(workdir, 'profiles')
+
+    # Importing the app creates the schema and the sample users but starts no
+    # schedulers or job workers, so scoring is rebuilt explicitly and queued jobs stay queued
+    from app import app
+
+    print(f"Generating '{args.scale}' dataset in {db_path}...")
+    generate_start = time.perf_counter()
+    counts = datagen.populate(db_path, args.scale, args.seed)
+    rebuild_derived_tables(db_path)
+    generate_seconds = time.perf_counter() - generate_start
+
+    client = app.test_client()
+    login = client.post('/api/auth/login', json=ADMIN_CREDENTIALS)
+    headers = {'Authorization': f"Bearer {login.get_json()['token']}"}
+
+    fixtures = Fixtures(client, db_path, headers)
+    fixtures.prepare()
+    routes, skipped = discover_routes(app, {**REQUEST_BUILDERS, **fixtures.builders()})
+    for route in skipped:
+        print(f"  skipping {route}: no request builder")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'seed': args.seed,
+            'dataset': counts,
+            'generate_seconds': round(generate_seconds, 3),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'skipped_routes': skipped
+        },
+        'results': {}
+    }
+
+    if args.mode in ('client', 'both'):
+        print('Running test client benchmarks...')
+        report['results']['client'] = run_client_mode(app, routes, headers, args.iterations, args.warmup)
+    if args.mode in ('server', 'both'):
+        print('Running real server benchmarks...')
+        report['results']['server'] = run_server_mode(
+            app, routes, headers, args.iterations, args.warmup, args.concurrency
+        )
+
+    report['meta']['peak_rss_kb'] = peak_rss_kb()
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Academia AI - Concurrency Benchmark
+Compares how the threaded WSGI server and the ASGI entry point cope with
+many open live event streams: for each stream count it measures whether the
+streams were accepted, the latency of ordinary API requests made alongside
+them, and the server's thread count and resident memory.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import datagen
+from bench_api import ADMIN_CREDENTIALS, git_revision, percentile, rebuild_derived_tables
+
+MODES = ('wsgi', 'asgi')
+PROBE_PATH = '/api/dashboard/stats'
+# Short heartbeats let the WSGI server notice closed streams between levels
+HEARTBEAT_SECONDS = 1
+
+
+def serve(mode, port):
+    """Run the API on ``port`` in this process until it is killed."""
+    if mode == 'wsgi':
+        from werkzeug.serving import WSGIRequestHandler, make_server
+        from app import app, start_background_services
+
+        start_background_services()
+
+        class QuietRequestHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietRequestHandler).serve_forever()
+    else:
+        import uvicorn
+        from asgi import application
+
+        uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, env):
+    process = subprocess.Popen(
+        [sys.executable, __file__, '--serve', mode, '--port', str(port)], cwd=backend_dir, env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{mode} server exited with code {process.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def server_usage(pid):
+    """Return (threads, RSS in kB) of ``pid`` from /proc, or Nones where unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None, None
+    return int(fields['Threads']), int(fields['VmRSS'].split()[0])
+
+
+def stream_ticket(port, headers):
+    """Return a fresh ticket for opening an event stream."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('POST', '/api/events/ticket', headers=headers)
+        return json.loads(conn.getresponse().read())['ticket']
+    finally:
+        conn.close()
+
+
+def open_stream(port, ticket):
+    """Open one event stream and wait for its first chunk; returns the socket or None."""
+    sock = socket.create_connection(('127.0.0.1', port), timeout=10)
+    try:
+        sock.sendall(
+            f'GET /api/events/stream?ticket={ticket} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+            'Accept: text/event-stream\r\n\r\n'.encode('ascii')
+        )
+        received = b''
+        while b'retry:' not in received:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            received += chunk
+        if received.startswith(b'HTTP/1.1 200') and b'retry:' in received:
+            return sock
+    except OSError:
+        pass
+    sock.close()
+    return None
+
+
+def probe(port, headers, requests, concurrency):
+    """Time ``requests`` ordinary API calls; returns (sorted latencies, errors, wall seconds)."""
+    def send(_):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', PROBE_PATH, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return time.perf_counter() - start, response.status
+        except OSError:
+            return time.perf_counter() - start, 599
+        finally:
+            conn.close()
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(send, range(requests)))
+    wall = time.perf_counter() - wall_start
+    return sorted(elapsed for elapsed, _ in outcomes), sum(1 for _, status in outcomes if status >= 500), wall
+
+
+def run_mode(mode, env, levels, requests, concurrency):
+    port = free_port()
+    process = start_server(mode, port, env)
+    results = []
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        conn.request('POST', '/api/auth/login', body=json.dumps(ADMIN_CREDENTIALS),
+                     headers={'Content-Type': 'application/json'})
+        token = json.loads(conn.getresponse().read())['token']
+        conn.close()
+        headers = {'Authorization': f'Bearer {token}'}
+
+        for level in levels:
+            # Tickets are short-lived, so take a fresh one for each level
+            ticket = stream_ticket(port, headers)
+            streams = [open_stream(port, ticket) for _ in range(level)]
+            established = sum(1 for sock in streams if sock is not None)
+            latencies, errors, wall = probe(port, headers, requests, concurrency)
+            threads, rss_kb = server_usage(process.pid)
+            to_ms = lambda v: round(v * 1000, 3) if v is not None else None
+            result = {
+                'streams': level,
+                'established': established,
+                'requests': len(latencies),
+                'errors': errors,
+                'p50_ms': to_ms(percentile(latencies, 50)),
+                'p95_ms': to_ms(percentile(latencies, 95)),
+                'p99_ms': to_ms(percentile(latencies, 99)),
+                'throughput_rps': round(len(latencies) / wall, 2) if wall > 0 else None,
+                'server_threads': threads,
+                'server_rss_kb': rss_kb
+            }
+            results.append(result)
+            print(f"  {mode} streams={level:5} established={established:5} p50={result['p50_ms']}ms "
+                  f"p99={result['p99_ms']}ms threads={threads} rss={rss_kb}kB")
+            for sock in streams:
+                if sock is not None:
+                    sock.close()
+            # Give the server time to notice the closed streams before the next level
+            time.sleep(HEARTBEAT_SECONDS + 0.5)
+    finally:
+        process.terminate()
+        process.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare WSGI and ASGI concurrency limits')
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=MODES + ('both',), default='both')
+    parser.add_argument('--streams', default='0,50,200,500', help='Comma-separated open stream counts')
+    parser.add_argument('--requests', type=int, default=200, help='Probe requests per stream count')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads sending probe requests')
+    parser.add_argument('--scale', choices=sorted(datagen.SCALES), default='tiny')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='concurrency_baseline.json', help='Where to write the JSON results')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    levels = [int(level) for level in args.streams.split(',')]
+    # Every open stream is a client socket in this process
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    workdir = tempfile.mkdtemp(prefix='academia-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f'sqlite:///{db_path}'
+    env['EVENTS_MAX_SUBSCRIBERS'] = str(max(levels) + 100)
+    env['EVENTS_HEARTBEAT_SECONDS'] = str(HEARTBEAT_SECONDS)
+    env['RATE_LIMIT_ENABLED'] = 'False'
+    env['RISK_PIPELINE_INTERVAL_SECONDS'] = '0'
+    env['MAINTENANCE_INTERVAL_SECONDS'] = '0'
+    env['STATIC_BUILD_DIR'] = os.path.join(workdir, 'dist')
+    os.environ.update(env)
+
+    # Importing the app creates the schema and the sample users
+    import app  # noqa: F401
+
+    print(f"Generating '{args.scale}' dataset in {db_path}...")
+    counts = datagen.populate(db_path, args.scale, args.seed)
+    rebuild_derived_tables(db_path)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'seed': args.seed,
+            'dataset': counts,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'probe_path': PROBE_PATH
+        },
+        'results': {}
+    }
+
+    for mode in MODES if args.mode == 'both' else (args.mode,):
+        if mode == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                print('  asgi skipped: uvicorn is not installed')
+                continue
+        print(f'Running {mode} benchmarks...')
+        report['results'][mode] = run_mode(mode, env, levels, args.requests, args.concurrency)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Academia AI - Benchmark Comparison
+Compares two bench_api.py result files and flags routes whose latency or
+throughput regressed beyond a threshold.
+"""
+
+import argparse
+import json
+import sys
+
+# Metrics where a larger value is worse
+LOWER_IS_BETTER = ['p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_kb']
+# Metrics where a smaller value is worse
+HIGHER_IS_BETTER = ['throughput_rps']
+
+
+def percent_change(old, new):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(baseline, current, threshold):
+    """Yield (mode, route, metric, old, new, change, regressed) for every shared measurement."""
+    for mode, routes in current['results'].items():
+        base_routes = baseline['results'].get(mode, {})
+        for route, metrics in sorted(routes.items()):
+            base = base_routes.get(route)
+            if base is None:
+                continue
+            for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+                old, new = base.get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                change = percent_change(old, new)
+                if change is None:
+                    continue
+                if metric in LOWER_IS_BETTER:
+                    regressed = change > threshold
+                else:
+                    regressed = change < -threshold
+                yield mode, route, metric, old, new, change, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two Academia AI benchmark result files')
+    parser.add_argument('baseline', help='Previous benchmark JSON')
+    parser.add_argument('current', help='New benchmark JSON')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Allowed regression in percent')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    if baseline['meta'].get('scale') != current['meta'].get('scale'):
+        print(f"warning: comparing scale '{baseline['meta'].get('scale')}' "
+              f"against '{current['meta'].get('scale')}'")
+
+    regressions = 0
+    for mode, route, metric, old, new, change, regressed in compare(baseline, current, args.threshold):
+        flag = 'REGRESSION' if regressed else ''
+        print(f"{mode:6} {route:46} {metric:15} {old:>12} -> {new:>12} ({change:+7.1f}%) {flag}")
+        regressions += regressed
+
+    print(f"\n{regressions} regression(s) beyond {args.threshold}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
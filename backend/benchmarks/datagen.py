@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Academia AI - Synthetic Data Generator
+Populates an Academia AI SQLite database with deterministic synthetic students,
+courses, enrollments and attendance rows for benchmarking.
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add the backend directory to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import enrollments
+import partitions
+
+# Each scale step multiplies every table by ten
+SCALES = {
+    'tiny': {'students': 100, 'courses': 10, 'attendance': 10_000},
+    'small': {'students': 1_000, 'courses': 100, 'attendance': 100_000},
+    'medium': {'students': 10_000, 'courses': 1_000, 'attendance': 1_000_000},
+    'large': {'students': 100_000, 'courses': 10_000, 'attendance': 10_000_000},
+}
+
+STATUSES = ['present', 'present', 'present', 'present', 'late', 'absent']
+FIRST_NAMES = ['Alex', 'Maria', 'James', 'Sarah', 'Michael', 'Emily', 'Priya', 'Omar', 'Chen', 'Lucia']
+LAST_NAMES = ['Johnson', 'Garcia', 'Wilson', 'Lee', 'Brown', 'Davis', 'Patel', 'Khan', 'Wang', 'Rossi']
+BATCH_SIZE = 10_000
+
+
+def student_code(index):
+    """Return the public student ID used for synthetic student number ``index``."""
+    return f"B{index:07d}"
+
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def populate(db_path, scale='tiny', seed=42, days=180):
+    """Insert synthetic data into ``db_path`` and return the row counts used."""
+    counts = SCALES[scale]
+    rng = random.Random(seed)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id FROM users WHERE role = 'teacher'")
+    professor_ids = [row[0] for row in cursor.fetchall()] or [None]
+
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM students')
+    first_student = cursor.fetchone()[0] + 1
+
+    def students():
+        for i in range(counts['students']):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            yield (f"{first} {last}", student_code(i), f"{first}.{last}.{i}@student.edu".lower(), first[0] + last[0])
+
+    for batch in _batched(students()):
+        cursor.executemany('''
+            INSERT INTO students (name, student_id, email, avatar)
+            VALUES (?, ?, ?, ?)
+        ''', batch)
+
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM courses')
+    first_course = cursor.fetchone()[0] + 1
+
+    def courses():
+        for i in range(counts['courses']):
+            yield (
+                f"C{i:04d}",
+                f"Synthetic Course {i}",
+                rng.choice(professor_ids),
+                f"{8 + i % 9}:00 AM - {9 + i % 9}:30 AM",
+                str(100 + i % 400),
+                chr(ord('A') + i % 6),
+                rng.randint(18, 60)
+            )
+
+    for batch in _batched(courses()):
+        cursor.executemany('''
+            INSERT INTO courses (abbreviation, title, professor_id, time_slot, room, section, max_students)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+
+    start = date.today() - timedelta(days=days - 1)
+    date_strings = [(start + timedelta(days=d)).strftime('%Y-%m-%d') for d in range(days)]
+    marker = professor_ids[0]
+
+    def attendance():
+        for _ in range(counts['attendance']):
+            yield (
+                first_student + rng.randrange(counts['students']),
+                first_course + rng.randrange(counts['courses']),
+                rng.choice(date_strings),
+                rng.choice(STATUSES),
+                marker
+            )
+
+    # Imported here because the benchmarks set the environment config reads after importing this module
+    from config.config import TERM_START_MONTHS
+    for batch in _batched(attendance()):
+        partitions.insert_rows(conn, batch, TERM_START_MONTHS)
+
+    # Fill every course a little past capacity, so some of it waitlists
+    cursor.execute('SELECT id, max_students FROM courses WHERE id >= ?', (first_course,))
+    for course_id, max_students in cursor.fetchall():
+        size = min(counts['students'], max_students + rng.randint(0, 5))
+        enrolled = rng.sample(range(first_student, first_student + counts['students']), size)
+        enrollments.enroll(conn, course_id, enrolled)
+
+    conn.commit()
+    conn.close()
+    return dict(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Populate an Academia AI database with synthetic data')
+    parser.add_argument('db_path', help='SQLite database to populate (schema must already exist)')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='tiny')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=int, default=180, help='Number of days of attendance history')
+    args = parser.parse_args()
+
+    counts = populate(args.db_path, args.scale, args.seed, args.days)
+    print(f"Inserted {counts['students']} students, {counts['courses']} courses, "
+          f"{counts['attendance']} attendance rows into {args.db_path}")
+
+
+if __name__ == '__main__':
+    main()
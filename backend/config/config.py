@@ -17,10 +17,102 @@ API_DEBUG = os.getenv("API_DEBUG", "True").lower() == "true"
 
 # Database Configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///academia_ai.db")
+DATABASE_PATH = DATABASE_URL.replace("sqlite:///", "", 1)
+
+# Multi-Tenant Configuration
+# When enabled every institution gets its own database in TENANT_DB_DIR and DATABASE_PATH is unused
+TENANTS_ENABLED = os.getenv("TENANTS_ENABLED", "False").lower() == "true"
+TENANT_DB_DIR = Path(os.getenv("TENANT_DB_DIR", BASE_DIR / "backend" / "tenant_dbs"))
+# A request names its tenant by this header, else a subdomain of TENANT_BASE_DOMAIN, else its token
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant")
+TENANT_BASE_DOMAIN = os.getenv("TENANT_BASE_DOMAIN", "")
+# Create databases for unknown tenants on first request instead of answering 404
+TENANT_AUTO_CREATE = os.getenv("TENANT_AUTO_CREATE", "False").lower() == "true"
+TENANT_SAMPLE_DATA = os.getenv("TENANT_SAMPLE_DATA", "False").lower() == "true"
+# Open tenant handles kept per worker, and how long an unused one stays open
+TENANT_MAX_OPEN = int(os.getenv("TENANT_MAX_OPEN", 256))
+TENANT_IDLE_SECONDS = float(os.getenv("TENANT_IDLE_SECONDS", 600))
+# Idle connections kept per tenant
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", 4))
+# Requests one tenant may run at once per worker, so a busy school cannot take every thread,
+# and how long a request waits for a free slot before a 503
+TENANT_MAX_CONCURRENT = int(os.getenv("TENANT_MAX_CONCURRENT", 8))
+TENANT_WAIT_SECONDS = float(os.getenv("TENANT_WAIT_SECONDS", 1))
+
+# Academic Term Configuration
+# Months in which a term starts; a term runs until the next start month
+TERM_START_MONTHS = [int(month) for month in os.getenv("TERM_START_MONTHS", "1,8").split(",")]
+
+# Maintenance Configuration
+# How often backups, incremental vacuum and archiving run; 0 disables the in-process scheduler
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", 24 * 60 * 60))
+MAINTENANCE_BACKUP_DIR = Path(os.getenv("MAINTENANCE_BACKUP_DIR", BASE_DIR / "backend" / "backups"))
+MAINTENANCE_BACKUPS_KEPT = int(os.getenv("MAINTENANCE_BACKUPS_KEPT", 7))
+# Pages copied per backup step and the pause between steps that lets writers in
+MAINTENANCE_BACKUP_PAGES = int(os.getenv("MAINTENANCE_BACKUP_PAGES", 1024))
+MAINTENANCE_BACKUP_SLEEP_SECONDS = float(os.getenv("MAINTENANCE_BACKUP_SLEEP_SECONDS", 0.05))
+# Free pages returned to the filesystem per run; 0 returns them all
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", 2000))
+# Terms whose attendance partitions are kept, the current one included; older ones are archived.
+# Keep this covering PATTERNS_HISTORY_DAYS and RISK_WINDOW_WEEKS.
+MAINTENANCE_HOT_TERMS = int(os.getenv("MAINTENANCE_HOT_TERMS", 4))
+MAINTENANCE_ARCHIVE_CHUNK_ROWS = int(os.getenv("MAINTENANCE_ARCHIVE_CHUNK_ROWS", 50000))
+
+# Audit Log Configuration
+# Attendance changes are buffered and written in batches this often, or sooner once a batch fills;
+# a crash loses at most this much
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", 1))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+# Past this many waiting entries, marking writes them itself instead of waiting for the writer
+AUDIT_MAX_BUFFERED = int(os.getenv("AUDIT_MAX_BUFFERED", 10000))
+# Entries for attendance older than this are compacted into compressed blocks by the maintenance run
+AUDIT_HOT_DAYS = int(os.getenv("AUDIT_HOT_DAYS", 90))
+
+# Background Job Configuration
+# Job threads per worker process; 0 leaves queued jobs to other processes
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# How often idle job threads look for work queued by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 2))
+# Idle job threads only visit tenants open in their process; every tenant is checked this often
+JOB_SWEEP_ALL_SECONDS = float(os.getenv("JOB_SWEEP_ALL_SECONDS", 300))
+# A running job that has not reported progress for this long is assumed lost and requeued
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 900))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Wait before the first retry, doubled on every further attempt
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", 30))
+# Finished jobs are deleted by the maintenance run once this old
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", 30))
 
 # Security Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-jwt-secret-key")
+# Access tokens are short-lived; clients renew them with a rotating refresh token
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", 15))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", 30))
+# How often each worker reloads sessions revoked by other workers
+SESSION_REVOCATION_SYNC_SECONDS = float(os.getenv("SESSION_REVOCATION_SYNC_SECONDS", 5))
+
+# Reverse proxies in front of the app; request.remote_addr, scheme and host are taken from the
+# X-Forwarded-* headers they append. 0 trusts no such header, so clients cannot spoof their address.
+PROXY_FIX_HOPS = int(os.getenv("PROXY_FIX_HOPS", 0))
+
+# Rate Limiting Configuration
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+# "memory" keeps buckets per worker; "sqlite" shares them between workers on one host
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "rate_limits.db")
+# Budgets per "METHOD /route" as {scope: "count/period"}; scope is ip, user or route.
+# Routes not listed get RATE_LIMIT_DEFAULT; every budget is tracked per route.
+RATE_LIMIT_DEFAULT = {"ip": "600/minute", "user": "300/minute"}
+RATE_LIMITS = {
+    "POST /api/auth/login": {"ip": "10/minute"},
+    "POST /api/auth/register": {"ip": "5/hour"},
+    "POST /api/auth/refresh": {"ip": "60/minute"},
+    "GET /api/attendance": {"user": "30/minute", "ip": "60/minute"},
+    "POST /api/attendance": {"user": "120/minute"},
+    "POST /api/attendance/sync": {"user": "60/minute"},
+    "POST /api/admin/profile": {"user": "2/minute"}
+}
 
 # CORS Configuration
 CORS_ORIGINS = [
@@ -33,6 +125,77 @@ CORS_ORIGINS = [
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_FILE = os.getenv("LOG_FILE", "backend.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 7))
+LOG_ROTATE_INTERVAL_SECONDS = int(os.getenv("LOG_ROTATE_INTERVAL_SECONDS", 24 * 60 * 60))
+# Records beyond this many waiting in the queue are dropped rather than blocking requests
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Fraction of access log records kept for high-volume routes
+LOG_SAMPLE_RATES = {
+    "/api/attendance": 0.1,
+    "/api/dashboard/stats": 0.1,
+    "/api/health": 0.01,
+    "/api/metrics": 0.01
+}
+
+# Metrics Configuration
+# Queries slower than this many milliseconds are logged; 0 disables the slow query log
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 0))
+
+# Profiling Configuration
+PROFILE_OUTPUT_DIR = Path(os.getenv("PROFILE_OUTPUT_DIR", BASE_DIR / "backend" / "profiles"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", 60))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5))
+# Admins can profile a single request by sending this header
+PROFILE_HEADER = "X-Profile"
+
+# Attendance Pattern Configuration
+# Days of attendance kept in memory for streak, rolling-rate and heatmap queries
+PATTERNS_HISTORY_DAYS = int(os.getenv("PATTERNS_HISTORY_DAYS", 365))
+# Reload from the database this often to pick up marks written by other workers
+PATTERNS_RELOAD_SECONDS = int(os.getenv("PATTERNS_RELOAD_SECONDS", 300))
+
+# Roll-Call Configuration
+# Days before a session summarised next to each student on its roll-call sheet
+ROLL_CALL_HISTORY_DAYS = int(os.getenv("ROLL_CALL_HISTORY_DAYS", 28))
+# Sheets cached per worker and tenant, one per course and day
+ROLL_CALL_CACHE_SIZE = int(os.getenv("ROLL_CALL_CACHE_SIZE", 512))
+
+# Offline Sync Configuration
+# Marks dated further back are refused, and their clocks and applied ops forgotten
+SYNC_WINDOW_DAYS = int(os.getenv("SYNC_WINDOW_DAYS", 14))
+SYNC_MAX_BATCH = int(os.getenv("SYNC_MAX_BATCH", 500))
+# Changed marks returned per sync; clients sync again for the rest
+SYNC_DELTA_LIMIT = int(os.getenv("SYNC_DELTA_LIMIT", 1000))
+
+# Risk Scoring Configuration
+# How often the early-warning pipeline rescores students; 0 disables the in-process scheduler
+RISK_PIPELINE_INTERVAL_SECONDS = int(os.getenv("RISK_PIPELINE_INTERVAL_SECONDS", 3600))
+# Weeks of attendance scored, and the half-life weighting recent weeks more heavily
+RISK_WINDOW_WEEKS = int(os.getenv("RISK_WINDOW_WEEKS", 12))
+RISK_HALF_LIFE_WEEKS = float(os.getenv("RISK_HALF_LIFE_WEEKS", 2))
+# Recent weeks compared against the rest of the window to report a trend
+RISK_TREND_WEEKS = int(os.getenv("RISK_TREND_WEEKS", 2))
+# Students with fewer sessions in the window are not scored
+RISK_MIN_SESSIONS = int(os.getenv("RISK_MIN_SESSIONS", 3))
+# Score changes smaller than this are not stored unless the bucket changes
+RISK_SCORE_EPSILON = float(os.getenv("RISK_SCORE_EPSILON", 0.01))
+
+# Live Events Configuration
+# Under the threaded WSGI server every open event stream holds a thread, so cap them per worker
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", 200))
+# Events buffered per slow client before it is told to resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+# Recent events kept so reconnecting clients can catch up via Last-Event-ID
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", 500))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+# Lifetime of the tickets EventSource clients open the stream with; they end up in URLs and logs
+EVENTS_TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", 60))
+
+# ASGI Configuration
+# Threads that run route handlers and their SQLite work under the ASGI entry point
+ASGI_WORKER_THREADS = int(os.getenv("ASGI_WORKER_THREADS", 16))
 
 # Model Configuration
 MODEL_CONFIG = {
@@ -50,8 +213,29 @@ MODEL_CONFIG = {
     }
 }
 
+# Trained models replace prediction_weights once one is activated
+# How often each worker checks for a newly activated model
+MODEL_SYNC_SECONDS = float(os.getenv("MODEL_SYNC_SECONDS", 30))
+MODEL_TRAIN_FOLDS = int(os.getenv("MODEL_TRAIN_FOLDS", 5))
+MODEL_TRAIN_L2 = float(os.getenv("MODEL_TRAIN_L2", 1e-3))
+# Predictions cached per worker; features are rounded to this step (on a 0..1 scale) for the cache key
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_QUANTUM = float(os.getenv("PREDICTION_CACHE_QUANTUM", 0.001))
+
 # File paths
 STATIC_FILES_DIR = FRONTEND_DIR / "assets"
 TEMPLATES_DIR = FRONTEND_DIR / "templates"
 JS_DIR = FRONTEND_DIR / "js"
-CSS_DIR = FRONTEND_DIR / "style" 
\ No newline at end of file
+CSS_DIR = FRONTEND_DIR / "style" 
+# Static asset pipeline
+STATIC_ASSET_DIRS = [JS_DIR, CSS_DIR, STATIC_FILES_DIR]
+STATIC_BUILD_DIR = Path(os.getenv("STATIC_BUILD_DIR", FRONTEND_DIR / "dist"))
+STATIC_URL_PREFIX = "/static"
+# Minify JS/CSS, split global.js into per-page bundles and drop unused CSS rules
+STATIC_OPTIMIZE = os.getenv("STATIC_OPTIMIZE", "True").lower() == "true"
+# Rebuild stale assets when a worker starts; deploys that run static_assets.py can turn this off
+STATIC_BUILD_ON_START = os.getenv("STATIC_BUILD_ON_START", "True").lower() == "true"
+# Fingerprinted assets never change, so browsers may cache them for a year
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+# Let a fronting web server stream files via X-Sendfile instead of the worker
+STATIC_USE_X_SENDFILE = os.getenv("STATIC_USE_X_SENDFILE", "False").lower() == "true"
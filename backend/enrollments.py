@@ -0,0 +1,262 @@
+"""
+Course enrollment for Academia AI Backend
+enrollments records which students belong to which course, so rosters no
+longer have to be pieced together from attendance. course_seats keeps a
+per-course count of enrolled students that is checked against
+courses.max_students; students past capacity join a first-come waitlist
+that is promoted in bulk as seats free up.
+"""
+
+import time
+
+import partitions
+import rollcall
+
+STATUSES = ('enrolled', 'waitlisted', 'dropped')
+
+# SQLite's default limit on bound parameters is well above this
+_CHUNK = 500
+
+
+def init_enrollment_tables(cursor):
+    """Create the enrollment and seat count tables.
+
+    A new enrollments table starts with every student who has attendance
+    in a course, enrolled regardless of capacity.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'enrollments'")
+    created = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrollments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            requested_at REAL NOT NULL,
+            enrolled_at REAL,
+            dropped_at REAL,
+            UNIQUE (course_id, student_id),
+            FOREIGN KEY (course_id) REFERENCES courses (id),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    # Rosters and waitlists in queue order, and a student's courses
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_enrollments_course_status
+        ON enrollments (course_id, status, requested_at)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_enrollments_student ON enrollments (student_id, status)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS course_seats (
+            course_id INTEGER PRIMARY KEY,
+            enrolled INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (course_id) REFERENCES courses (id)
+        )
+    ''')
+    if created:
+        _backfill_from_attendance(cursor)
+
+
+def _backfill_from_attendance(cursor):
+    now = time.time()
+    # Another worker may be backfilling too, so both statements are idempotent
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO enrollments (course_id, student_id, status, requested_at, enrolled_at)
+        SELECT course_id, student_id, 'enrolled', ?, ? FROM {partitions.VIEW}
+        WHERE course_id IN (SELECT id FROM courses) AND student_id IN (SELECT id FROM students)
+        GROUP BY course_id, student_id
+    ''', (now, now))
+    cursor.execute('''
+        INSERT OR REPLACE INTO course_seats (course_id, enrolled)
+        SELECT course_id, COUNT(*) FROM enrollments WHERE status = 'enrolled' GROUP BY course_id
+    ''')
+
+
+def _promote(cursor, course_id, now):
+    """Enroll waitlisted students, oldest request first, into the course's free seats.
+
+    Must run inside a write transaction with the course's seat row present.
+    Returns the promoted student ids.
+    """
+    # A course without max_students has no limit, which LIMIT -1 means
+    cursor.execute('''
+        SELECT id, student_id FROM enrollments
+        WHERE course_id = ? AND status = 'waitlisted'
+        ORDER BY requested_at, id
+        LIMIT (
+            SELECT CASE WHEN c.max_students IS NULL THEN -1 ELSE MAX(0, c.max_students - s.enrolled) END
+            FROM courses c JOIN course_seats s ON s.course_id = c.id
+            WHERE c.id = ?
+        )
+    ''', (course_id, course_id))
+    promoted = cursor.fetchall()
+    if promoted:
+        cursor.executemany("UPDATE enrollments SET status = 'enrolled', enrolled_at = ? WHERE id = ?",
+                           [(now, row[0]) for row in promoted])
+        cursor.execute('UPDATE course_seats SET enrolled = enrolled + ? WHERE course_id = ?',
+                       (len(promoted), course_id))
+    return [row[1] for row in promoted]
+
+
+def _statuses(cursor, course_id, student_ids):
+    statuses = {}
+    for i in range(0, len(student_ids), _CHUNK):
+        chunk = student_ids[i:i + _CHUNK]
+        cursor.execute(f'''
+            SELECT student_id, status FROM enrollments
+            WHERE course_id = ? AND student_id IN ({', '.join('?' * len(chunk))})
+        ''', [course_id] + chunk)
+        statuses.update(cursor.fetchall())
+    return statuses
+
+
+def _run(conn, work):
+    # Every caller's first statement is a write, so its transaction holds the
+    # write lock from the start and the seat counts it reads cannot go stale.
+    # Callers already in a transaction commit it themselves.
+    standalone = not conn.in_transaction
+    try:
+        result = work(conn.cursor(), time.time())
+        if standalone:
+            conn.commit()
+    except Exception:
+        if standalone:
+            conn.rollback()
+        raise
+    return result
+
+
+def enroll(conn, course_id, student_ids):
+    """Enroll students in a course while seats last and waitlist the rest, in list order.
+
+    Students already enrolled or waitlisted keep their place. Returns
+    ``(statuses, promoted)``: each listed student's status afterwards, and
+    every student enrolled by this call.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+
+    def work(cursor, now):
+        cursor.execute('INSERT OR IGNORE INTO course_seats (course_id, enrolled) VALUES (?, 0)', (course_id,))
+        # Everyone joins the back of the waitlist, then the free seats are filled from its front
+        cursor.executemany('''
+            INSERT INTO enrollments (course_id, student_id, status, requested_at)
+            VALUES (?, ?, 'waitlisted', ?)
+            ON CONFLICT (course_id, student_id) DO UPDATE SET
+                status = 'waitlisted', requested_at = excluded.requested_at, enrolled_at = NULL, dropped_at = NULL
+            WHERE status = 'dropped'
+        ''', [(course_id, student_id, now + i * 1e-6) for i, student_id in enumerate(student_ids)])
+        promoted = _promote(cursor, course_id, now)
+        rollcall.invalidate(cursor, course_id)
+        return _statuses(cursor, course_id, student_ids), promoted
+
+    return _run(conn, work)
+
+
+def drop(conn, course_id, student_id):
+    """Drop a student from a course or its waitlist, promoting the waitlist into a freed seat.
+
+    Returns ``(previous_status, promoted)``; previous_status is None when the
+    student was neither enrolled nor waitlisted.
+    """
+    def work(cursor, now):
+        for status in ('enrolled', 'waitlisted'):
+            cursor.execute('''
+                UPDATE enrollments SET status = 'dropped', dropped_at = ?
+                WHERE course_id = ? AND student_id = ? AND status = ?
+            ''', (now, course_id, student_id, status))
+            if cursor.rowcount:
+                break
+        else:
+            return None, []
+        if status == 'waitlisted':
+            return status, []
+        cursor.execute('UPDATE course_seats SET enrolled = enrolled - 1 WHERE course_id = ?', (course_id,))
+        rollcall.invalidate(cursor, course_id)
+        return status, _promote(cursor, course_id, now)
+
+    return _run(conn, work)
+
+
+def set_capacity(conn, course_id, max_students):
+    """Change a course's capacity, promoting the waitlist into any new seats.
+
+    Lowering it below the enrolled count drops nobody; it only stops new
+    enrollments. Returns the promoted student ids, or None when there is no
+    such course.
+    """
+    def work(cursor, now):
+        cursor.execute('UPDATE courses SET max_students = ? WHERE id = ?', (max_students, course_id))
+        if not cursor.rowcount:
+            return None
+        cursor.execute('INSERT OR IGNORE INTO course_seats (course_id, enrolled) VALUES (?, 0)', (course_id,))
+        promoted = _promote(cursor, course_id, now)
+        if promoted:
+            rollcall.invalidate(cursor, course_id)
+        return promoted
+
+    return _run(conn, work)
+
+
+def roster(conn, course_id, status='enrolled'):
+    """Return a course's enrolled or waitlisted students; the waitlist comes in queue order."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT s.id, s.name, s.student_id, s.email, s.avatar, e.requested_at, e.enrolled_at
+        FROM enrollments e
+        JOIN students s ON s.id = e.student_id
+        WHERE e.course_id = ? AND e.status = ?
+        ORDER BY e.requested_at, e.id
+    ''', (course_id, status))
+    students = []
+    for position, row in enumerate(cursor.fetchall(), 1):
+        student = {
+            'id': row[0],
+            'name': row[1],
+            'student_id': row[2],
+            'email': row[3],
+            'avatar': row[4],
+            'requested_at': row[5],
+            'enrolled_at': row[6]
+        }
+        if status == 'waitlisted':
+            student['position'] = position
+        students.append(student)
+    return students
+
+
+def seat_counts(conn, course_id):
+    """Return (max_students, enrolled, waitlisted) for a course, or None when there is no such course."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT c.max_students, COALESCE(s.enrolled, 0),
+               (SELECT COUNT(*) FROM enrollments WHERE course_id = c.id AND status = 'waitlisted')
+        FROM courses c
+        LEFT JOIN course_seats s ON s.course_id = c.id
+        WHERE c.id = ?
+    ''', (course_id,))
+    return cursor.fetchone()
+
+
+def student_courses(conn, student_id):
+    """Return the courses a student is enrolled or waitlisted in."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT c.id, c.abbreviation, c.title, c.time_slot, c.room, c.section, e.status, e.requested_at
+        FROM enrollments e
+        JOIN courses c ON c.id = e.course_id
+        WHERE e.student_id = ? AND e.status IN ('enrolled', 'waitlisted')
+        ORDER BY c.abbreviation
+    ''', (student_id,))
+    return [
+        {
+            'id': row[0],
+            'abbreviation': row[1],
+            'title': row[2],
+            'time_slot': row[3],
+            'room': row[4],
+            'section': row[5],
+            'status': row[6],
+            'requested_at': row[7]
+        }
+        for row in cursor.fetchall()
+    ]
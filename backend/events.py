@@ -0,0 +1,208 @@
+"""
+Live event broker for Academia AI Backend
+In-process publish/subscribe with per-course topics, streamed to browsers as
+server-sent events. Subscribers only see events published by the same worker
+process, so multi-worker deployments need sticky routing or a single worker
+for the event stream.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+from collections import deque
+
+import metrics
+
+# Events that belong to no course reach every subscriber
+GLOBAL_TOPIC = 'global'
+# Course events are also published here for subscribers without a course filter
+ALL_COURSES_TOPIC = 'courses'
+
+# Milliseconds browsers wait before reconnecting a dropped stream
+RETRY_MS = 3000
+
+EVENTS_PUBLISHED = metrics.registry.counter(
+    'academia_events_published_total', 'Live events published by type', ('event',)
+)
+EVENT_SUBSCRIBERS = metrics.registry.gauge('academia_event_subscribers', 'Open live event streams')
+EVENTS_OVERFLOWED = metrics.registry.counter(
+    'academia_event_overflows_total', 'Subscribers that fell behind and were told to resync'
+)
+
+
+class TooManySubscribers(Exception):
+    """Raised when the worker already holds the maximum number of streams."""
+
+
+def course_topic(course_id):
+    return f'course:{course_id}'
+
+
+def subscriber_topics(course_ids=()):
+    """Return the topics for a client following ``course_ids``, or every course when empty."""
+    course_topics = {course_topic(course_id) for course_id in course_ids}
+    return {GLOBAL_TOPIC} | (course_topics or {ALL_COURSES_TOPIC})
+
+
+def format_sse(event, data, event_id=None):
+    """Encode one event in the text/event-stream wire format."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"), default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """One client's bounded queue of pending events."""
+
+    def __init__(self, topics, queue_size):
+        self.topics = frozenset(topics)
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Id of the event the client missed; set once the subscriber has fallen behind
+        self.resync_id = None
+        self.closed = False
+        # Called from the publishing thread after each event; used by async streams
+        self.notify = None
+
+    def offer(self, item):
+        """Queue an event without blocking the publisher; on overflow ask the client to resync."""
+        if self.resync_id is not None:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.resync_id = item[0]
+            EVENTS_OVERFLOWED.inc()
+        if self.notify is not None:
+            self.notify()
+
+    def get(self, timeout):
+        """Return the next (id, event, data), or None after ``timeout`` seconds.
+
+        A subscriber that fell behind gets a single 'resync' event whose id
+        lets the browser reconnect from after the events it missed.
+        """
+        if self.resync_id is not None:
+            return self.resync_id, 'resync', {'reason': 'missed events'}
+        try:
+            if timeout == 0:
+                return self.queue.get_nowait()
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Fans published events out to the subscribers of their topics."""
+
+    def __init__(self, queue_size=100, replay_size=500, max_subscribers=200):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._subscriber_count = 0
+        self._replay = deque(maxlen=replay_size)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def has_subscribers(self):
+        return self._subscriber_count > 0
+
+    def publish(self, event, data, course_id=None):
+        """Publish to the course's topics, or to every subscriber when ``course_id`` is None."""
+        if course_id is None:
+            topics = {GLOBAL_TOPIC}
+        else:
+            topics = {course_topic(course_id), ALL_COURSES_TOPIC}
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            item = (event_id, event, data)
+            self._replay.append((topics, item))
+            targets = {sub for topic in topics for sub in self._subscribers.get(topic, ())}
+        for subscription in targets:
+            subscription.offer(item)
+        EVENTS_PUBLISHED.inc(event)
+        return event_id
+
+    def subscribe(self, topics, last_event_id=None):
+        """Register a subscription, replaying events newer than ``last_event_id``.
+
+        If the replay buffer cannot cover the gap the client is told to
+        resync instead.
+        """
+        subscription = Subscription(topics, self.queue_size)
+        with self._lock:
+            if self._subscriber_count >= self.max_subscribers:
+                raise TooManySubscribers('Too many open event streams')
+            latest = self._next_id - 1
+            if last_event_id is not None and last_event_id != latest:
+                oldest = self._replay[0][1][0] if self._replay else self._next_id
+                # Ids from the future come from before a restart of this worker
+                if last_event_id > latest or last_event_id < oldest - 1:
+                    subscription.resync_id = latest
+                else:
+                    for event_topics, item in self._replay:
+                        if item[0] > last_event_id and event_topics & subscription.topics:
+                            subscription.offer(item)
+            for topic in subscription.topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+            self._subscriber_count += 1
+            EVENT_SUBSCRIBERS.set(value=self._subscriber_count)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+            self._subscriber_count -= 1
+            EVENT_SUBSCRIBERS.set(value=self._subscriber_count)
+
+    def stream(self, subscription, heartbeat):
+        """Yield server-sent event chunks until the client disconnects.
+
+        The caller unsubscribes when the response closes, which also covers
+        streams that are dropped before their first chunk.
+        """
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            item = subscription.get(heartbeat)
+            if item is None:
+                # Comment lines keep proxies from closing idle connections
+                yield ': keep-alive\n\n'
+                continue
+            event_id, event, data = item
+            yield format_sse(event, data, event_id)
+            if event == 'resync':
+                return
+
+    async def stream_async(self, subscription, heartbeat):
+        """Async variant of ``stream`` that waits on the event loop instead of a thread."""
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        subscription.notify = lambda: loop.call_soon_threadsafe(wake.set)
+
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            # Clear before polling so an event offered in between still wakes us
+            wake.clear()
+            item = subscription.get(0)
+            if item is None:
+                try:
+                    await asyncio.wait_for(wake.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                continue
+            event_id, event, data = item
+            yield format_sse(event, data, event_id)
+            if event == 'resync':
+                return
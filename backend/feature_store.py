@@ -0,0 +1,346 @@
+"""
+Feature store for Academia AI Backend
+Persists the prediction inputs collected by the prediction form (test scores,
+study hours, parental support and activities) as versioned snapshots. Every
+bulk load creates a version; student_features keeps the typed rows and
+feature_matrices keeps each version packed column by column so that scoring
+reads whole NumPy arrays instead of building a Python object per row.
+"""
+
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+# Column order of FeatureBatch.values
+FEATURES = ('test_scores', 'study_hours', 'parental_support', 'activities')
+
+PARENTAL_SUPPORT_LEVELS = {'low': 0, 'medium': 1, 'high': 2}
+ACTIVITIES_VALUES = {'no': 0, 'yes': 1, 'false': 0, 'true': 1}
+
+# Packed columns are stored little-endian whatever the host byte order
+ID_DTYPE = np.dtype('<i8')
+VALUE_DTYPE = np.dtype('<f8')
+
+# Packed matrices kept for older versions; any version can be rebuilt from rows
+MATRICES_KEPT = 5
+
+FeatureBatch = namedtuple('FeatureBatch', 'version student_ids values columns')
+FeatureBatch.__doc__ = '''Features of many students: ``values[i]`` belongs to ``student_ids[i]``.
+
+Missing features are NaN. ``columns`` names the columns of ``values``.
+'''
+
+
+class InvalidFeatures(ValueError):
+    """Raised when a feature record is missing a student or has an out-of-range value."""
+
+
+def init_feature_tables(cursor):
+    """Create the feature store tables."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS feature_versions (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            source TEXT,
+            rows INTEGER NOT NULL
+        )
+    ''')
+    # One row per student changed in a version; NULL means not collected
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_features (
+            student_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            test_scores REAL CHECK (test_scores BETWEEN 0 AND 100),
+            study_hours REAL CHECK (study_hours BETWEEN 0 AND 168),
+            parental_support INTEGER CHECK (parental_support IN (0, 1, 2)),
+            activities INTEGER CHECK (activities IN (0, 1)),
+            PRIMARY KEY (student_id, version),
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            FOREIGN KEY (version) REFERENCES feature_versions (version)
+        ) WITHOUT ROWID
+    ''')
+    # Every student's features as of a version, one packed array per column
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS feature_matrices (
+            version INTEGER PRIMARY KEY,
+            student_ids BLOB NOT NULL,
+            {', '.join(f'{name} BLOB NOT NULL' for name in FEATURES)},
+            FOREIGN KEY (version) REFERENCES feature_versions (version)
+        )
+    ''')
+
+
+def _number(record, name, low, high):
+    value = record.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise InvalidFeatures(f'{name} must be a number')
+    if not low <= value <= high:
+        raise InvalidFeatures(f'{name} must be between {low} and {high}')
+    return value
+
+
+def _level(record, name, levels):
+    value = record.get(name)
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, str) and value.strip().lower() in levels:
+        return levels[value.strip().lower()]
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = None
+    if value not in levels.values():
+        raise InvalidFeatures(f"{name} must be one of {', '.join(levels)}")
+    return value
+
+
+def normalize_record(record):
+    """Return (test_scores, study_hours, parental_support, activities) from a form-style record.
+
+    parental_support takes Low/Medium/High or 0-2 and activities Yes/No,
+    booleans or 0/1, matching the prediction form. Blank values become None.
+    """
+    return (
+        _number(record, 'test_scores', 0, 100),
+        _number(record, 'study_hours', 0, 168),
+        _level(record, 'parental_support', PARENTAL_SUPPORT_LEVELS),
+        _level(record, 'activities', ACTIVITIES_VALUES)
+    )
+
+
+def _clears(record):
+    """Return, per feature, whether ``record`` asks for it to be cleared.
+
+    'clear' holds feature names as a list or a comma- or space-separated string.
+    """
+    names = record.get('clear') or ()
+    if isinstance(names, str):
+        names = names.replace(',', ' ').split()
+    unknown = [name for name in names if name not in FEATURES]
+    if unknown:
+        raise InvalidFeatures(f"clear names unknown features: {', '.join(map(str, unknown))}")
+    for name in names:
+        if record.get(name) not in (None, ''):
+            raise InvalidFeatures(f'{name} cannot be both set and cleared')
+    return tuple(name in names for name in FEATURES)
+
+
+def _pack(array, dtype):
+    return np.ascontiguousarray(array, dtype=dtype).tobytes()
+
+
+def latest_version(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT MAX(version) FROM feature_versions')
+    return cursor.fetchone()[0]
+
+
+def bulk_load(conn, records, source=None):
+    """Store features for many students as one new version; returns the version.
+
+    ``records`` yields dicts with the table id under 'id' and any of the
+    FEATURES. A feature left out or blank keeps its previous value, as do
+    students missing from the load; only features named under 'clear' are
+    reset to not collected. The whole load is one transaction, so readers
+    see all of it or none.
+    """
+    ids, rows, clears = [], [], []
+    for number, record in enumerate(records, 1):
+        try:
+            student_id = int(record['id'])
+            rows.append(normalize_record(record))
+            clears.append(_clears(record))
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidFeatures(f'Record {number}: {e}') from None
+        ids.append(student_id)
+    if not ids:
+        raise InvalidFeatures('No feature records to load')
+
+    # Merge a student's records in order, so a later value or clear wins over an earlier one
+    merged = {}
+    for student_id, values, cleared in zip(ids, rows, clears):
+        current = merged.setdefault(student_id, [(None, False)] * len(FEATURES))
+        merged[student_id] = [
+            (None, True) if clear else (value, False) if value is not None else previous
+            for value, clear, previous in zip(values, cleared, current)
+        ]
+    new_ids = np.array(sorted(merged), dtype=np.int64)
+    merged = [merged[student_id] for student_id in new_ids.tolist()]
+    new_values = np.array([[np.nan if value is None else value for value, _ in row] for row in merged])
+    cleared = np.array([[clear for _, clear in row] for row in merged], dtype=bool)
+
+    cursor = conn.cursor()
+    # Hold the write lock from reading the previous matrix until the commit
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        base = read_features(conn)
+        # Fill what the load left out from the previous version, so each stored row is complete
+        previous = _select(base, new_ids).values
+        new_values = np.where(np.isnan(new_values) & ~cleared, previous, new_values)
+        cursor.execute(
+            'INSERT INTO feature_versions (created_at, source, rows) VALUES (?, ?, ?)',
+            (time.time(), source, len(new_ids))
+        )
+        version = cursor.lastrowid
+        cursor.executemany(f'''
+            INSERT INTO student_features (student_id, version, {', '.join(FEATURES)})
+            VALUES (?, ?, {', '.join('?' * len(FEATURES))})
+        ''', ((sid, version, *(None if np.isnan(v) else v for v in values))
+              for sid, values in zip(new_ids.tolist(), new_values.tolist())))
+
+        # Merge the new rows over the previous matrix
+        student_ids = np.union1d(base.student_ids, new_ids)
+        values = np.full((len(student_ids), len(FEATURES)), np.nan)
+        values[np.searchsorted(student_ids, base.student_ids)] = base.values
+        values[np.searchsorted(student_ids, new_ids)] = new_values
+        _store_matrix(cursor, version, student_ids, values)
+        cursor.execute('DELETE FROM feature_matrices WHERE version <= ?', (version - MATRICES_KEPT,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
+
+
+def _store_matrix(cursor, version, student_ids, values):
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO feature_matrices (version, student_ids, {', '.join(FEATURES)})
+        VALUES (?, ?, {', '.join('?' * len(FEATURES))})
+    ''', (version, _pack(student_ids, ID_DTYPE), *(_pack(values[:, i], VALUE_DTYPE) for i in range(len(FEATURES)))))
+
+
+def _matrix_from_rows(conn, version):
+    """Rebuild the packed matrix of ``version`` from student_features."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT f.student_id, {', '.join(f'f.{name}' for name in FEATURES)}
+        FROM student_features f
+        JOIN (
+            SELECT student_id, MAX(version) AS version
+            FROM student_features
+            WHERE version <= ?
+            GROUP BY student_id
+        ) latest ON latest.student_id = f.student_id AND latest.version = f.version
+        ORDER BY f.student_id
+    ''', (version,))
+    dtype = np.dtype([('id', np.int64)] + [(name, np.float64) for name in FEATURES])
+    # NULL arrives as None, which becomes NaN in a float field
+    table = np.fromiter(
+        (tuple(np.nan if v is None else v for v in row) for row in cursor), dtype=dtype
+    )
+    values = np.column_stack([table[name] for name in FEATURES]) if len(table) else np.zeros((0, len(FEATURES)))
+    # Commit the cache only when no caller transaction is open around us
+    standalone = not conn.in_transaction
+    _store_matrix(cursor, version, table['id'], values)
+    if standalone:
+        conn.commit()
+
+
+def read_features(conn, version=None, student_ids=None, columns=FEATURES):
+    """Return a FeatureBatch of every student's features as of ``version`` (default latest).
+
+    With ``student_ids``, rows come back in that order and unknown students
+    get NaN. Only the requested ``columns`` are unpacked.
+    """
+    for name in columns:
+        if name not in FEATURES:
+            raise ValueError(f'Unknown feature: {name}')
+    version = latest_version(conn) if version is None else version
+    if version is None:
+        ids = np.zeros(0, dtype=np.int64)
+        batch = FeatureBatch(None, ids, np.zeros((0, len(columns))), tuple(columns))
+    else:
+        cursor = conn.cursor()
+        select = f"SELECT student_ids, {', '.join(columns)} FROM feature_matrices WHERE version = ?"
+        row = cursor.execute(select, (version,)).fetchone()
+        if row is None:
+            cursor.execute('SELECT 1 FROM feature_versions WHERE version = ?', (version,))
+            if cursor.fetchone() is None:
+                raise ValueError(f'Unknown feature version: {version}')
+            _matrix_from_rows(conn, version)
+            row = cursor.execute(select, (version,)).fetchone()
+        ids = np.frombuffer(row[0], dtype=ID_DTYPE).astype(np.int64)
+        values = np.empty((len(ids), len(columns)))
+        for i, blob in enumerate(row[1:]):
+            values[:, i] = np.frombuffer(blob, dtype=VALUE_DTYPE)
+        batch = FeatureBatch(version, ids, values, tuple(columns))
+
+    return batch if student_ids is None else _select(batch, student_ids)
+
+
+def _select(batch, student_ids):
+    """Return the rows of ``batch`` for ``student_ids`` in that order, NaN for unknown students."""
+    wanted = np.asarray(student_ids, dtype=np.int64)
+    values = np.full((len(wanted), len(batch.columns)), np.nan)
+    positions = np.searchsorted(batch.student_ids, wanted)
+    found = positions < len(batch.student_ids)
+    found[found] = batch.student_ids[positions[found]] == wanted[found]
+    values[found] = batch.values[positions[found]]
+    return FeatureBatch(batch.version, wanted, values, batch.columns)
+
+
+def to_records(batch):
+    """Return one {column: value} dict per row of ``batch``, with None for missing values."""
+    values = np.where(np.isnan(batch.values), None, batch.values).tolist()
+    return [dict(zip(batch.columns, row)) for row in values]
+
+
+def list_versions(conn, limit=20):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT version, created_at, source, rows FROM feature_versions ORDER BY version DESC LIMIT ?
+    ''', (limit,))
+    return [dict(zip(('version', 'created_at', 'source', 'rows'), row)) for row in cursor.fetchall()]
+
+
+def resolve_student_codes(conn, records):
+    """Fill in 'id' from the public 'student_id' code of records that lack it.
+
+    Raises InvalidFeatures naming the first unknown code.
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT student_id, id FROM students')
+    ids = dict(cursor.fetchall())
+    for number, record in enumerate(records, 1):
+        if record.get('id') is None:
+            code = record.get('student_id')
+            if code not in ids:
+                raise InvalidFeatures(f'Record {number}: unknown student {code!r}')
+            record['id'] = ids[code]
+    return records
+
+
+def main():
+    # Add the backend directory to Python path
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from config.config import DATABASE_PATH
+
+    parser = argparse.ArgumentParser(description='Load student features from a CSV file as a new version')
+    parser.add_argument('csv_path', help=f"CSV with a student_id column and any of: {', '.join(FEATURES)}, clear")
+    parser.add_argument('--db', default=DATABASE_PATH, help='SQLite database to load into')
+    parser.add_argument('--source', help='Label stored with the version (defaults to the file name)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    init_feature_tables(conn.cursor())
+    with open(args.csv_path, newline='', encoding='utf-8') as f:
+        records = resolve_student_codes(conn, list(csv.DictReader(f, restval='')))
+    version = bulk_load(conn, records, args.source or Path(args.csv_path).name)
+    conn.close()
+    print(f'Loaded {len(records)} records into {args.db} as feature version {version}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Background jobs for Academia AI Backend
+Expensive work such as rescoring, model training and maintenance is queued
+in the jobs table and run by worker threads, so the request that asks for
+it returns a job id straight away. Workers claim the highest priority job
+under the database write lock, report progress as they go, retry failures
+with backoff, and requeue jobs whose worker stopped heartbeating.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED = ('succeeded', 'failed', 'cancelled')
+
+JOBS_ENQUEUED = metrics.registry.counter('academia_jobs_enqueued_total', 'Background jobs queued', ('kind',))
+JOBS_FINISHED = metrics.registry.counter(
+    'academia_jobs_finished_total', 'Background job attempts finished, by outcome', ('kind', 'outcome')
+)
+JOB_DURATION = metrics.registry.histogram(
+    'academia_job_duration_seconds', 'Time spent running one background job attempt', ('kind',)
+)
+JOBS_RUNNING = metrics.registry.gauge('academia_jobs_running', 'Background jobs running in this worker')
+
+
+class UnknownJobKind(ValueError):
+    """Raised when a job is submitted for a kind no handler is registered for."""
+
+
+class JobError(Exception):
+    """Raised by a handler for a failure that retrying would not fix."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job was cancelled while running."""
+
+
+def init_job_tables(cursor):
+    """Create the job queue table."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            priority INTEGER NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            progress_message TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            created_by INTEGER,
+            created_at REAL NOT NULL,
+            run_after REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            heartbeat_at REAL,
+            worker TEXT,
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+    # Claiming walks this in priority order; finished jobs drop out of the status prefix
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_by ON jobs (created_by, id)')
+
+
+_COLUMNS = ('id', 'kind', 'status', 'priority', 'payload', 'result', 'error', 'progress', 'progress_message',
+            'attempts', 'max_attempts', 'created_by', 'created_at', 'run_after', 'started_at', 'finished_at')
+
+
+def _to_dict(row):
+    job = dict(zip(_COLUMNS, row))
+    job['payload'] = json.loads(job['payload'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+
+def get_job(conn, job_id):
+    """Return one job as a dict, or None."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,))
+    row = cursor.fetchone()
+    return _to_dict(row) if row else None
+
+
+def list_jobs(conn, status=None, created_by=None, limit=50):
+    """Return the most recent jobs, newest first, optionally by status and submitter."""
+    where, params = [], []
+    if status is not None:
+        where.append('status = ?')
+        params.append(status)
+    if created_by is not None:
+        where.append('created_by = ?')
+        params.append(created_by)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT {', '.join(_COLUMNS)} FROM jobs
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY id DESC LIMIT ?
+    ''', params + [limit])
+    return [_to_dict(row) for row in cursor.fetchall()]
+
+
+def cancel(conn, job_id):
+    """Cancel a queued or running job; a running one stops at its next progress report.
+
+    Returns the job afterwards, or None when there is no such job.
+    """
+    conn.execute('''
+        UPDATE jobs SET status = 'cancelled', finished_at = ?
+        WHERE id = ? AND status IN ('queued', 'running')
+    ''', (time.time(), job_id))
+    conn.commit()
+    return get_job(conn, job_id)
+
+
+def purge_finished(conn, before):
+    """Delete jobs that finished before the ``before`` timestamp; returns how many."""
+    cursor = conn.execute(f'''
+        DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?
+    ''', FINISHED + (before,))
+    conn.commit()
+    return cursor.rowcount
+
+
+class JobContext:
+    """What a handler gets besides its payload: the job's identity and progress reporting."""
+
+    def __init__(self, conn, job_id, kind, attempt, worker):
+        self.conn = conn
+        self.id = job_id
+        self.kind = kind
+        self.attempt = attempt
+        self.worker = worker
+
+    def progress(self, fraction, message=None):
+        """Record progress (0-1) and renew the lease; raises JobCancelled if the job was cancelled."""
+        cursor = self.conn.execute('''
+            UPDATE jobs SET progress = ?, progress_message = ?, heartbeat_at = ?
+            WHERE id = ? AND status = 'running' AND worker = ?
+        ''', (max(0.0, min(float(fraction), 1.0)), message, time.time(), self.id, self.worker))
+        self.conn.commit()
+        if cursor.rowcount == 0:
+            raise JobCancelled(f'Job {self.id} was cancelled')
+
+
+class JobQueue:
+    """Job handlers by kind, and the workers that run queued jobs.
+
+    A handler is called as ``handler(job, payload)`` and returns a
+    JSON-serialisable result. Anything it raises other than JobError is
+    retried up to the job's ``max_attempts``, waiting ``retry_backoff``
+    seconds, doubled on every attempt. A running job whose heartbeat is
+    older than ``lease_seconds`` is assumed lost with its worker and
+    requeued, so long handlers should report progress more often than that.
+    """
+
+    def __init__(self, lease_seconds=900, retry_backoff=30, max_attempts=3):
+        self.lease_seconds = lease_seconds
+        self.retry_backoff = retry_backoff
+        self.max_attempts = max_attempts
+        self.handlers = {}
+        self._wake = threading.Event()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def handler(self, kind):
+        """Decorator registering a handler for ``kind``."""
+        def register(function):
+            self.handlers[kind] = function
+            return function
+        return register
+
+    def submit(self, conn, kind, payload=None, priority=0, max_attempts=None, created_by=None, delay=0):
+        """Queue a job and wake this worker's job threads; returns the job."""
+        if kind not in self.handlers:
+            raise UnknownJobKind(f'Unknown job kind: {kind}')
+        now = time.time()
+        cursor = conn.execute('''
+            INSERT INTO jobs (kind, priority, payload, max_attempts, created_by, created_at, run_after)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (kind, priority, json.dumps(payload or {}), max_attempts or self.max_attempts, created_by,
+              now, now + delay))
+        conn.commit()
+        JOBS_ENQUEUED.inc(kind)
+        self._wake.set()
+        return get_job(conn, cursor.lastrowid)
+
+    def claim(self, conn, worker):
+        """Take the next runnable job for ``worker``; returns a JobContext and its payload, or None."""
+        if not self.handlers:
+            return None
+        now = time.time()
+        cursor = conn.cursor()
+        # The write lock makes select-then-update atomic across workers
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # Jobs whose worker went away go back in the queue, or fail once out of attempts
+            cursor.execute('''
+                UPDATE jobs SET
+                    status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                    error = 'Worker stopped responding',
+                    finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END,
+                    worker = NULL
+                WHERE status = 'running' AND heartbeat_at < ?
+            ''', (now, now - self.lease_seconds))
+            cursor.execute(f'''
+                SELECT id, kind, payload, attempts FROM jobs
+                WHERE status = 'queued' AND run_after <= ?
+                  AND kind IN ({', '.join('?' * len(self.handlers))})
+                ORDER BY priority DESC, id
+                LIMIT 1
+            ''', (now, *self.handlers))
+            row = cursor.fetchone()
+            if row is None:
+                conn.commit()
+                return None
+            job_id, kind, payload, attempts = row
+            cursor.execute('''
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, heartbeat_at = ?,
+                    worker = ?, progress = 0, progress_message = NULL
+                WHERE id = ?
+            ''', (now, now, worker, job_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return JobContext(conn, job_id, kind, attempts + 1, worker), json.loads(payload)
+
+    def _finish(self, job, status, result=None, error=None, retry=False):
+        # A job cancelled or requeued from under us keeps whatever state it was moved to
+        cursor = job.conn.execute('''
+            UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, run_after = ?,
+                progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END
+            WHERE id = ? AND status = 'running' AND worker = ?
+        ''', (status, json.dumps(result) if result is not None else None, error,
+              None if retry else time.time(),
+              time.time() + self.retry_backoff * 2 ** (job.attempt - 1) if retry else 0,
+              status, job.id, job.worker))
+        job.conn.commit()
+        return cursor.rowcount > 0
+
+    def run_next(self, conn, worker):
+        """Claim and run one job; returns True if one ran, whatever its outcome."""
+        claimed = self.claim(conn, worker)
+        if claimed is None:
+            return False
+        job, payload = claimed
+        with self._lock:
+            self._running += 1
+            JOBS_RUNNING.set(value=self._running)
+        started = time.perf_counter()
+        try:
+            result = self.handlers[job.kind](job, payload)
+            self._finish(job, 'succeeded', result)
+            outcome = 'succeeded'
+        except JobCancelled:
+            outcome = 'cancelled'
+        except Exception as e:
+            if not isinstance(e, JobError):
+                logger.exception('Job %s (%s) failed on attempt %s', job.id, job.kind, job.attempt)
+            max_attempts = conn.execute('SELECT max_attempts FROM jobs WHERE id = ?', (job.id,)).fetchone()[0]
+            retry = not isinstance(e, JobError) and job.attempt < max_attempts
+            self._finish(job, 'queued' if retry else 'failed', error=str(e) or type(e).__name__, retry=retry)
+            outcome = 'retried' if retry else 'failed'
+        finally:
+            with self._lock:
+                self._running -= 1
+                JOBS_RUNNING.set(value=self._running)
+        JOBS_FINISHED.inc(job.kind, outcome)
+        JOB_DURATION.observe(time.perf_counter() - started, job.kind)
+        logger.info('Job %s (%s) attempt %s %s', job.id, job.kind, job.attempt, outcome)
+        return True
+
+    def start_workers(self, count, poll_seconds, sweep):
+        """Start ``count`` daemon threads calling ``sweep(worker)`` until it finds nothing to run.
+
+        ``sweep`` runs at most one job for each database it looks at and
+        returns how many ran. Idle threads wait ``poll_seconds``, or until
+        a job is submitted in this worker.
+        """
+        def loop(worker):
+            while True:
+                try:
+                    ran = sweep(worker)
+                except Exception:
+                    logger.exception('Job worker %s failed', worker)
+                    ran = 0
+                if not ran:
+                    self._wake.wait(poll_seconds)
+                    self._wake.clear()
+
+        threads = []
+        for number in range(count):
+            worker = f'{socket.gethostname()}:{os.getpid()}:{number}'
+            thread = threading.Thread(target=loop, args=(worker,), name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
@@ -0,0 +1,155 @@
+"""
+Logging pipeline for Academia AI Backend
+Request threads only put records on a bounded in-memory queue; a listener
+thread formats them as JSON and writes them to a size- and time-rotated file.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_exception_formatter = logging.Formatter()
+
+LOG_RECORDS_DROPPED = metrics.registry.counter(
+    'academia_log_records_dropped_total', 'Log records dropped because the logging queue was full'
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, keeping ``extra`` fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotate when the file exceeds ``maxBytes`` or when ``interval`` seconds have passed."""
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, interval=0, encoding='utf-8'):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+class RouteSamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO access records for high-volume routes."""
+
+    def __init__(self, sample_rates):
+        super().__init__()
+        self.sample_rates = dict(sample_rates)
+
+    def filter(self, record):
+        route = getattr(record, 'route', None)
+        if route is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.sample_rates.get(route, 1.0)
+        if rate >= 1.0:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        # Exported from the start, so a rate over it works before the first drop
+        LOG_RECORDS_DROPPED.inc(amount=0)
+
+    def prepare(self, record):
+        # Only the message is rendered here; the listener's handlers format the rest
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Send the traceback as text, so the record does not keep its frames alive
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+def configure_logging(level, console_format, log_file, max_bytes, backup_count,
+                      rotate_interval, queue_size, sample_rates):
+    """Route all logging through a background queue listener."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(console_format))
+
+    file_handler = SizeAndTimeRotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, interval=rotate_interval
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RouteSamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, console, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -13,15 +13,18 @@ backend_dir = Path(__file__).resolve().parent
 sys.path.insert(0, str(backend_dir))
 
 from config.config import *
+from logging_setup import configure_logging
 
 # Configure logging
-logging.basicConfig(
+configure_logging(
     level=getattr(logging, LOG_LEVEL),
-    format=LOG_FORMAT,
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('backend.log')
-    ]
+    console_format=LOG_FORMAT,
+    log_file=LOG_FILE,
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    rotate_interval=LOG_ROTATE_INTERVAL_SECONDS,
+    queue_size=LOG_QUEUE_SIZE,
+    sample_rates=LOG_SAMPLE_RATES
 )
 
 logger = logging.getLogger(__name__)
@@ -31,8 +34,9 @@ def main():
     try:
         logger.info("Starting Academia AI Backend...")
         
-        # Import the Flask application
-        from app import app
+        # Import the Flask application and start its background services
+        from app import app, start_background_services
+        start_background_services()
         
         # Run the application
         app.run(
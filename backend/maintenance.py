@@ -0,0 +1,360 @@
+"""
+Database maintenance for Academia AI Backend
+Online backups through the SQLite backup API, incremental vacuum, and
+archiving of attendance from old terms into compressed chunks that stay
+queryable, so only recent terms keep an attendance partition. Old audit
+log entries are compacted the same way.
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import audit
+import partitions
+import terms
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ENCODING = 'json-columns+zlib'
+ARCHIVE_COLUMNS = ('id', 'student_id', 'course_id', 'date', 'status', 'marked_by', 'created_at')
+TASKS = ('backup', 'vacuum', 'archive', 'audit')
+
+
+class BackupTimeout(Exception):
+    """Raised when a backup keeps being restarted by writers past its time limit."""
+
+
+def init_maintenance_tables(cursor):
+    """Create the archive and maintenance run tables."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            term_start DATE NOT NULL,
+            first_date DATE NOT NULL,
+            last_date DATE NOT NULL,
+            row_count INTEGER NOT NULL,
+            encoding TEXT NOT NULL,
+            data BLOB NOT NULL,
+            archived_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_archive_dates ON attendance_archive (first_date, last_date)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            summary TEXT
+        )
+    ''')
+
+
+# Backups
+
+def backup(db_path, backup_dir, pages_per_step=1024, sleep=0.05, keep=7, max_seconds=600):
+    """Copy the live database into ``backup_dir`` and prune old copies; returns the new path.
+
+    The backup API copies ``pages_per_step`` pages at a time and releases its
+    read lock for ``sleep`` seconds in between, so writers are never blocked
+    for a whole copy. A write from another connection restarts the copy;
+    ``max_seconds`` bounds how long that may go on.
+    """
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    target = backup_dir / f'{Path(db_path).stem}-{stamp}.db'
+    partial = target.with_suffix('.db.partial')
+    deadline = time.monotonic() + max_seconds
+
+    def progress(status, remaining, total):
+        if time.monotonic() > deadline:
+            raise BackupTimeout(f'Backup did not finish within {max_seconds}s ({remaining}/{total} pages left)')
+
+    source = sqlite3.connect(db_path)
+    destination = sqlite3.connect(partial)
+    try:
+        source.backup(destination, pages=pages_per_step, progress=progress, sleep=sleep)
+    except BaseException:
+        destination.close()
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        source.close()
+    destination.close()
+    partial.replace(target)
+
+    backups = sorted(backup_dir.glob(f'{Path(db_path).stem}-*.db'))
+    for old in backups[:-keep] if keep > 0 else []:
+        old.unlink()
+    return target
+
+
+# Vacuum
+
+def auto_vacuum_mode(conn):
+    return conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+
+
+def enable_incremental_vacuum(conn):
+    """Switch the database to incremental auto-vacuum.
+
+    Free on an empty database; on an existing one it needs a full VACUUM,
+    which rewrites the file and blocks writers, so run it once off-hours.
+    """
+    if auto_vacuum_mode(conn) == 2:
+        return False
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.commit()
+    conn.execute('VACUUM')
+    return True
+
+
+def incremental_vacuum(conn, pages=2000):
+    """Return up to ``pages`` free pages to the filesystem (0 for all); returns pages freed."""
+    if auto_vacuum_mode(conn) != 2:
+        logger.warning('Incremental vacuum skipped: auto_vacuum is not INCREMENTAL; '
+                       'run "python maintenance.py vacuum --enable" once')
+        return 0
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    conn.commit()
+    # The pragma frees one page per step, and cursor.execute() stops after the
+    # first step since it returns no rows; executescript() steps it to the end
+    conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+    return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+# Archive
+
+def _encode_chunk(rows):
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(ARCHIVE_COLUMNS)}
+    return zlib.compress(json.dumps(columns, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def _decode_chunk(encoding, data):
+    if encoding != ARCHIVE_ENCODING:
+        raise ValueError(f'Unknown archive encoding: {encoding}')
+    columns = json.loads(zlib.decompress(data))
+    return [dict(zip(ARCHIVE_COLUMNS, values)) for values in zip(*(columns[name] for name in ARCHIVE_COLUMNS))]
+
+
+def archive_attendance(conn, before, chunk_rows=50000):
+    """Move the attendance partitions of terms ending by ``before`` into compressed archive chunks.
+
+    Each chunk is its own short transaction, so marking attendance is never
+    blocked for longer than one chunk, and a partition is dropped once it is
+    empty. Rollups are left as they are, so analytics over archived periods
+    keep working. Returns rows archived.
+    """
+    cursor = conn.cursor()
+    archived = 0
+    for term_start, table in partitions.older_than(conn, before):
+        while True:
+            cursor.execute(f'''
+                SELECT {', '.join(ARCHIVE_COLUMNS)}
+                FROM {table}
+                ORDER BY date, id
+                LIMIT ?
+            ''', (chunk_rows,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            try:
+                cursor.execute('''
+                    INSERT INTO attendance_archive
+                        (term_start, first_date, last_date, row_count, encoding, data, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (term_start, rows[0][3], rows[-1][3], len(rows), ARCHIVE_ENCODING,
+                      _encode_chunk(rows), time.time()))
+                cursor.executemany(f'DELETE FROM {table} WHERE id = ?', [(row[0],) for row in rows])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            archived += len(rows)
+        partitions.drop_partition(conn, table)
+    return archived
+
+
+def archived_attendance(conn, start=None, end=None, student_id=None, course_id=None):
+    """Return archived attendance rows dated ``start``..``end``, oldest first."""
+    where, params = [], []
+    if start is not None:
+        where.append('last_date >= ?')
+        params.append(start.isoformat())
+    if end is not None:
+        where.append('first_date <= ?')
+        params.append(end.isoformat())
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT encoding, data FROM attendance_archive
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY first_date, id
+    ''', params)
+
+    start_key = start.isoformat() if start else ''
+    end_key = end.isoformat() if end else '9999'
+    results = []
+    for encoding, data in cursor.fetchall():
+        for row in _decode_chunk(encoding, data):
+            if not start_key <= row['date'] <= end_key:
+                continue
+            if student_id is not None and row['student_id'] != student_id:
+                continue
+            if course_id is not None and row['course_id'] != course_id:
+                continue
+            results.append(row)
+    return results
+
+
+def materialize_archive(conn, table='temp.attendance_archived'):
+    """Copy every archived row into ``table`` (a temp table by default); returns the row count."""
+    conn.execute(f'DROP TABLE IF EXISTS {table}')
+    conn.execute(f'''
+        CREATE TABLE {table} (
+            id INTEGER, student_id INTEGER, course_id INTEGER, date DATE,
+            status TEXT, marked_by INTEGER, created_at TIMESTAMP
+        )
+    ''')
+    count = 0
+    for encoding, data in conn.execute('SELECT encoding, data FROM attendance_archive ORDER BY id').fetchall():
+        rows = _decode_chunk(encoding, data)
+        conn.executemany(
+            f"INSERT INTO {table} VALUES ({', '.join('?' * len(ARCHIVE_COLUMNS))})",
+            [tuple(row[name] for name in ARCHIVE_COLUMNS) for row in rows]
+        )
+        count += len(rows)
+    return count
+
+
+def archive_summary(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT term_start, COUNT(*), SUM(row_count), SUM(LENGTH(data)), MIN(first_date), MAX(last_date)
+        FROM attendance_archive
+        GROUP BY term_start
+        ORDER BY term_start
+    ''')
+    return [dict(zip(('term_start', 'chunks', 'rows', 'bytes', 'first_date', 'last_date'), row))
+            for row in cursor.fetchall()]
+
+
+# Scheduling
+
+class Maintenance:
+    """Runs backup, vacuum, archive and audit compaction tasks, at most once per interval across workers."""
+
+    def __init__(self, db_path, backup_dir, term_start_months, hot_terms=4, backups_kept=7,
+                 backup_pages=1024, backup_sleep=0.05, vacuum_pages=2000, chunk_rows=50000, audit_hot_days=90):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.term_start_months = term_start_months
+        self.hot_terms = hot_terms
+        self.backups_kept = backups_kept
+        self.backup_pages = backup_pages
+        self.backup_sleep = backup_sleep
+        self.vacuum_pages = vacuum_pages
+        self.chunk_rows = chunk_rows
+        self.audit_hot_days = audit_hot_days
+        self._lock = threading.Lock()
+
+    def archive_cutoff(self, today=None):
+        """Attendance before this date is archived: the start of the oldest hot term."""
+        return terms.terms_back(today or date.today(), self.hot_terms - 1, self.term_start_months)
+
+    def claim_run(self, conn, min_interval):
+        now = time.time()
+        cursor = conn.cursor()
+        # The write lock makes check-then-insert atomic across workers
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('SELECT MAX(started_at) FROM maintenance_runs')
+            last = cursor.fetchone()[0]
+            if last is not None and now - last < min_interval:
+                conn.rollback()
+                return None
+            cursor.execute('INSERT INTO maintenance_runs (started_at) VALUES (?)', (now,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return cursor.lastrowid
+
+    def run(self, tasks=TASKS, min_interval=0):
+        """Run ``tasks`` in order; returns a summary, or None when another worker ran recently."""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                run_id = self.claim_run(conn, min_interval)
+                if run_id is None:
+                    return None
+                summary = {'run_id': run_id}
+                # Archive and compact before vacuuming so the freed pages are returned the same night
+                if 'archive' in tasks:
+                    cutoff = self.archive_cutoff()
+                    summary['archive'] = {
+                        'before': cutoff.isoformat(),
+                        'rows': archive_attendance(conn, cutoff, self.chunk_rows)
+                    }
+                if 'audit' in tasks:
+                    cutoff = date.today() - timedelta(days=self.audit_hot_days)
+                    summary['audit'] = {
+                        'before': cutoff.isoformat(),
+                        'rows': audit.compact(conn, cutoff, self.chunk_rows)
+                    }
+                if 'vacuum' in tasks:
+                    summary['vacuum'] = {'pages_freed': incremental_vacuum(conn, self.vacuum_pages)}
+                if 'backup' in tasks:
+                    path = backup(self.db_path, self.backup_dir, self.backup_pages, self.backup_sleep,
+                                  self.backups_kept)
+                    summary['backup'] = {'path': str(path), 'bytes': path.stat().st_size}
+                conn.execute('UPDATE maintenance_runs SET finished_at = ?, summary = ? WHERE id = ?',
+                             (time.time(), json.dumps(summary), run_id))
+                conn.commit()
+            finally:
+                conn.close()
+        logger.info('Maintenance run %s: %s', run_id, summary)
+        return summary
+
+
+def main():
+    # Add the backend directory to Python path
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from config.config import (
+        DATABASE_PATH, MAINTENANCE_BACKUP_DIR, MAINTENANCE_BACKUPS_KEPT, MAINTENANCE_BACKUP_PAGES,
+        MAINTENANCE_BACKUP_SLEEP_SECONDS, MAINTENANCE_VACUUM_PAGES, MAINTENANCE_HOT_TERMS,
+        MAINTENANCE_ARCHIVE_CHUNK_ROWS, AUDIT_HOT_DAYS, TERM_START_MONTHS
+    )
+
+    parser = argparse.ArgumentParser(
+        description='Back up, vacuum and archive the Academia AI database and compact its audit log'
+    )
+    parser.add_argument('tasks', nargs='*', choices=TASKS, help='Tasks to run (default: all)')
+    parser.add_argument('--db', default=DATABASE_PATH, help='SQLite database to maintain')
+    parser.add_argument('--enable', action='store_true',
+                        help='Convert the database to incremental auto-vacuum first (one full VACUUM)')
+    args = parser.parse_args()
+
+    if args.enable:
+        conn = sqlite3.connect(args.db)
+        print('Converted to incremental auto-vacuum' if enable_incremental_vacuum(conn)
+              else 'Incremental auto-vacuum already enabled')
+        conn.close()
+
+    maintenance = Maintenance(
+        args.db, MAINTENANCE_BACKUP_DIR, TERM_START_MONTHS, MAINTENANCE_HOT_TERMS, MAINTENANCE_BACKUPS_KEPT,
+        MAINTENANCE_BACKUP_PAGES, MAINTENANCE_BACKUP_SLEEP_SECONDS, MAINTENANCE_VACUUM_PAGES,
+        MAINTENANCE_ARCHIVE_CHUNK_ROWS, AUDIT_HOT_DAYS
+    )
+    print(json.dumps(maintenance.run(args.tasks or TASKS), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Metrics and SQL instrumentation for Academia AI Backend
+Keeps in-process counters and latency histograms and renders them in the
+Prometheus text exposition format.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('academia.sql')
+
+# Latency buckets in seconds, from fast lookups to slow reports
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = [
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    ]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}'
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    """A cumulative histogram of observed values with optional labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'counts': [0] * len(self.buckets), 'sum': 0.0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, {'counts': list(s['counts']), 'sum': s['sum']}) for key, s in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, ('le', _format_value(float(bound))))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_value(series["sum"])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class MetricsRegistry:
+    """Collection of named metrics rendered together on the metrics endpoint."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    'academia_request_duration_seconds', 'Request latency by route', ('method', 'route', 'status')
+)
+REQUEST_SQL_QUERIES = registry.histogram(
+    'academia_request_sql_queries', 'SQL queries issued per request', ('method', 'route'),
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100)
+)
+REQUEST_ROWS = registry.histogram(
+    'academia_request_rows_returned', 'Database rows fetched per request', ('method', 'route'),
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000)
+)
+SQL_STATEMENTS = registry.counter(
+    'academia_sql_statements_total', 'Statements executed by SQLite, including transaction control', ('kind',)
+)
+SQL_DURATION = registry.histogram(
+    'academia_sql_query_duration_seconds', 'SQL query execution time', ('kind',)
+)
+SQL_ROWS = registry.counter('academia_sql_rows_returned_total', 'Database rows fetched')
+SLOW_QUERIES = registry.counter('academia_sql_slow_queries_total', 'Queries slower than the slow query threshold')
+
+# Slow query threshold in seconds; None disables the slow query log
+_slow_query_threshold = None
+_request_state = threading.local()
+
+
+def set_slow_query_threshold(milliseconds):
+    """Log every query slower than ``milliseconds``; 0 or None disables the log."""
+    global _slow_query_threshold
+    _slow_query_threshold = milliseconds / 1000 if milliseconds else None
+
+
+def statement_kind(sql):
+    """Return the leading SQL keyword, e.g. SELECT or INSERT."""
+    match = re.match(r'\s*(\w+)', sql)
+    return match.group(1).upper() if match else 'OTHER'
+
+
+def begin_request():
+    """Start collecting SQL statistics for the current thread's request."""
+    _request_state.stats = {'queries': 0, 'sql_seconds': 0.0, 'rows': 0}
+
+
+def end_request():
+    """Stop collecting and return the SQL statistics of the current request."""
+    stats = getattr(_request_state, 'stats', None)
+    _request_state.stats = None
+    return stats or {'queries': 0, 'sql_seconds': 0.0, 'rows': 0}
+
+
+def _record_query(sql, elapsed):
+    SQL_DURATION.observe(elapsed, statement_kind(sql))
+    stats = getattr(_request_state, 'stats', None)
+    if stats is not None:
+        stats['queries'] += 1
+        stats['sql_seconds'] += elapsed
+    if _slow_query_threshold is not None and elapsed >= _slow_query_threshold:
+        SLOW_QUERIES.inc()
+        logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, ' '.join(sql.split()))
+
+
+def _record_rows(count):
+    SQL_ROWS.inc(amount=count)
+    stats = getattr(_request_state, 'stats', None)
+    if stats is not None:
+        stats['rows'] += count
+
+
+def _trace_statement(sql):
+    SQL_STATEMENTS.inc(statement_kind(sql))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times every query and counts the rows it returns.
+
+    SQLite runs a query as its rows are read, so a query's time covers its
+    execute() and every fetch until the rows run out, the cursor runs
+    another query or is closed.
+    """
+
+    # [sql, seconds so far] of the query whose rows are still being read
+    _pending = None
+
+    def _run(self, sql, run, *args):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            result = run(*args)
+        except BaseException:
+            _record_query(sql, time.perf_counter() - start)
+            raise
+        self._pending = [sql, time.perf_counter() - start]
+        if self.description is None:
+            # No rows to read
+            self._finish()
+        return result
+
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[1] += time.perf_counter() - start
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            _record_query(*pending)
+
+    def execute(self, sql, parameters=()):
+        return self._run(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(sql, super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._run(sql_script, super().executescript, sql_script)
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            _record_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._fetch(super().fetchmany, size)
+        _record_rows(len(rows))
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        _record_rows(len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._fetch(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        _record_rows(1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Most cursors are dropped after reading the one row they wanted
+        self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors are instrumented and whose statements are traced."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_trace_statement)
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts would use a plain cursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
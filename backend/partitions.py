@@ -0,0 +1,239 @@
+"""
+Term-partitioned attendance storage for Academia AI Backend
+Attendance lives in one table per academic term (attendance_YYYY_MM, named
+after the term's first month). attendance_partitions records the date range
+each one holds, so readers name only the partitions a date range overlaps,
+and the attendance_all view unions them all for cross-term reports.
+"""
+
+import re
+import time
+from datetime import date
+
+import terms
+
+VIEW = 'attendance_all'
+COLUMNS = ('id', 'student_id', 'course_id', 'date', 'status', 'marked_by', 'created_at')
+
+# Stands in for a date range no partition overlaps
+EMPTY_SOURCE = f"(SELECT {', '.join(f'NULL AS {name}' for name in COLUMNS)} LIMIT 0)"
+
+_TABLE_NAME = re.compile(r'^attendance_\d{4}_\d{2}$')
+
+
+def init_partition_tables(cursor):
+    """Create the partition registry and the cross-term view."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_partitions (
+            term_start DATE PRIMARY KEY,
+            term_end DATE NOT NULL,
+            table_name TEXT UNIQUE NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute(f'CREATE VIEW IF NOT EXISTS {VIEW} AS {_view_sql(cursor)}')
+    # Partitions created before an index was added get it here
+    cursor.execute('SELECT table_name FROM attendance_partitions')
+    for (table,) in cursor.fetchall():
+        _create_indexes(cursor, table)
+
+
+def _create_indexes(cursor, table):
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table} (date)')
+    # A student's mark for a day, and a course's marks over a date range (covering roll-call sheets)
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_student_date ON {table} (student_id, date)')
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_{table}_course_date ON {table} (course_id, date, student_id, status)
+    ''')
+
+
+def _view_sql(cursor):
+    cursor.execute('SELECT table_name FROM attendance_partitions ORDER BY term_start')
+    selects = [f"SELECT {', '.join(COLUMNS)} FROM {row[0]}" for row in cursor.fetchall()]
+    return ' UNION ALL '.join(selects) or EMPTY_SOURCE[1:-1]
+
+
+def _rebuild_view(cursor):
+    view_sql = _view_sql(cursor)
+    cursor.execute(f'DROP VIEW IF EXISTS {VIEW}')
+    cursor.execute(f'CREATE VIEW {VIEW} AS {view_sql}')
+
+
+def _create_partition(cursor, start, end):
+    table = f'attendance_{start.year:04d}_{start.month:02d}'
+    cursor.execute(f'''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            course_id INTEGER,
+            date DATE NOT NULL CHECK (date >= '{start.isoformat()}' AND date < '{end.isoformat()}'),
+            status TEXT NOT NULL,
+            marked_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            FOREIGN KEY (course_id) REFERENCES courses (id),
+            FOREIGN KEY (marked_by) REFERENCES users (id)
+        )
+    ''')
+    _create_indexes(cursor, table)
+    # Every term numbers its rows from its own base, so ids stay unique across
+    # partitions and keep increasing from one term to the next
+    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                   (table, (start.year * 100 + start.month) * 10 ** 8))
+    cursor.execute('''
+        INSERT INTO attendance_partitions (term_start, term_end, table_name, created_at)
+        VALUES (?, ?, ?, ?)
+    ''', (start.isoformat(), end.isoformat(), table, time.time()))
+    return table
+
+
+def _covering(cursor, day):
+    cursor.execute('''
+        SELECT table_name FROM attendance_partitions
+        WHERE term_start <= ? AND term_end > ?
+    ''', (day, day))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def partition_for(conn, day, term_start_months):
+    """Return the partition holding ``day`` (a date or YYYY-MM-DD string), creating it if needed.
+
+    A new partition is committed straight away unless the caller already
+    has a transaction open, in which case it is part of that transaction.
+    """
+    day = day if isinstance(day, str) else day.isoformat()
+    cursor = conn.cursor()
+    table = _covering(cursor, day)
+    if table:
+        return table
+
+    standalone = not conn.in_transaction
+    if standalone:
+        # Another worker may be creating the same term
+        cursor.execute('BEGIN IMMEDIATE')
+    try:
+        table = _covering(cursor, day)
+        if table is None:
+            start = terms.term_start(date.fromisoformat(day), term_start_months)
+            end = terms.next_term_start(start, term_start_months)
+            table = _create_partition(cursor, start, end)
+            _rebuild_view(cursor)
+        if standalone:
+            conn.commit()
+    except Exception:
+        if standalone:
+            conn.rollback()
+        raise
+    return table
+
+
+def tables(conn, start=None, end=None):
+    """Return the partitions holding any date in ``start``..``end`` (inclusive), oldest first."""
+    where, params = [], []
+    if start is not None:
+        where.append('term_end > ?')
+        params.append(start.isoformat())
+    if end is not None:
+        where.append('term_start <= ?')
+        params.append(end.isoformat())
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT table_name FROM attendance_partitions
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY term_start
+    ''', params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def source(conn, start=None, end=None):
+    """Return a FROM-clause source holding the attendance dated ``start``..``end``.
+
+    That is the partition itself when the range falls in one term, or a
+    UNION ALL of just the overlapping partitions. Callers still filter on
+    date, since partitions hold whole terms.
+    """
+    names = tables(conn, start, end)
+    if not names:
+        return EMPTY_SOURCE
+    if len(names) == 1:
+        return names[0]
+    return '(' + ' UNION ALL '.join(f"SELECT {', '.join(COLUMNS)} FROM {name}" for name in names) + ')'
+
+
+def insert_rows(conn, rows, term_start_months):
+    """Insert (student_id, course_id, date, status, marked_by) rows into their partitions."""
+    tables_by_day, by_table = {}, {}
+    for row in rows:
+        if row[2] not in tables_by_day:
+            tables_by_day[row[2]] = partition_for(conn, row[2], term_start_months)
+        by_table.setdefault(tables_by_day[row[2]], []).append(row)
+    cursor = conn.cursor()
+    for table, table_rows in by_table.items():
+        cursor.executemany(f'''
+            INSERT INTO {table} (student_id, course_id, date, status, marked_by)
+            VALUES (?, ?, ?, ?, ?)
+        ''', table_rows)
+
+
+def older_than(conn, before):
+    """Return (term_start, table_name) of the partitions wholly dated before ``before``."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT term_start, table_name FROM attendance_partitions
+        WHERE term_end <= ?
+        ORDER BY term_start
+    ''', (before.isoformat(),))
+    return cursor.fetchall()
+
+
+def drop_partition(conn, table):
+    """Drop an emptied partition and take it out of the view."""
+    if not _TABLE_NAME.match(table):
+        raise ValueError(f'Not an attendance partition: {table}')
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('DELETE FROM attendance_partitions WHERE table_name = ?', (table,))
+        _rebuild_view(cursor)
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def migrate_legacy_table(conn, term_start_months):
+    """Move rows of the old single attendance table into term partitions and drop it.
+
+    Row ids are kept. Returns the number of rows moved, or None when there
+    is no old table.
+    """
+    legacy = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attendance'"
+    cursor = conn.cursor()
+    if cursor.execute(legacy).fetchone() is None:
+        return None
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        # Another worker may have migrated it meanwhile
+        if cursor.execute(legacy).fetchone() is None:
+            conn.rollback()
+            return None
+        cursor.execute('SELECT MIN(date), MAX(date), COUNT(*) FROM attendance')
+        first, last, count = cursor.fetchone()
+        if count:
+            day = date.fromisoformat(first)
+            while day.isoformat() <= last:
+                table = partition_for(conn, day, term_start_months)
+                end = terms.next_term_start(terms.term_start(day, term_start_months), term_start_months)
+                cursor.execute(f'''
+                    INSERT INTO {table} ({', '.join(COLUMNS)})
+                    SELECT {', '.join(COLUMNS)} FROM attendance WHERE date >= ? AND date < ?
+                ''', (day.isoformat(), end.isoformat()))
+                day = end
+        cursor.execute('DROP TABLE attendance')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
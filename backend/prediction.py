@@ -0,0 +1,559 @@
+"""
+Performance prediction models for Academia AI Backend
+Fits linear models from stored features and recorded outcomes with NumPy
+least squares, cross-validates them, and keeps every trained model as a
+versioned artefact. Workers pick up a newly activated model on their next
+sync, so retraining never needs a restart.
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import feature_store
+import metrics
+import partitions
+
+# Model inputs in column order; names match MODEL_CONFIG prediction_weights
+MODEL_FEATURES = ('attendance',) + feature_store.FEATURES
+
+# Divisors that bring each raw feature into 0..1
+FEATURE_SCALES = {
+    'attendance': 1.0,
+    'test_scores': 100.0,
+    'study_hours': 40.0,
+    'parental_support': 2.0,
+    'activities': 1.0
+}
+
+
+PREDICTION_CACHE_REQUESTS = metrics.registry.counter(
+    'academia_prediction_cache_requests_total', 'Prediction cache lookups', ('result',)
+)
+PREDICTION_CACHE_EVICTIONS = metrics.registry.counter(
+    'academia_prediction_cache_evictions_total', 'Predictions evicted to stay within the cache size'
+)
+PREDICTION_CACHE_ENTRIES = metrics.registry.gauge('academia_prediction_cache_entries', 'Cached predictions')
+PREDICTION_CACHE_HIT_RATIO = metrics.registry.gauge(
+    'academia_prediction_cache_hit_ratio', 'Share of prediction lookups served from the cache by this worker'
+)
+
+
+class TrainingError(ValueError):
+    """Raised when there is not enough data to train or validate a model."""
+
+
+def init_prediction_tables(cursor):
+    """Create the outcome and model artefact tables."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_outcomes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            score REAL NOT NULL CHECK (score BETWEEN 0 AND 100),
+            recorded_at REAL NOT NULL,
+            source TEXT,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_student_outcomes_student ON student_outcomes (student_id, id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_models (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            artefact TEXT NOT NULL,
+            metrics TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            feature_version INTEGER,
+            active INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_prediction_models_active ON prediction_models (active)
+        WHERE active = 1
+    ''')
+
+
+def record_outcomes(conn, outcomes, source=None):
+    """Store (student id, score 0-100) outcomes; returns the number stored."""
+    now = time.time()
+    rows = []
+    for number, (student_id, score) in enumerate(outcomes, 1):
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            raise TrainingError(f'Outcome {number}: score must be a number') from None
+        if not 0 <= score <= 100:
+            raise TrainingError(f'Outcome {number}: score must be between 0 and 100')
+        rows.append((int(student_id), score, now, source))
+    conn.cursor().executemany(
+        'INSERT INTO student_outcomes (student_id, score, recorded_at, source) VALUES (?, ?, ?, ?)', rows
+    )
+    conn.commit()
+    return len(rows)
+
+
+def load_outcomes(conn):
+    """Return (student ids, scores in 0..1) using each student's latest outcome."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT o.student_id, o.score
+        FROM student_outcomes o
+        JOIN (SELECT student_id, MAX(id) AS id FROM student_outcomes GROUP BY student_id) latest
+          ON latest.id = o.id
+        ORDER BY o.student_id
+    ''')
+    table = np.fromiter(cursor, dtype=[('id', np.int64), ('score', np.float64)])
+    return table['id'], table['score'] / 100
+
+
+def load_weekly_attendance(conn, as_of, window_weeks):
+    """Return (student ids, age in weeks, attended, marked) per student and week.
+
+    Grouping by week in SQL keeps the rows fetched to a dozen or so per
+    student however many sessions they had.
+    """
+    start = as_of - timedelta(days=window_weeks * 7 - 1)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT student_id,
+               CAST((julianday(?) - julianday(date)) / 7 AS INTEGER) AS age,
+               SUM(status IN ('present', 'late')),
+               COUNT(*)
+        FROM {partitions.source(conn, start, as_of)}
+        WHERE student_id IS NOT NULL AND date BETWEEN ? AND ?
+        GROUP BY student_id, age
+    ''', (as_of.isoformat(), start.isoformat(), as_of.isoformat()))
+    rows = cursor.fetchall()
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    return tuple(np.array(column, dtype=np.int64) for column in zip(*rows))
+
+
+class AttendanceFeature:
+    """Builds the attendance model input, the same way for training and scoring.
+
+    The rate covers the last ``window_weeks`` weeks and decays week by week
+    with ``half_life_weeks``, so a falling attendance trend lowers the
+    prediction sooner than a plain average.
+    """
+
+    def __init__(self, window_weeks=12, half_life_weeks=2, trend_weeks=2):
+        self.window_weeks = window_weeks
+        self.half_life_weeks = half_life_weeks
+        self.trend_weeks = trend_weeks
+
+    def compute(self, conn, as_of):
+        """Return arrays of student id, attendance rate, trend and sessions for students marked in the window."""
+        student_ids, ages, attended, marked = load_weekly_attendance(conn, as_of, self.window_weeks)
+        students, index = np.unique(student_ids, return_inverse=True)
+        n = len(students)
+
+        def per_student(values):
+            return np.bincount(index, weights=values, minlength=n)
+
+        decay = 0.5 ** (ages / self.half_life_weeks)
+        decayed_marked = per_student(marked * decay)
+        attendance = np.divide(per_student(attended * decay), decayed_marked,
+                               out=np.zeros(n), where=decayed_marked > 0)
+
+        # Trend: recent attendance rate minus the rate before it
+        recent = ages < self.trend_weeks
+        recent_marked, earlier_marked = per_student(marked * recent), per_student(marked * ~recent)
+        recent_rate = np.divide(per_student(attended * recent), recent_marked,
+                                out=np.zeros(n), where=recent_marked > 0)
+        earlier_rate = np.divide(per_student(attended * ~recent), earlier_marked,
+                                 out=np.zeros(n), where=earlier_marked > 0)
+        trend = np.where((recent_marked > 0) & (earlier_marked > 0), recent_rate - earlier_rate, 0.0)
+
+        return {
+            'student_id': students,
+            'attendance': attendance,
+            'trend': trend,
+            'sessions': per_student(marked).astype(np.int64)
+        }
+
+    def rates(self, conn, student_ids, as_of=None):
+        """Return the attendance rate (0..1, NaN when unmarked in the window) of each of ``student_ids``."""
+        computed = self.compute(conn, as_of or date.today())
+        rates = np.full(len(student_ids), np.nan)
+        positions = np.searchsorted(computed['student_id'], student_ids)
+        found = positions < len(computed['student_id'])
+        found[found] = computed['student_id'][positions[found]] == student_ids[found]
+        rates[found] = computed['attendance'][positions[found]]
+        return rates
+
+
+def scale_features(raw):
+    """Return an (n, len(MODEL_FEATURES)) matrix in 0..1 from {feature: raw array}; missing is NaN."""
+    n = len(next(iter(raw.values())))
+    columns = []
+    for name in MODEL_FEATURES:
+        values = np.asarray(raw[name], dtype=np.float64) if name in raw else np.full(n, np.nan)
+        columns.append(np.clip(values / FEATURE_SCALES[name], 0, 1))
+    return np.column_stack(columns)
+
+
+def build_features(conn, student_ids, attendance, feature_version=None):
+    """Return the scaled feature matrix of ``student_ids`` from ``attendance`` and the feature store."""
+    student_ids = np.asarray(student_ids, dtype=np.int64)
+    batch = feature_store.read_features(conn, feature_version, student_ids)
+    raw = {name: batch.values[:, i] for i, name in enumerate(batch.columns)}
+    raw['attendance'] = attendance.rates(conn, student_ids)
+    return scale_features(raw), batch.version
+
+
+def form_features(data, stored=None):
+    """Return one scaled feature row from prediction form values.
+
+    attendance is a percentage; the other inputs are read as the feature
+    store reads them. Inputs left out are taken from ``stored``, a scaled
+    row of a stored student, when given.
+    """
+    raw = dict(zip(feature_store.FEATURES, feature_store.normalize_record(data)))
+    if data.get('attendance') not in (None, ''):
+        try:
+            raw['attendance'] = float(data['attendance']) / 100
+        except (TypeError, ValueError):
+            raise ValueError('attendance must be a number') from None
+    row = scale_features({name: [np.nan if value is None else value] for name, value in raw.items()})[0]
+    if stored is not None:
+        row = np.where(np.isnan(row), stored, row)
+    if np.isnan(row).all():
+        raise ValueError('At least one feature is required')
+    return row
+
+
+def weighted_performance(matrix, weights):
+    """Combine scaled features with hand-set weights.
+
+    Each row uses only its known features, with their weights rescaled to
+    sum to one, so the result stays comparable to the thresholds.
+    """
+    w = np.array([weights.get(name, 0.0) for name in MODEL_FEATURES])
+    known = ~np.isnan(matrix)
+    total = known @ w
+    weighted = np.where(known, matrix, 0) @ w
+    return np.divide(weighted, total, out=np.full(len(matrix), np.nan), where=total > 0)
+
+
+class LinearModel:
+    """Performance in 0..1 as intercept plus weights times scaled features.
+
+    Missing features are filled with their training mean. A model without
+    ``means`` is the hand-weighted MODEL_CONFIG baseline, which instead
+    rescales the weights of the features each row has.
+    """
+
+    def __init__(self, weights, intercept=0.0, means=None, version=None):
+        self.weights = {name: float(weights.get(name, 0.0)) for name in MODEL_FEATURES}
+        self.intercept = float(intercept)
+        self.means = None if means is None else {name: float(means[name]) for name in MODEL_FEATURES}
+        self.version = version
+        # Identifies exactly what this model computes, trained or hand-set
+        self.fingerprint = hashlib.sha256(self.to_json().encode('utf-8')).hexdigest()
+
+    @classmethod
+    def from_json(cls, artefact, version=None):
+        data = json.loads(artefact)
+        return cls(data['weights'], data['intercept'], data['means'], version)
+
+    def to_json(self):
+        return json.dumps({
+            'kind': 'linear',
+            'features': list(MODEL_FEATURES),
+            'feature_scales': FEATURE_SCALES,
+            'weights': self.weights,
+            'intercept': self.intercept,
+            'means': self.means
+        }, sort_keys=True)
+
+    def predict(self, matrix):
+        """Predict performance for each row of a scaled feature matrix."""
+        if self.means is None:
+            return weighted_performance(matrix, self.weights)
+        means = np.array([self.means[name] for name in MODEL_FEATURES])
+        filled = np.where(np.isnan(matrix), means, matrix)
+        w = np.array([self.weights[name] for name in MODEL_FEATURES])
+        return np.clip(filled @ w + self.intercept, 0, 1)
+
+    def contributions(self, row):
+        """Return each feature's share of one prediction."""
+        if self.means is None:
+            known = {name: value for name, value in zip(MODEL_FEATURES, row) if not np.isnan(value)}
+            total = sum(self.weights[name] for name in known) or 1.0
+            return {name: round(self.weights[name] * value / total, 4) for name, value in known.items()}
+        return {
+            name: round(self.weights[name] * (self.means[name] if np.isnan(value) else value), 4)
+            for name, value in zip(MODEL_FEATURES, row)
+        }
+
+
+def fit_linear(matrix, targets, l2=1e-3):
+    """Fit a ridge-regularised LinearModel with one least squares solve."""
+    means = np.nanmean(matrix, axis=0)
+    # Features nobody has carry no signal; fill them with a neutral 0.5
+    means = np.where(np.isnan(means), 0.5, means)
+    filled = np.where(np.isnan(matrix), means, matrix)
+    n, k = filled.shape
+    # Ridge as extra rows: minimise |Xw + b - y|^2 + l2 * n * |w|^2, leaving the intercept free
+    design = np.vstack([
+        np.column_stack([filled, np.ones(n)]),
+        np.column_stack([np.sqrt(l2 * n) * np.eye(k), np.zeros(k)])
+    ])
+    solution, *_ = np.linalg.lstsq(design, np.concatenate([targets, np.zeros(k)]), rcond=None)
+    return LinearModel(dict(zip(MODEL_FEATURES, solution[:k])), solution[k], dict(zip(MODEL_FEATURES, means)))
+
+
+def regression_metrics(predicted, targets):
+    errors = predicted - targets
+    variance = np.sum((targets - targets.mean()) ** 2)
+    return {
+        'rmse': round(float(np.sqrt(np.mean(errors ** 2))), 5),
+        'mae': round(float(np.mean(np.abs(errors))), 5),
+        'r2': round(float(1 - np.sum(errors ** 2) / variance), 5) if variance > 0 else None
+    }
+
+
+def cross_validate(matrix, targets, folds=5, l2=1e-3, baseline=None, seed=0):
+    """Return mean held-out metrics over ``folds`` shuffled folds, plus the baseline's."""
+    n = len(targets)
+    if n < folds * 2:
+        raise TrainingError(f'Need at least {folds * 2} outcomes for {folds}-fold cross-validation, have {n}')
+    order = np.random.default_rng(seed).permutation(n)
+    results, baseline_results = [], []
+    for fold in np.array_split(order, folds):
+        train = np.ones(n, dtype=bool)
+        train[fold] = False
+        model = fit_linear(matrix[train], targets[train], l2)
+        results.append(regression_metrics(model.predict(matrix[fold]), targets[fold]))
+        if baseline is not None:
+            predicted = baseline.predict(matrix[fold])
+            # Rows without any known feature get no baseline prediction
+            known = ~np.isnan(predicted)
+            if known.any():
+                baseline_results.append(regression_metrics(predicted[known], targets[fold][known]))
+
+    def mean(rows):
+        return {key: (None if any(r[key] is None for r in rows) else round(float(np.mean([r[key] for r in rows])), 5))
+                for key in rows[0]} if rows else None
+
+    return {'folds': folds, 'model': mean(results), 'baseline': mean(baseline_results)}
+
+
+def train(conn, baseline_weights, attendance, folds=5, l2=1e-3, feature_version=None, activate=True):
+    """Fit a model on every student with an outcome and store it as a new version.
+
+    ``attendance`` is the AttendanceFeature risk scoring uses, so the model
+    learns from the same attendance input it is later scored on. Returns a summary with the version, learned weights and cross-validation
+    metrics next to those of the hand-set ``baseline_weights``.
+    """
+    started = time.perf_counter()
+    student_ids, targets = load_outcomes(conn)
+    if len(student_ids) == 0:
+        raise TrainingError('No outcomes recorded')
+    matrix, feature_version = build_features(conn, student_ids, attendance, feature_version)
+    metrics = cross_validate(matrix, targets, folds, l2, baseline=LinearModel(baseline_weights))
+    model = fit_linear(matrix, targets, l2)
+    metrics['l2'] = l2
+    metrics['train'] = regression_metrics(model.predict(matrix), targets)
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO prediction_models (created_at, artefact, metrics, rows, feature_version)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (time.time(), model.to_json(), json.dumps(metrics), len(targets), feature_version))
+    model.version = cursor.lastrowid
+    conn.commit()
+    if activate:
+        activate_model(conn, model.version)
+
+    return {
+        'version': model.version,
+        'active': activate,
+        'rows': len(targets),
+        'feature_version': feature_version,
+        'weights': {name: round(value, 5) for name, value in model.weights.items()},
+        'intercept': round(model.intercept, 5),
+        'metrics': metrics,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def activate_model(conn, version):
+    """Make ``version`` the model every worker scores with; returns False if it does not exist."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM prediction_models WHERE version = ?', (version,))
+    if cursor.fetchone() is None:
+        return False
+    cursor.execute('UPDATE prediction_models SET active = 0 WHERE active = 1')
+    cursor.execute('UPDATE prediction_models SET active = 1 WHERE version = ?', (version,))
+    conn.commit()
+    return True
+
+
+def list_models(conn, limit=20):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT version, created_at, metrics, rows, feature_version, active
+        FROM prediction_models
+        ORDER BY version DESC
+        LIMIT ?
+    ''', (limit,))
+    return [{
+        'version': version,
+        'created_at': created_at,
+        'metrics': json.loads(metrics),
+        'rows': rows,
+        'feature_version': feature_version,
+        'active': bool(active)
+    } for version, created_at, metrics, rows, feature_version, active in cursor.fetchall()]
+
+
+class PredictionCache:
+    """LRU cache of prediction results keyed by model and quantised feature vector.
+
+    Features are rounded to multiples of ``quantum`` before hashing, so
+    inputs that differ only by float noise share an entry. Keys include the
+    fingerprint of the model and of ``config``; when either changes, every
+    entry belongs to the old model and the cache is emptied.
+    """
+
+    def __init__(self, max_entries, quantum=1e-3, config=None):
+        self.max_entries = max_entries
+        self.quantum = quantum
+        self.config_fingerprint = hashlib.sha256(
+            json.dumps(config, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        self._entries = OrderedDict()
+        self._model_fingerprint = None
+        self._hits = self._misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, model, row):
+        quantised = np.round(np.asarray(row, dtype=np.float64) / self.quantum)
+        # NaN marks a missing feature and must stay distinct from every value
+        quantised = np.where(np.isnan(quantised), np.iinfo(np.int64).min, quantised).astype('<i8')
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.config_fingerprint.encode('ascii'))
+        digest.update(model.fingerprint.encode('ascii'))
+        digest.update(quantised.tobytes())
+        return digest.digest()
+
+    def get_or_compute(self, model, row, compute):
+        """Return the cached result for ``model`` and ``row``, calling ``compute()`` on a miss."""
+        key = self.key(model, row)
+        with self._lock:
+            if model.fingerprint != self._model_fingerprint:
+                self._entries.clear()
+                self._model_fingerprint = model.fingerprint
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._record(hit=True)
+                return result
+
+        result = compute()
+        with self._lock:
+            self._record(hit=False)
+            if model.fingerprint == self._model_fingerprint:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    PREDICTION_CACHE_EVICTIONS.inc()
+            PREDICTION_CACHE_ENTRIES.set(value=len(self._entries))
+        return result
+
+    def _record(self, hit):
+        if hit:
+            self._hits += 1
+        else:
+            self._misses += 1
+        PREDICTION_CACHE_REQUESTS.inc('hit' if hit else 'miss')
+        PREDICTION_CACHE_HIT_RATIO.set(value=self._hits / (self._hits + self._misses))
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else None
+            }
+
+
+class ModelRegistry:
+    """The active model of this worker, re-read from prediction_models when it changes.
+
+    The active version is checked at most every ``sync_interval`` seconds;
+    with no trained model the MODEL_CONFIG baseline is used.
+    """
+
+    def __init__(self, baseline_weights, sync_interval):
+        self.baseline = LinearModel(baseline_weights)
+        self.sync_interval = sync_interval
+        self._model = self.baseline
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def sync(self, conn):
+        cursor = conn.cursor()
+        cursor.execute('SELECT version FROM prediction_models WHERE active = 1')
+        row = cursor.fetchone()
+        version = row[0] if row else None
+        if version != self._model.version:
+            model = self.baseline
+            if version is not None:
+                cursor.execute('SELECT artefact FROM prediction_models WHERE version = ?', (version,))
+                model = LinearModel.from_json(cursor.fetchone()[0], version)
+            self._model = model
+        self._next_sync = time.time() + self.sync_interval
+
+    def current(self, connect):
+        """Return the active model, syncing first when the last check is stale."""
+        if time.time() >= self._next_sync:
+            with self._lock:
+                if time.time() >= self._next_sync:
+                    conn = connect()
+                    try:
+                        self.sync(conn)
+                    finally:
+                        conn.close()
+        return self._model
+
+
+def main():
+    # Add the backend directory to Python path
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from config.config import DATABASE_PATH, MODEL_CONFIG, RISK_WINDOW_WEEKS, RISK_HALF_LIFE_WEEKS, RISK_TREND_WEEKS
+
+    parser = argparse.ArgumentParser(description='Train a performance prediction model from recorded outcomes')
+    parser.add_argument('--db', default=DATABASE_PATH, help='SQLite database to train from')
+    parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds')
+    parser.add_argument('--l2', type=float, default=1e-3, help='Ridge regularisation strength')
+    parser.add_argument('--feature-version', type=int, help='Feature version to train on (default latest)')
+    parser.add_argument('--no-activate', action='store_true', help='Store the model without serving it')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    attendance = AttendanceFeature(RISK_WINDOW_WEEKS, RISK_HALF_LIFE_WEEKS, RISK_TREND_WEEKS)
+    summary = train(conn, MODEL_CONFIG['prediction_weights'], attendance, args.folds, args.l2,
+                    args.feature_version, not args.no_activate)
+    conn.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
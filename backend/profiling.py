@@ -0,0 +1,115 @@
+"""
+On-demand statistical profiling for Academia AI Backend
+Samples the stacks of live threads and writes them in the collapsed stack
+format understood by flamegraph.pl, speedscope and inferno.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+# Only one profiling session may run per worker at a time
+_session_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is already running in this worker."""
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(label.replace(';', ':') for label in labels)
+
+
+class SamplingProfiler:
+    """Periodically captures thread stacks from a background thread."""
+
+    def __init__(self, interval=0.005, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not _session_lock.acquire(blocking=False):
+            raise ProfilerBusy('A profiling session is already running')
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='academia-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        _session_lock.release()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                self.samples[_collapse(frame)] += 1
+            self.sample_count += 1
+
+    def collapsed(self):
+        """Return the samples as collapsed stack lines, heaviest first."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+    def write(self, output_dir, label):
+        """Write the collapsed stacks to ``output_dir`` and return the file path."""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        safe_label = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in label).strip('_')
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        path = output_dir / f'{timestamp}-{os.getpid()}-{safe_label}.folded'
+        path.write_text(self.collapsed())
+        return path
+
+
+def sample_worker(seconds, interval, output_dir):
+    """Sample every thread of this worker for ``seconds`` and write the result."""
+    profiler = SamplingProfiler(interval=interval).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler, profiler.write(output_dir, 'worker')
+
+
+def list_profiles(output_dir):
+    """Return metadata for the profiles written to ``output_dir``, newest first."""
+    output_dir = Path(output_dir)
+    if not output_dir.is_dir():
+        return []
+    profiles = []
+    for path in sorted(output_dir.glob('*.folded'), reverse=True):
+        stat = path.stat()
+        profiles.append({
+            'name': path.name,
+            'size': stat.st_size,
+            'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat()
+        })
+    return profiles
@@ -0,0 +1,198 @@
+"""
+Rate limiting for Academia AI Backend
+Token buckets keyed by client IP, user id or route, with budgets taken from
+config. Bucket state lives in memory per worker or in a small SQLite file
+shared by every worker on the host.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+
+import metrics
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+SCOPES = ('ip', 'user', 'route')
+
+# Take this many buckets between sweeps of buckets that have refilled completely
+PRUNE_EVERY = 1000
+
+RATE_LIMITED = metrics.registry.counter(
+    'academia_rate_limited_total', 'Requests rejected by the rate limiter', ('route', 'scope')
+)
+
+
+def parse_rate(rate):
+    """Parse "10/minute" into (capacity, tokens per second)."""
+    count, _, period = rate.partition('/')
+    try:
+        count = int(count)
+        seconds = PERIODS[period.strip()]
+    except (KeyError, ValueError):
+        raise ValueError(f'Invalid rate {rate!r}, expected "<count>/<{"|".join(PERIODS)}>"')
+    return count, count / seconds
+
+
+def refill(tokens, updated_at, capacity, refill_rate, now):
+    return min(capacity, tokens + (now - updated_at) * refill_rate)
+
+
+def _settle(buckets, levels):
+    """Decide a take from every bucket's current token level.
+
+    Returns (denied, retry_after, new levels): ``denied`` is the index of the
+    first bucket without a token, or None when every bucket pays one.
+    """
+    empty = [i for i, tokens in enumerate(levels) if tokens < 1]
+    if empty:
+        # The request needs every bucket, so it can retry once the slowest one refills
+        return empty[0], max((1 - levels[i]) / buckets[i][2] for i in empty), levels
+    return None, 0.0, [tokens - 1 for tokens in levels]
+
+
+class MemoryBackend:
+    """Buckets held in this process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def take(self, buckets, now=None):
+        """Take one token from each of ``buckets``, given as (key, capacity, refill rate), or from none.
+
+        Returns (index of the first empty bucket or None, seconds until it has a token).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            levels = []
+            for key, capacity, refill_rate in buckets:
+                tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+                levels.append(refill(tokens, updated_at, capacity, refill_rate, now))
+            denied, retry_after, levels = _settle(buckets, levels)
+            if denied is None:
+                for (key, capacity, refill_rate), tokens in zip(buckets, levels):
+                    # A bucket that has refilled completely is the same as no bucket
+                    self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+
+            self._takes += 1
+            if self._takes >= PRUNE_EVERY:
+                self._takes = 0
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+        return denied, retry_after
+
+
+class SQLiteBackend:
+    """Buckets in a SQLite file so that every worker process shares one budget."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                full_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limit_full_at ON rate_limit_buckets (full_at)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit so that BEGIN IMMEDIATE below controls the transaction
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, buckets, now=None):
+        """Take one token from each of ``buckets``, given as (key, capacity, refill rate), or from none.
+
+        Returns (index of the first empty bucket or None, seconds until it has a token).
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        # The write lock makes the read-modify-write atomic across processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = []
+            for key, capacity, refill_rate in buckets:
+                row = conn.execute(
+                    'SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)
+                ).fetchone()
+                levels.append(refill(row[0], row[1], capacity, refill_rate, now) if row else capacity)
+            denied, retry_after, levels = _settle(buckets, levels)
+            if denied is None:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)',
+                    [(key, tokens, now, now + (capacity - tokens) / refill_rate)
+                     for (key, capacity, refill_rate), tokens in zip(buckets, levels)]
+                )
+            self._takes += 1
+            if self._takes >= PRUNE_EVERY:
+                self._takes = 0
+                conn.execute('DELETE FROM rate_limit_buckets WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return denied, retry_after
+
+
+def create_backend(name, db_path=None):
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(db_path)
+    raise ValueError(f'Unknown rate limit backend: {name}')
+
+
+class RateLimiter:
+    """Applies the configured budgets to requests."""
+
+    def __init__(self, backend, limits, default_limits):
+        self.backend = backend
+        self.limits = {route: self._parse(budgets) for route, budgets in limits.items()}
+        self.default_limits = self._parse(default_limits)
+
+    @staticmethod
+    def _parse(budgets):
+        for scope in budgets:
+            if scope not in SCOPES:
+                raise ValueError(f'Unknown rate limit scope: {scope}')
+        return [(scope, *parse_rate(rate)) for scope, rate in sorted(budgets.items())]
+
+    def check(self, route, ip, user_id=None):
+        """Charge one request to every budget of ``route``, or to none if any is exhausted.
+
+        Returns None when the request may proceed, otherwise (scope,
+        retry_after seconds) for the first exhausted budget. A rejected
+        request costs nothing, so it does not drain the budgets that still
+        had room. Anonymous requests skip 'user' budgets; their 'ip' budgets
+        still apply.
+        """
+        scopes, buckets = [], []
+        for scope, capacity, refill_rate in self.limits.get(route, self.default_limits):
+            if scope == 'ip':
+                identity = ip
+            elif scope == 'user':
+                if user_id is None:
+                    continue
+                identity = user_id
+            else:
+                identity = '*'
+            scopes.append(scope)
+            buckets.append((f'{scope}:{identity}:{route}', capacity, refill_rate))
+        if not buckets:
+            return None
+        denied, retry_after = self.backend.take(buckets)
+        if denied is None:
+            return None
+        RATE_LIMITED.inc(route, scopes[denied])
+        return scopes[denied], max(1, math.ceil(retry_after))
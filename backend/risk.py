@@ -0,0 +1,225 @@
+"""
+Early-warning risk scoring for Academia AI Backend
+Scores every student with the active prediction model from recent attendance
+and stored features, buckets the scores by the configured performance thresholds and
+stores only the students whose score or bucket moved since the previous run.
+"""
+
+import logging
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+import feature_store
+import prediction
+
+logger = logging.getLogger(__name__)
+
+AT_RISK = 'at_risk'
+# Best bucket first; students below every threshold are at risk
+BUCKETS = ('excellent', 'good', 'average', AT_RISK)
+
+
+def init_risk_tables(cursor):
+    """Create the risk score tables and their indexes."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS risk_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            as_of DATE NOT NULL,
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            scored INTEGER,
+            changed INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS risk_scores (
+            student_id INTEGER PRIMARY KEY,
+            score REAL NOT NULL,
+            bucket TEXT NOT NULL,
+            attendance_rate REAL NOT NULL,
+            trend REAL NOT NULL,
+            sessions INTEGER NOT NULL,
+            run_id INTEGER NOT NULL,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_risk_scores_bucket ON risk_scores (bucket, score DESC)')
+    # One row per student whose score or bucket changed in a run; new_bucket is
+    # NULL when the student dropped out of scoring
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS risk_score_changes (
+            run_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            old_bucket TEXT,
+            new_bucket TEXT,
+            old_score REAL,
+            new_score REAL,
+            PRIMARY KEY (run_id, student_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def assign_buckets(performance, thresholds):
+    """Return the bucket name of every performance value."""
+    conditions = [performance >= thresholds[name] for name in BUCKETS[:-1]]
+    return np.select(conditions, BUCKETS[:-1], default=AT_RISK)
+
+
+class RiskPipeline:
+    """Scores students and records what changed since the previous run.
+
+    Performance is predicted by the model ``model_source`` returns, from the
+    feature store and the recent attendance ``attendance`` builds, the same
+    attendance input models are trained on.
+    """
+
+    def __init__(self, model_source, thresholds, attendance, min_sessions=3, score_epsilon=0.01):
+        missing = set(BUCKETS[:-1]) - set(thresholds)
+        if missing:
+            raise ValueError(f'Missing performance thresholds: {", ".join(sorted(missing))}')
+        self.model_source = model_source
+        self.thresholds = thresholds
+        self.attendance = attendance
+        self.min_sessions = min_sessions
+        self.score_epsilon = score_epsilon
+        self._run_lock = threading.Lock()
+
+    def score(self, conn, as_of):
+        """Return arrays of student id, risk score, bucket, attendance rate, trend and sessions."""
+        recent = self.attendance.compute(conn, as_of)
+        keep = recent['sessions'] >= self.min_sessions
+        students, attendance, trend, sessions = (
+            recent[column][keep] for column in ('student_id', 'attendance', 'trend', 'sessions')
+        )
+        batch = feature_store.read_features(conn, student_ids=students)
+        raw = {name: batch.values[:, i] for i, name in enumerate(batch.columns)}
+        raw['attendance'] = attendance
+        model = self.model_source()
+        performance = model.predict(prediction.scale_features(raw))
+        return {
+            'model_version': model.version,
+            'student_id': students,
+            'score': np.round(1 - performance, 4),
+            'bucket': assign_buckets(performance, self.thresholds),
+            'attendance_rate': np.round(attendance, 4),
+            'trend': np.round(trend, 4),
+            'sessions': sessions
+        }
+
+    def claim_run(self, conn, as_of, min_interval):
+        """Start a run unless another worker started one within ``min_interval`` seconds.
+
+        Returns the new run id, or None when the run should be skipped.
+        """
+        now = time.time()
+        cursor = conn.cursor()
+        # The write lock makes check-then-insert atomic across workers
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('SELECT MAX(started_at) FROM risk_runs')
+            last = cursor.fetchone()[0]
+            if last is not None and now - last < min_interval:
+                conn.rollback()
+                return None
+            cursor.execute('INSERT INTO risk_runs (as_of, started_at) VALUES (?, ?)', (as_of.isoformat(), now))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return cursor.lastrowid
+
+    def run(self, conn, as_of=None, min_interval=0):
+        """Score every student and store the deltas; returns a summary, or None if skipped."""
+        as_of = as_of or date.today()
+        with self._run_lock:
+            run_id = self.claim_run(conn, as_of, min_interval)
+            if run_id is None:
+                return None
+            started = time.perf_counter()
+            scores = self.score(conn, as_of)
+
+            cursor = conn.cursor()
+            cursor.execute('SELECT student_id, score, bucket FROM risk_scores')
+            previous = {row[0]: row[1:] for row in cursor.fetchall()}
+
+            changes, upserts = [], []
+            rows = zip(*(scores[column].tolist() for column in
+                         ('student_id', 'score', 'bucket', 'attendance_rate', 'trend', 'sessions')))
+            for student_id, score, bucket, attendance_rate, trend, sessions in rows:
+                old_score, old_bucket = previous.pop(student_id, (None, None))
+                if old_bucket == bucket and abs(old_score - score) < self.score_epsilon:
+                    continue
+                changes.append((run_id, student_id, old_bucket, bucket, old_score, score))
+                upserts.append((student_id, score, bucket, attendance_rate, trend, sessions, run_id))
+            # Students left in previous no longer have enough recent sessions to score
+            changes.extend((run_id, student_id, old_bucket, None, old_score, None)
+                           for student_id, (old_score, old_bucket) in previous.items())
+
+            cursor.executemany('''
+                INSERT INTO risk_scores (student_id, score, bucket, attendance_rate, trend, sessions, run_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (student_id) DO UPDATE SET
+                    score = excluded.score, bucket = excluded.bucket,
+                    attendance_rate = excluded.attendance_rate, trend = excluded.trend,
+                    sessions = excluded.sessions, run_id = excluded.run_id
+            ''', upserts)
+            cursor.executemany('DELETE FROM risk_scores WHERE student_id = ?', [(sid,) for sid in previous])
+            cursor.executemany('''
+                INSERT INTO risk_score_changes (run_id, student_id, old_bucket, new_bucket, old_score, new_score)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', changes)
+            cursor.execute(
+                'UPDATE risk_runs SET finished_at = ?, scored = ?, changed = ? WHERE id = ?',
+                (time.time(), len(scores['student_id']), len(changes), run_id)
+            )
+            conn.commit()
+
+        summary = {
+            'run_id': run_id,
+            'as_of': as_of.isoformat(),
+            'scored': len(scores['student_id']),
+            'changed': len(changes),
+            'model_version': scores['model_version'],
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        logger.info('Risk scoring run %(run_id)s scored %(scored)s students with model %(model_version)s, '
+                    '%(changed)s changed in %(seconds)ss', summary)
+        return summary
+
+
+def latest_run(conn):
+    """Return the most recent finished run, or None."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, as_of, started_at, finished_at, scored, changed
+        FROM risk_runs
+        WHERE finished_at IS NOT NULL
+        ORDER BY id DESC
+        LIMIT 1
+    ''')
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip(('id', 'as_of', 'started_at', 'finished_at', 'scored', 'changed'), row))
+
+
+def list_students(conn, buckets, page, per_page):
+    """Return (total, rows) of scored students in ``buckets``, highest risk first."""
+    placeholders = ','.join('?' * len(buckets))
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT COUNT(*) FROM risk_scores WHERE bucket IN ({placeholders})', buckets)
+    total = cursor.fetchone()[0]
+    cursor.execute(f'''
+        SELECT r.student_id, s.name, s.student_id, r.score, r.bucket, r.attendance_rate, r.trend,
+               r.sessions, r.run_id
+        FROM risk_scores r
+        JOIN students s ON s.id = r.student_id
+        WHERE r.bucket IN ({placeholders})
+        ORDER BY r.score DESC, r.student_id
+        LIMIT ? OFFSET ?
+    ''', (*buckets, per_page, (page - 1) * per_page))
+    columns = ('id', 'name', 'student_id', 'score', 'bucket', 'attendance_rate', 'trend', 'sessions', 'run_id')
+    return total, [dict(zip(columns, row)) for row in cursor.fetchall()]
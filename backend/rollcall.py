@@ -0,0 +1,158 @@
+"""
+Roll-call sheets for Academia AI Backend
+A sheet is a course's enrolled students with their status for one day and
+a summary of their recent attendance in that course, built in one query
+over the course's roster and its (course_id, date) attendance index.
+Sheets are cached per worker and checked against a version counter that
+marks and enrollment changes bump in their own transaction, so every
+worker sees a change as soon as it commits.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import metrics
+import partitions
+
+# Version row for changes that affect every day's sheet, such as enrollment
+ROSTER = ''
+
+SHEET_CACHE_REQUESTS = metrics.registry.counter(
+    'academia_roll_call_cache_requests_total', 'Roll-call sheet cache lookups by result', ('result',)
+)
+
+
+def init_roll_call_tables(cursor):
+    """Create the sheet version table."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS roll_call_versions (
+            course_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (course_id, date)
+        ) WITHOUT ROWID
+    ''')
+
+
+def invalidate(cursor, course_id, day=ROSTER):
+    """Mark a course's sheet for ``day`` (a YYYY-MM-DD string) as changed, or every sheet by default.
+
+    Call it in the transaction making the change, so no worker can cache
+    the old sheet under the new version.
+    """
+    if course_id is None:
+        return
+    cursor.execute('''
+        INSERT INTO roll_call_versions (course_id, date, version) VALUES (?, ?, 1)
+        ON CONFLICT (course_id, date) DO UPDATE SET version = version + 1
+    ''', (course_id, day))
+
+
+def version(conn, course_id, day):
+    """Return a token that changes whenever the course's sheet for ``day`` may have."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT COALESCE(SUM(version), 0) FROM roll_call_versions
+        WHERE course_id = ? AND date IN (?, ?)
+    ''', (course_id, day.isoformat(), ROSTER))
+    return cursor.fetchone()[0]
+
+
+def build_sheet(conn, course_id, day, history_days):
+    """Return the roll-call sheet of a course for ``day``.
+
+    Each enrolled student has their status on ``day`` (None when not yet
+    marked) and their marks in the course over the ``history_days``
+    before it; late counts as attended.
+    """
+    start = day - timedelta(days=history_days)
+    cursor = conn.cursor()
+    # Filtering inside the subquery lets SQLite push it into every partition's index
+    cursor.execute(f'''
+        WITH recent AS (
+            SELECT
+                student_id,
+                MAX(CASE WHEN date = :day THEN status END) AS status,
+                SUM(date < :day) AS sessions,
+                SUM(date < :day AND status = 'present') AS present,
+                SUM(date < :day AND status = 'late') AS late,
+                SUM(date < :day AND status = 'absent') AS absent,
+                MAX(CASE WHEN date < :day AND status IN ('present', 'late') THEN date END) AS last_attended
+            FROM {partitions.source(conn, start, day)}
+            WHERE course_id = :course_id AND date >= :start AND date <= :day
+            GROUP BY student_id
+        )
+        SELECT s.id, s.name, s.student_id, s.avatar,
+               r.status, r.sessions, r.present, r.late, r.absent, r.last_attended
+        FROM enrollments e
+        JOIN students s ON s.id = e.student_id
+        LEFT JOIN recent r ON r.student_id = e.student_id
+        WHERE e.course_id = :course_id AND e.status = 'enrolled'
+        ORDER BY s.name
+    ''', {'course_id': course_id, 'day': day.isoformat(), 'start': start.isoformat()})
+
+    students = []
+    for row in cursor.fetchall():
+        sessions = row[5] or 0
+        attended = (row[6] or 0) + (row[7] or 0)
+        students.append({
+            'id': row[0],
+            'name': row[1],
+            'student_id': row[2],
+            'avatar': row[3],
+            'status': row[4],
+            'recent': {
+                'sessions': sessions,
+                'present': row[6] or 0,
+                'late': row[7] or 0,
+                'absent': row[8] or 0,
+                'attendance_rate': round(attended / sessions, 4) if sessions else None,
+                'last_attended': row[9]
+            }
+        })
+    marked = sum(1 for student in students if student['status'] is not None)
+    return {
+        'course_id': course_id,
+        'date': day.isoformat(),
+        'history_days': history_days,
+        'enrolled': len(students),
+        'marked': marked,
+        'students': students
+    }
+
+
+class SheetCache:
+    """LRU cache of roll-call sheets keyed by (course, day), validated by version() on every read."""
+
+    def __init__(self, max_entries, history_days):
+        self.max_entries = max_entries
+        self.history_days = history_days
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conn, course_id, day):
+        """Return the sheet of ``course_id`` for ``day``, rebuilding it if it changed."""
+        # Only today's marks bump versions, so a later day's history could change unseen
+        if day > date.today():
+            SHEET_CACHE_REQUESTS.inc('bypass')
+            return build_sheet(conn, course_id, day, self.history_days)
+
+        key = (course_id, day)
+        # Read the version first: a change committed while building makes the entry stale, never wrong
+        current = version(conn, course_id, day)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == current:
+                self._entries.move_to_end(key)
+                SHEET_CACHE_REQUESTS.inc('hit')
+                return entry[1]
+
+        sheet = build_sheet(conn, course_id, day, self.history_days)
+        SHEET_CACHE_REQUESTS.inc('miss')
+        with self._lock:
+            self._entries[key] = (current, sheet)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return sheet
@@ -0,0 +1,194 @@
+"""
+Login sessions for Academia AI Backend
+Short-lived access tokens are renewed with rotating refresh tokens stored in
+the sessions table, so staying signed in never re-runs the password KDF.
+Revoked sessions are mirrored into an in-memory set that each worker keeps
+in sync with the table.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+
+class InvalidRefreshToken(Exception):
+    """Raised when a refresh token is unknown, expired, revoked, wrong or reused."""
+
+
+def init_session_tables(cursor):
+    """Create the sessions table and its indexes."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            refresh_hash TEXT NOT NULL,
+            previous_hash TEXT,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            revoked_at REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Tables created before reuse detection tracked the previous secret
+    cursor.execute('PRAGMA table_info(sessions)')
+    if 'previous_hash' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE sessions ADD COLUMN previous_hash TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id, expires_at)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessions_revoked ON sessions (revoked_at)
+        WHERE revoked_at IS NOT NULL
+    ''')
+
+
+def _hash_secret(secret):
+    # Refresh secrets are 256 random bits, so a fast hash is enough; no KDF needed
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+
+def _split_token(refresh_token):
+    session_id, _, secret = (refresh_token or '').partition('.')
+    if not session_id or not secret:
+        raise InvalidRefreshToken('Malformed refresh token')
+    return session_id, secret
+
+
+def create_session(conn, user_id, ttl_seconds):
+    """Start a session for ``user_id``; returns (session id, refresh token)."""
+    now = time.time()
+    session_id = secrets.token_urlsafe(16)
+    secret = secrets.token_urlsafe(32)
+    cursor = conn.cursor()
+    # Drop this user's long-expired sessions so the table does not grow without bound
+    cursor.execute('DELETE FROM sessions WHERE user_id = ? AND expires_at < ?', (user_id, now))
+    cursor.execute('''
+        INSERT INTO sessions (id, user_id, refresh_hash, created_at, last_used_at, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (session_id, user_id, _hash_secret(secret), now, now, now + ttl_seconds))
+    conn.commit()
+    return session_id, f'{session_id}.{secret}'
+
+
+def rotate_session(conn, refresh_token, ttl_seconds):
+    """Exchange a refresh token for a new one.
+
+    Returns (session id, user id, email, new refresh token). Presenting the
+    refresh token that was just rotated away means it was copied, so the
+    whole session is revoked and the caller must log in again. Any other
+    wrong secret is only refused: the session id is readable in every
+    access token, so guessing must not be able to end someone's session.
+    """
+    session_id, secret = _split_token(refresh_token)
+    now = time.time()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT s.user_id, s.refresh_hash, s.previous_hash, s.expires_at, s.revoked_at, u.email
+        FROM sessions s
+        JOIN users u ON u.id = s.user_id
+        WHERE s.id = ?
+    ''', (session_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise InvalidRefreshToken('Unknown session')
+    user_id, refresh_hash, previous_hash, expires_at, revoked_at, email = row
+    if revoked_at is not None or expires_at <= now:
+        raise InvalidRefreshToken('Session has ended')
+
+    old_hash = _hash_secret(secret)
+    if not hmac.compare_digest(old_hash, refresh_hash):
+        if previous_hash is not None and hmac.compare_digest(old_hash, previous_hash):
+            revoke_session(conn, session_id)
+            raise InvalidRefreshToken('Refresh token was already used')
+        raise InvalidRefreshToken('Invalid refresh token')
+
+    new_secret = secrets.token_urlsafe(32)
+    # Conditional on the old hash so two concurrent refreshes cannot both succeed
+    cursor.execute('''
+        UPDATE sessions
+        SET refresh_hash = ?, previous_hash = ?, last_used_at = ?, expires_at = ?
+        WHERE id = ? AND refresh_hash = ? AND revoked_at IS NULL
+    ''', (_hash_secret(new_secret), old_hash, now, now + ttl_seconds, session_id, old_hash))
+    if cursor.rowcount != 1:
+        conn.rollback()
+        revoke_session(conn, session_id)
+        raise InvalidRefreshToken('Refresh token was already used')
+    conn.commit()
+    return session_id, user_id, email, f'{session_id}.{new_secret}'
+
+
+def session_id_from_refresh_token(refresh_token):
+    return _split_token(refresh_token)[0]
+
+
+def revoke_session(conn, session_id):
+    """Mark one session revoked; returns the revocation time, or None if it was not active."""
+    now = time.time()
+    cursor = conn.cursor()
+    cursor.execute('UPDATE sessions SET revoked_at = ? WHERE id = ? AND revoked_at IS NULL', (now, session_id))
+    conn.commit()
+    return now if cursor.rowcount else None
+
+
+def revoke_user_sessions(conn, user_id):
+    """Revoke every active session of ``user_id``; returns [(session id, revoked at)]."""
+    now = time.time()
+    cursor = conn.cursor()
+    cursor.execute(
+        'SELECT id FROM sessions WHERE user_id = ? AND revoked_at IS NULL AND expires_at > ?', (user_id, now)
+    )
+    session_ids = [row[0] for row in cursor.fetchall()]
+    cursor.executemany(
+        'UPDATE sessions SET revoked_at = ? WHERE id = ? AND revoked_at IS NULL',
+        [(now, session_id) for session_id in session_ids]
+    )
+    conn.commit()
+    return [(session_id, now) for session_id in session_ids]
+
+
+class RevocationList:
+    """In-memory set of revoked session ids, refreshed from the sessions table.
+
+    A revoked session only matters until the last access token issued for it
+    expires, so entries are kept for ``access_ttl`` seconds after revocation.
+    Revocations made by other workers are picked up within ``sync_interval``.
+    """
+
+    def __init__(self, access_ttl, sync_interval):
+        self.access_ttl = access_ttl
+        self.sync_interval = sync_interval
+        self._revoked = {}
+        self._watermark = time.time() - access_ttl
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, session_id, revoked_at):
+        with self._lock:
+            self._revoked[session_id] = revoked_at + self.access_ttl
+
+    def sync(self, conn):
+        """Load revocations written since the last sync and forget expired ones."""
+        now = time.time()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT id, revoked_at FROM sessions WHERE revoked_at IS NOT NULL AND revoked_at >= ?',
+            (self._watermark,)
+        )
+        rows = cursor.fetchall()
+        with self._lock:
+            for session_id, revoked_at in rows:
+                self._revoked[session_id] = revoked_at + self.access_ttl
+                self._watermark = max(self._watermark, revoked_at)
+            self._revoked = {sid: until for sid, until in self._revoked.items() if until > now}
+            self._next_sync = now + self.sync_interval
+
+    def is_revoked(self, session_id, connect):
+        """Return True if ``session_id`` is revoked, syncing first when the set is stale."""
+        if time.time() >= self._next_sync:
+            conn = connect()
+            try:
+                self.sync(conn)
+            finally:
+                conn.close()
+        return self._revoked.get(session_id, 0) > time.time()
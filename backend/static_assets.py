@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Static asset pipeline for Academia AI Backend
+Optimises the frontend's JS, CSS and image assets, copies them to
+content-hash fingerprinted filenames with pre-built gzip and brotli
+variants, and rewrites page references to point at them. Builds hold a file
+lock, write every file atomically and publish the manifest last, so workers
+starting together never read a half-written build.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import asset_build
+
+try:
+    import brotli
+except ImportError:  # brotli variants are optional
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:  # no build lock on Windows; build with static_assets.py before starting workers there
+    fcntl = None
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.build.lock'
+HASH_LENGTH = 12
+
+# Only text formats benefit from compression
+COMPRESSIBLE_SUFFIXES = {'.css', '.js', '.svg', '.json', '.html', '.txt'}
+
+# Pre-built variants, in order of preference when the client accepts several
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_ASSET_REF_RE = re.compile(r'(?P<attr>href|src)="(?P<url>[^"#?]+)"')
+_SCRIPT_TAG_RE = re.compile(r'(?P<indent>[ \t]*)<script\s+src="(?P<url>[^"#?]+)"\s*>\s*</script>')
+_FINGERPRINTED_RE = re.compile(rf'\.[0-9a-f]{{{HASH_LENGTH}}}\.[^/]+$')
+
+
+def fingerprint(content):
+    """Return the content hash embedded in fingerprinted filenames."""
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+
+def fingerprinted_name(relative_path, digest):
+    path = Path(relative_path)
+    return str(path.with_name(f'{path.stem}.{digest}{path.suffix}').as_posix())
+
+
+def _write_atomic(target, content):
+    """Write ``content`` to a temporary file and rename it over ``target``, so readers never see part of it."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=target.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, target)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _variants(built_name):
+    """Return the stored filenames of a built asset: itself and its compressed variants."""
+    if Path(built_name).suffix not in COMPRESSIBLE_SUFFIXES:
+        return [built_name]
+    return [built_name] + [built_name + suffix for _, suffix in ENCODINGS]
+
+
+def _write_variants(target, content):
+    """Write ``content`` and its compressed variants next to ``target``."""
+    if target.is_file():
+        # Fingerprinted names only ever hold the same content
+        return
+    if target.suffix in COMPRESSIBLE_SUFFIXES:
+        # mtime=0 keeps the gzip output byte-for-byte reproducible
+        _write_atomic(target.with_name(target.name + '.gz'), gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write_atomic(target.with_name(target.name + '.br'), brotli.compress(content, quality=11))
+    # Written last: its presence means the variants are there too
+    _write_atomic(target, content)
+
+
+@contextmanager
+def _build_lock(output_dir):
+    """Hold an exclusive lock on ``output_dir`` across processes for the duration of a build."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / LOCK_NAME, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def prune(output_dir, keep):
+    """Delete fingerprinted files in ``output_dir`` that are not built names in ``keep``; returns how many went."""
+    output_dir = Path(output_dir)
+    kept = {stored for built_name in keep for stored in _variants(built_name)}
+    removed = 0
+    for path in output_dir.rglob('*'):
+        name = path.relative_to(output_dir).as_posix()
+        if path.is_file() and name not in kept and _FINGERPRINTED_RE.search(path.name):
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def collect_sources(frontend_dir, asset_dirs):
+    """Return {relative path: bytes} for every file under ``asset_dirs``."""
+    frontend_dir = Path(frontend_dir)
+    sources = {}
+    for asset_dir in asset_dirs:
+        asset_dir = Path(asset_dir)
+        if not asset_dir.is_dir():
+            continue
+        for path in sorted(asset_dir.rglob('*')):
+            if path.is_file() and not path.name.startswith('.'):
+                sources[path.relative_to(frontend_dir).as_posix()] = path.read_bytes()
+    return sources
+
+
+def source_digest(frontend_dir, sources, optimize):
+    """Hash everything a build depends on: assets, pages and the optimiser itself."""
+    digest = hashlib.sha256()
+    digest.update(b'optimize' if optimize else b'plain')
+    digest.update(Path(asset_build.__file__).read_bytes())
+    pages = {path.name: path.read_bytes() for path in sorted(Path(frontend_dir).glob('*.html'))}
+    for name, content in sorted(sources.items()) + sorted(pages.items()):
+        digest.update(name.encode('utf-8'))
+        digest.update(fingerprint(content).encode('ascii'))
+    return digest.hexdigest()
+
+
+def build_assets(frontend_dir, asset_dirs, output_dir, optimize=True):
+    """Fingerprint and precompress the frontend assets, returning the manifest.
+
+    With ``optimize`` the JavaScript and CSS are minified, global.js is split
+    into per-page bundles and unused CSS rules are removed first. Files of
+    the previous build stay for pages rendered from it; older ones are
+    deleted.
+    """
+    with _build_lock(output_dir):
+        return _build(frontend_dir, asset_dirs, output_dir, optimize)
+
+
+def ensure_built(frontend_dir, asset_dirs, output_dir, optimize=True):
+    """Build the assets unless they are up to date, and return the current manifest.
+
+    Workers starting together build once: the rest wait on the lock and
+    then find the build current.
+    """
+    with _build_lock(output_dir):
+        if is_stale(frontend_dir, asset_dirs, output_dir, optimize):
+            return _build(frontend_dir, asset_dirs, output_dir, optimize)
+        return load_manifest(output_dir)
+
+
+def _build(frontend_dir, asset_dirs, output_dir, optimize):
+    output_dir = Path(output_dir)
+    previous = load_manifest(output_dir)
+    sources = collect_sources(frontend_dir, asset_dirs)
+    digest = source_digest(frontend_dir, sources, optimize)
+
+    page_assets, report = {}, None
+    if optimize:
+        sources, page_assets, report = asset_build.optimize(frontend_dir, sources)
+
+    assets = {}
+    for relative_path, content in sources.items():
+        built_name = fingerprinted_name(relative_path, fingerprint(content))
+        _write_variants(output_dir / built_name, content)
+        assets[relative_path] = built_name
+
+    manifest = {
+        'source_digest': digest,
+        'assets': assets,
+        'pages': page_assets,
+        'report': report
+    }
+    # Publishing the manifest switches readers to the new build in one step
+    _write_atomic(output_dir / MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    prune(output_dir, set(assets.values()) | set(previous['assets'].values() if previous else ()))
+    return manifest
+
+
+def load_manifest(output_dir):
+    """Return the manifest written by the last build, or None if there is none."""
+    path = Path(output_dir) / MANIFEST_NAME
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text())
+
+
+def is_stale(frontend_dir, asset_dirs, output_dir, optimize=True):
+    """Return True when any source asset or page changed since the last build."""
+    manifest = load_manifest(output_dir)
+    if manifest is None or 'source_digest' not in manifest:
+        return True
+    sources = collect_sources(frontend_dir, asset_dirs)
+    return manifest['source_digest'] != source_digest(frontend_dir, sources, optimize)
+
+
+def rewrite_references(html, manifest, url_prefix, page=None):
+    """Point every src/href that names a built asset at its fingerprinted URL.
+
+    Scripts that were split into bundles for ``page`` are replaced by one
+    script tag per bundle.
+    """
+    assets = manifest['assets']
+    bundles = manifest['pages'].get(page, {})
+
+    def expand_script(match):
+        names = bundles.get(match.group('url'))
+        if not names:
+            return match.group(0)
+        return '\n'.join(
+            f'{match.group("indent")}<script src="{url_prefix}/{assets[name]}"></script>' for name in names
+        )
+
+    def replace(match):
+        built = assets.get(match.group('url'))
+        if built is None:
+            return match.group(0)
+        return f'{match.group("attr")}="{url_prefix}/{built}"'
+
+    html = _SCRIPT_TAG_RE.sub(expand_script, html)
+    return _ASSET_REF_RE.sub(replace, html)
+
+
+def choose_encoding(accept_encoding, output_dir, filename):
+    """Return (encoding, stored filename) for the best pre-built variant the client accepts."""
+    accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').split(',')}
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and (Path(output_dir) / (filename + suffix)).is_file():
+            return encoding, filename + suffix
+    return None, filename
+
+
+def main():
+    # Add the backend directory to Python path
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from config.config import FRONTEND_DIR, STATIC_BUILD_DIR, STATIC_ASSET_DIRS, STATIC_OPTIMIZE
+
+    parser = argparse.ArgumentParser(description='Build the fingerprinted frontend assets')
+    parser.add_argument('--no-optimize', action='store_true', help='Skip minification, bundling and CSS purging')
+    args = parser.parse_args()
+
+    optimize = STATIC_OPTIMIZE and not args.no_optimize
+    manifest = build_assets(FRONTEND_DIR, STATIC_ASSET_DIRS, STATIC_BUILD_DIR, optimize)
+    for source, built in sorted(manifest['assets'].items()):
+        print(f"  {source} -> {built}")
+    if manifest['report']:
+        print()
+        print(asset_build.format_report(manifest['report']))
+        print()
+    print(f"Built {len(manifest['assets'])} assets into {STATIC_BUILD_DIR}"
+          + ('' if brotli else ' (brotli not installed, gzip only)'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""
+Offline attendance sync for Academia AI Backend
+Clients that lose their connection queue marks locally, each stamped with
+the time it was taken, and send them in batches. A batch is applied in one
+transaction, each operation at most once per client however often it is
+retried, and a mark only replaces one taken before it (last writer wins).
+attendance_clock holds the stamp of every recent mark and renumbers a mark
+whenever it changes, so a client's sync token is the highest number it has
+seen and its delta is the marks numbered above that.
+"""
+
+import time
+from datetime import date, timedelta
+
+import analytics
+import metrics
+import partitions
+import rollcall
+
+STATUSES = ('present', 'absent', 'late')
+OUTCOMES = ('applied', 'stale', 'rejected')
+
+# SQLite's default limit on bound parameters is well above this
+_CHUNK = 500
+
+SYNC_OPS = metrics.registry.counter('academia_sync_ops_total', 'Offline sync operations by outcome', ('outcome',))
+SYNC_BATCH_SIZE = metrics.registry.histogram(
+    'academia_sync_batch_size', 'Operations sent in one sync batch', buckets=(1, 10, 50, 100, 250, 500)
+)
+
+
+def init_sync_tables(cursor):
+    """Create the mark clock and the record of operations already applied."""
+    # REPLACE deletes and reinserts, so a changed mark always gets a new, higher seq
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_clock (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            course_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stamp REAL NOT NULL,
+            origin TEXT,
+            UNIQUE (student_id, course_id, date)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_clock_date ON attendance_clock (date)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_ops (
+            client_id TEXT NOT NULL,
+            op_id TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            applied_at REAL NOT NULL,
+            PRIMARY KEY (client_id, op_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sync_ops_applied ON sync_ops (applied_at)')
+
+
+def record(cursor, student_id, course_id, day, status, stamp, origin=None):
+    """Record that a course mark now has ``status`` as of ``stamp``; returns its new seq.
+
+    Call it in the transaction writing the mark. Marks without a course
+    are not synced.
+    """
+    if course_id is None:
+        return None
+    cursor.execute('''
+        INSERT OR REPLACE INTO attendance_clock (student_id, course_id, date, status, stamp, origin)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (student_id, course_id, day, status, stamp, origin))
+    return cursor.lastrowid
+
+
+def _lookup(cursor, sql, keys):
+    found = {}
+    keys = list(dict.fromkeys(keys))
+    for i in range(0, len(keys), _CHUNK):
+        chunk = keys[i:i + _CHUNK]
+        cursor.execute(sql.format(', '.join('?' * len(chunk))), chunk)
+        found.update((row[0], row[1:]) for row in cursor.fetchall())
+    return found
+
+
+def _taken_at(op):
+    stamp = op.get('client_ts')
+    return stamp if isinstance(stamp, (int, float)) else 0
+
+
+def _seen(cursor, client_id, ops):
+    seen = {}
+    op_ids = list(dict.fromkeys(op['op_id'] for op in ops))
+    for i in range(0, len(op_ids), _CHUNK):
+        chunk = op_ids[i:i + _CHUNK]
+        cursor.execute(f'''
+            SELECT op_id, outcome FROM sync_ops WHERE client_id = ? AND op_id IN ({', '.join('?' * len(chunk))})
+        ''', [client_id] + chunk)
+        seen.update(cursor.fetchall())
+    return seen
+
+
+def _problem(op, today, window_days):
+    """Return why an operation cannot be applied, or None."""
+    if not isinstance(op.get('student_id'), str):
+        return 'student_id must be a student code'
+    if op.get('status') not in STATUSES:
+        return f"status must be one of {', '.join(STATUSES)}"
+    if not isinstance(op.get('course_id'), int):
+        return 'course_id must be an integer'
+    if not isinstance(op.get('client_ts'), (int, float)):
+        return 'client_ts must be a number'
+    try:
+        day = date.fromisoformat(op.get('date'))
+    except (TypeError, ValueError):
+        day = None
+    if day is None or day.isoformat() != op['date']:
+        return 'date must be YYYY-MM-DD'
+    if day > today:
+        return 'date is in the future'
+    if day < today - timedelta(days=window_days):
+        return f'date is more than {window_days} days ago'
+    return None
+
+
+def apply(conn, client_id, ops, marked_by, term_start_months, window_days):
+    """Apply a client's batch of queued marks in one transaction.
+
+    Each op is a dict with op_id, student_id (the student code), course_id,
+    date, status and client_ts (seconds since the epoch, capped at the
+    server's clock). A mark replaces the current one only if it was taken
+    later; marks made before sync existed count as taken at time zero. Ops
+    this client sent before get their first outcome again.
+
+    Returns ``(results, changes)``: ``{op_id: (outcome, reason)}`` for every
+    op, and one dict per mark whose status changed, for the caller to
+    publish once committed.
+    """
+    if not ops:
+        return {}, []
+    now = time.time()
+    today = date.today()
+    cursor = conn.cursor()
+    # The write lock keeps the stamp comparisons valid until commit
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        seen = _seen(cursor, client_id, ops)
+        results = {op_id: (outcome, None) for op_id, outcome in seen.items()}
+        fresh = [op for op in dict((op['op_id'], op) for op in ops).values() if op['op_id'] not in seen]
+        students = _lookup(cursor, 'SELECT student_id, id, name FROM students WHERE student_id IN ({})',
+                           [op['student_id'] for op in fresh if isinstance(op.get('student_id'), str)])
+        courses = _lookup(cursor, 'SELECT id, 0 FROM courses WHERE id IN ({})',
+                          [op['course_id'] for op in fresh if isinstance(op.get('course_id'), int)])
+
+        changes = []
+        # Oldest first, so a batch holding several marks for one student writes only the last
+        for op in sorted(fresh, key=_taken_at):
+            problem = _problem(op, today, window_days)
+            if problem is None and op['student_id'] not in students:
+                problem = 'Student not found'
+            if problem is None and op['course_id'] not in courses:
+                problem = 'Course not found'
+            if problem is not None:
+                results[op['op_id']] = ('rejected', problem)
+                continue
+            change = _apply_one(conn, cursor, client_id, op, students[op['student_id']], min(op['client_ts'], now),
+                                marked_by, term_start_months, today)
+            results[op['op_id']] = ('applied' if change is not False else 'stale', None)
+            if change:
+                changes.append(change)
+
+        cursor.executemany('INSERT INTO sync_ops (client_id, op_id, outcome, applied_at) VALUES (?, ?, ?, ?)',
+                           [(client_id, op['op_id'], results[op['op_id']][0], now) for op in fresh])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    SYNC_BATCH_SIZE.observe(len(ops))
+    for op in fresh:
+        SYNC_OPS.inc(results[op['op_id']][0])
+    return results, changes
+
+
+def _apply_one(conn, cursor, client_id, op, student, stamp, marked_by, term_start_months, today):
+    """Write one mark if it is the latest; returns its change, None when unchanged, or False when stale."""
+    student_id, name = student
+    course_id, day, status = op['course_id'], op['date'], op['status']
+    cursor.execute('''
+        SELECT seq, status, stamp FROM attendance_clock WHERE student_id = ? AND course_id = ? AND date = ?
+    ''', (student_id, course_id, day))
+    clock = cursor.fetchone()
+    if clock is not None and clock[2] >= stamp:
+        return False
+
+    table = partitions.partition_for(conn, day, term_start_months)
+    cursor.execute(f'SELECT id, status FROM {table} WHERE student_id = ? AND date = ? AND course_id = ?',
+                   (student_id, day, course_id))
+    existing = cursor.fetchone()
+    old_status = existing[1] if existing else None
+    if old_status == status:
+        # Same mark taken later: keep the later stamp without handing it out in any delta
+        if clock is not None:
+            cursor.execute('UPDATE attendance_clock SET stamp = ? WHERE seq = ?', (stamp, clock[0]))
+        else:
+            record(cursor, student_id, course_id, day, status, stamp, client_id)
+        return None
+
+    if existing:
+        cursor.execute(f'UPDATE {table} SET status = ?, marked_by = ? WHERE id = ?', (status, marked_by, existing[0]))
+    else:
+        cursor.execute(f'''
+            INSERT INTO {table} (student_id, course_id, date, status, marked_by)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (student_id, course_id, day, status, marked_by))
+    analytics.record_attendance_change(cursor, student_id, course_id, day, old_status, status)
+    # A mark for an earlier day also changes the history on every later day's sheet
+    rollcall.invalidate(cursor, course_id, day if day == today.isoformat() else rollcall.ROSTER)
+    record(cursor, student_id, course_id, day, status, stamp, client_id)
+    return {
+        'student_id': student_id,
+        'student_code': op['student_id'],
+        'name': name,
+        'course_id': course_id,
+        'date': day,
+        'status': status,
+        'previous_status': old_status,
+        'stamp': stamp
+    }
+
+
+def changes_since(conn, since, client_id=None, course_ids=None, limit=1000):
+    """Return the marks changed after sync token ``since``: ``(token, changes, more)``.
+
+    Each mark appears once, with its latest status. Marks last set by
+    ``client_id`` are left out since it already has them. When ``more`` is
+    true the delta was cut at ``limit`` and the client should sync again
+    from ``token``.
+    """
+    cursor = conn.cursor()
+    # Writers are serialised, so every seq up to the current maximum is already committed
+    cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM attendance_clock')
+    latest = cursor.fetchone()[0]
+    where, params = ['c.seq > ?', 'c.seq <= ?', 'c.origin IS NOT ?'], [since, latest, client_id]
+    if course_ids:
+        where.append(f"c.course_id IN ({', '.join('?' * len(course_ids))})")
+        params.extend(course_ids)
+    cursor.execute(f'''
+        SELECT c.seq, s.student_id, c.course_id, c.date, c.status, c.stamp
+        FROM attendance_clock c
+        JOIN students s ON s.id = c.student_id
+        WHERE {' AND '.join(where)}
+        ORDER BY c.seq
+        LIMIT ?
+    ''', params + [limit + 1])
+    rows = cursor.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    token = rows[-1][0] if more else latest
+    changes = [
+        {
+            'student_id': row[1],
+            'course_id': row[2],
+            'date': row[3],
+            'status': row[4],
+            'stamp': row[5]
+        }
+        for row in rows
+    ]
+    return token, changes, more
+
+
+def purge(conn, window_days):
+    """Forget clocks and applied ops older than the sync window; returns how many rows went."""
+    cutoff = date.today() - timedelta(days=window_days + 1)
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM attendance_clock WHERE date < ?', (cutoff.isoformat(),))
+    removed = cursor.rowcount
+    cursor.execute('DELETE FROM sync_ops WHERE applied_at < ?', (time.time() - (window_days + 1) * 24 * 60 * 60,))
+    removed += cursor.rowcount
+    conn.commit()
+    return removed
@@ -0,0 +1,376 @@
+"""
+Multi-tenant database routing for Academia AI Backend
+Every institution has its own SQLite file. A request names its tenant by
+header, subdomain or access token claim; TenantRegistry keeps an LRU of open
+tenant handles, each with its own connection pool, a cap on concurrent
+requests so one busy school cannot take every worker thread, and the
+per-worker services built for it. Handles left idle are closed.
+"""
+
+import argparse
+import contextvars
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Tenant of single-database deployments
+DEFAULT = 'default'
+
+# Lower-case DNS label, so every tenant name also works as a subdomain
+TENANT_NAME = re.compile(r'^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$')
+
+TENANT_REQUESTS = metrics.registry.counter(
+    'academia_tenant_requests_total', 'Requests served per tenant', ('tenant', 'status')
+)
+TENANT_REQUEST_DURATION = metrics.registry.histogram(
+    'academia_tenant_request_duration_seconds', 'Request latency per tenant', ('tenant',)
+)
+TENANT_SQL_QUERIES = metrics.registry.counter(
+    'academia_tenant_sql_queries_total', 'SQL queries issued per tenant', ('tenant',)
+)
+TENANT_REJECTED = metrics.registry.counter(
+    'academia_tenant_rejected_total', 'Requests turned away because their tenant was at its concurrency cap',
+    ('tenant',)
+)
+TENANT_IN_FLIGHT = metrics.registry.gauge('academia_tenant_in_flight', 'Requests in progress per tenant', ('tenant',))
+TENANT_HANDLES = metrics.registry.gauge('academia_tenant_handles_open', 'Tenant handles open in this worker')
+TENANT_EVICTIONS = metrics.registry.counter(
+    'academia_tenant_evictions_total', 'Tenant handles closed, by reason', ('reason',)
+)
+
+_current = contextvars.ContextVar('academia_tenant', default=None)
+
+
+class UnknownTenant(Exception):
+    """Raised when a request names no tenant, an invalid one, or one without a database."""
+
+
+class TenantBusy(Exception):
+    """Raised when a tenant's concurrent request cap stays full for the whole wait."""
+
+
+def tenant_from_host(host, base_domain):
+    """Return the subdomain label of ``host`` directly under ``base_domain``, or None."""
+    if not host or not base_domain:
+        return None
+    host = host.split(':', 1)[0].lower()
+    suffix = '.' + base_domain.lower().strip('.')
+    if not host.endswith(suffix):
+        return None
+    label = host[:-len(suffix)]
+    return label if label and '.' not in label else None
+
+
+def resolve_name(header_value, host, claim, base_domain):
+    """Return the tenant named by a request: the header, else the subdomain, else the token claim."""
+    for candidate in (header_value, tenant_from_host(host, base_domain), claim):
+        if not candidate:
+            continue
+        name = candidate.strip().lower()
+        if not TENANT_NAME.match(name):
+            raise UnknownTenant(f'Invalid institution name: {candidate!r}')
+        return name
+    return None
+
+
+def active():
+    """Return the handle of the tenant active in this context, or None."""
+    return _current.get()
+
+
+def record_request(name, status, seconds, sql_queries):
+    TENANT_REQUESTS.inc(name, f'{status // 100}xx')
+    TENANT_REQUEST_DURATION.observe(seconds, name)
+    TENANT_SQL_QUERIES.inc(name, amount=sql_queries)
+
+
+class PooledConnection(metrics.InstrumentedConnection):
+    """Instrumented connection that goes back to its pool when closed."""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+
+class ConnectionPool:
+    """Keeps up to ``size`` idle connections to one database for reuse."""
+
+    def __init__(self, db_path, size):
+        self.db_path = db_path
+        self.size = size
+        self._idle = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def connect(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        # Pooled connections move between request threads, one at a time
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False)
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        # Whatever the borrower left uncommitted is discarded, as closing would
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if any(idle is conn for idle in self._idle):
+                return
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.pool = None
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.pool = None
+            conn.close()
+
+
+class TenantHandle:
+    """One open tenant: its database pool, request slots and services."""
+
+    def __init__(self, name, db_path, pool_size, max_concurrent):
+        self.name = name
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.services = {}
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def connect(self):
+        return self.pool.connect()
+
+    def close(self):
+        self.pool.close()
+
+
+class TenantRegistry:
+    """Opens tenant handles on demand and keeps at most ``max_open`` of them.
+
+    ``open_services(handle)`` runs while the new handle is active, so it can
+    prepare the tenant's schema through the handle's pool, and returns the
+    dict stored as ``handle.services``. ``busy(handle)`` may report handles
+    that must stay open although no request is in flight, such as ones with
+    live event streams.
+
+    Without ``db_dir`` there is a single tenant, DEFAULT, at ``default_path``.
+    """
+
+    def __init__(self, open_services, db_dir=None, default_path=None, max_open=256, idle_seconds=600,
+                 pool_size=4, max_concurrent=8, create_missing=False, busy=None):
+        self.open_services = open_services
+        self.db_dir = Path(db_dir) if db_dir else None
+        self.default_path = default_path
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.pool_size = pool_size
+        self.max_concurrent = max_concurrent
+        self.create_missing = create_missing
+        self.busy = busy or (lambda handle: False)
+        self._handles = OrderedDict()
+        self._opening = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        if name == DEFAULT and self.default_path:
+            return Path(self.default_path)
+        if self.db_dir is None or not TENANT_NAME.match(name):
+            raise UnknownTenant(f'Unknown institution: {name}')
+        return self.db_dir / f'{name}.db'
+
+    def names(self):
+        """Return every tenant with a database, whether open or not."""
+        names = [DEFAULT] if self.default_path else []
+        if self.db_dir is not None and self.db_dir.is_dir():
+            names.extend(sorted(path.stem for path in self.db_dir.glob('*.db') if TENANT_NAME.match(path.stem)))
+        return names
+
+    def open_names(self):
+        """Return the tenants with a handle open in this worker."""
+        with self._lock:
+            return list(self._handles)
+
+    def get(self, name):
+        """Return the open handle of ``name``, opening it (and evicting others) if needed."""
+        with self._lock:
+            handle = self._handles.get(name)
+            if handle is not None:
+                self._handles.move_to_end(name)
+                handle.last_used = time.monotonic()
+                return handle
+            opening = self._opening.setdefault(name, threading.Lock())
+
+        # Opening runs schema checks, so it holds only this tenant's lock
+        with opening:
+            with self._lock:
+                handle = self._handles.get(name)
+            if handle is None:
+                handle = self._open(name)
+        self._evict()
+        return handle
+
+    def _open(self, name):
+        path = self.path(name)
+        if not path.exists():
+            # The single-tenant database is created on first start, as it always was
+            if not self.create_missing and self.db_dir is not None:
+                raise UnknownTenant(f'Unknown institution: {name}')
+            path.parent.mkdir(parents=True, exist_ok=True)
+        handle = TenantHandle(name, str(path), self.pool_size, self.max_concurrent)
+        try:
+            with self.activate(handle, limit=False):
+                handle.services = self.open_services(handle)
+        except Exception:
+            handle.close()
+            raise
+        with self._lock:
+            self._handles[name] = handle
+            self._opening.pop(name, None)
+            TENANT_HANDLES.set(value=len(self._handles))
+        logger.info('Opened tenant %s at %s', name, path)
+        return handle
+
+    def _evict(self):
+        """Close handles idle for ``idle_seconds``, then the least recently used beyond ``max_open``."""
+        now = time.monotonic()
+        closed = []
+        with self._lock:
+            for name, handle in list(self._handles.items()):
+                over_capacity = len(self._handles) > self.max_open
+                idle_too_long = now - handle.last_used > self.idle_seconds
+                if not over_capacity and not idle_too_long:
+                    # Oldest first, so the rest are newer still
+                    break
+                if handle.in_flight or self.busy(handle):
+                    continue
+                del self._handles[name]
+                closed.append((handle, 'capacity' if over_capacity else 'idle'))
+            TENANT_HANDLES.set(value=len(self._handles))
+        for handle, reason in closed:
+            handle.close()
+            TENANT_EVICTIONS.inc(reason)
+            logger.info('Closed tenant %s (%s)', handle.name, reason)
+
+    def current(self):
+        """Return the active tenant's handle; single-tenant deployments fall back to DEFAULT."""
+        handle = _current.get()
+        if handle is not None:
+            return handle
+        if self.db_dir is None:
+            return self.get(DEFAULT)
+        raise RuntimeError('No tenant is active in this context')
+
+    def enter(self, handle, wait=None, limit=True):
+        """Make ``handle`` the active tenant, taking one of its request slots.
+
+        Raises TenantBusy when no slot frees up within ``wait`` seconds.
+        Returns a token for leave().
+        """
+        if limit and not handle._slots.acquire(timeout=wait):
+            TENANT_REJECTED.inc(handle.name)
+            raise TenantBusy(f'Institution {handle.name} is busy, please retry')
+        with handle._lock:
+            handle.in_flight += 1
+            TENANT_IN_FLIGHT.set(handle.name, value=handle.in_flight)
+        return handle, limit, _current.set(handle)
+
+    def leave(self, token):
+        handle, limit, context_token = token
+        _current.reset(context_token)
+        with handle._lock:
+            handle.in_flight -= 1
+            handle.last_used = time.monotonic()
+            TENANT_IN_FLIGHT.set(handle.name, value=handle.in_flight)
+        if limit:
+            handle._slots.release()
+
+    @contextmanager
+    def activate(self, handle, wait=None, limit=True):
+        token = self.enter(handle, wait, limit)
+        try:
+            yield handle
+        finally:
+            self.leave(token)
+
+    def run_each(self, job, names=None):
+        """Run ``job(handle)`` with each tenant active in turn, every tenant by default.
+
+        One tenant failing does not stop the rest. Returns the results of
+        the tenants it succeeded for, by name.
+        """
+        results = {}
+        for name in self.names() if names is None else names:
+            try:
+                with self.activate(self.get(name), limit=False) as handle:
+                    results[name] = job(handle)
+            except Exception:
+                logger.exception('Scheduled job %s failed for tenant %s', getattr(job, '__name__', job), name)
+        return results
+
+    def start_scheduler(self, job, interval):
+        """Run ``job`` for every tenant every ``interval`` seconds on a daemon thread."""
+        def loop():
+            while True:
+                self.run_each(job)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name=f'tenant-scheduler-{job.__name__}', daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    # Add the backend directory to Python path
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from config.config import TENANT_DB_DIR
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--dir', type=Path, default=TENANT_DB_DIR, help='Directory holding tenant databases')
+    parser = argparse.ArgumentParser(description='Manage Academia AI institution databases')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    create = subparsers.add_parser('create', parents=[common],
+                                   help='Create an empty database; its schema is built on first request')
+    create.add_argument('name', help='Tenant name, also usable as its subdomain')
+    subparsers.add_parser('list', parents=[common], help='List tenants with a database')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for path in sorted(args.dir.glob('*.db')):
+            print(path.stem)
+        return
+
+    if not TENANT_NAME.match(args.name):
+        parser.error('Tenant names are lower-case letters, digits and hyphens, up to 63 characters')
+    path = args.dir / f'{args.name}.db'
+    if path.exists():
+        parser.error(f'{path} already exists')
+    args.dir.mkdir(parents=True, exist_ok=True)
+    sqlite3.connect(path).close()
+    print(f'Created {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Academic terms for Academia AI Backend
+A term starts on the first day of one of the configured start months and
+runs until the next one begins.
+"""
+
+from datetime import date
+
+
+def _validate(start_months):
+    months = sorted(set(start_months))
+    if not months or not all(1 <= month <= 12 for month in months):
+        raise ValueError(f'Invalid term start months: {start_months!r}')
+    return months
+
+
+def term_start(day, start_months):
+    """Return the first day of the term containing ``day``."""
+    months = _validate(start_months)
+    earlier = [month for month in months if month <= day.month]
+    if earlier:
+        return date(day.year, earlier[-1], 1)
+    return date(day.year - 1, months[-1], 1)
+
+
+def next_term_start(start, start_months):
+    """Return the first day of the term after the one starting on ``start``."""
+    months = _validate(start_months)
+    later = [month for month in months if month > start.month]
+    if later:
+        return date(start.year, later[0], 1)
+    return date(start.year + 1, months[0], 1)
+
+
+def previous_term_start(start, start_months):
+    """Return the first day of the term before the one starting on ``start``."""
+    months = _validate(start_months)
+    earlier = [month for month in months if month < start.month]
+    if earlier:
+        return date(start.year, earlier[-1], 1)
+    return date(start.year - 1, months[-1], 1)
+
+
+def terms_back(day, count, start_months):
+    """Return the first day of the term ``count`` terms before the one containing ``day``."""
+    start = term_start(day, start_months)
+    for _ in range(count):
+        start = previous_term_start(start, start_months)
+    return start
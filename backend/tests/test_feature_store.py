@@ -0,0 +1,63 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+import feature_store
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    feature_store.init_feature_tables(conn.cursor())
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def features(conn, student_id, version=None):
+    return feature_store.to_records(feature_store.read_features(conn, version, [student_id]))[0]
+
+
+FULL = {'id': 1, 'test_scores': 70, 'study_hours': 10, 'parental_support': 'High', 'activities': 'Yes'}
+
+
+def test_partial_load_keeps_other_features(conn):
+    feature_store.bulk_load(conn, [FULL])
+    feature_store.bulk_load(conn, [{'id': 1, 'test_scores': 90}])
+    assert features(conn, 1) == {'test_scores': 90.0, 'study_hours': 10.0, 'parental_support': 2.0, 'activities': 1.0}
+
+
+def test_blank_values_keep_previous(conn):
+    feature_store.bulk_load(conn, [FULL])
+    feature_store.bulk_load(conn, [{'id': 1, 'test_scores': '', 'study_hours': '12', 'parental_support': '',
+                                    'activities': ''}])
+    assert features(conn, 1) == {'test_scores': 70.0, 'study_hours': 12.0, 'parental_support': 2.0, 'activities': 1.0}
+
+
+def test_clear_is_explicit(conn):
+    feature_store.bulk_load(conn, [FULL])
+    feature_store.bulk_load(conn, [{'id': 1, 'clear': 'study_hours, activities'}])
+    assert features(conn, 1) == {'test_scores': 70.0, 'study_hours': None, 'parental_support': 2.0, 'activities': None}
+
+
+def test_clear_rejects_unknown_or_conflicting_features(conn):
+    with pytest.raises(feature_store.InvalidFeatures):
+        feature_store.bulk_load(conn, [{'id': 1, 'clear': ['grade']}])
+    with pytest.raises(feature_store.InvalidFeatures):
+        feature_store.bulk_load(conn, [{'id': 1, 'test_scores': 50, 'clear': ['test_scores']}])
+
+
+def test_later_records_merge_over_earlier_ones(conn):
+    feature_store.bulk_load(conn, [{'id': 1, 'test_scores': 60}, {'id': 1, 'study_hours': 5}])
+    assert features(conn, 1)['test_scores'] == 60.0
+    assert features(conn, 1)['study_hours'] == 5.0
+
+
+def test_rebuilt_matrix_matches_merged_rows(conn):
+    feature_store.bulk_load(conn, [FULL])
+    version = feature_store.bulk_load(conn, [{'id': 1, 'test_scores': 90}])
+    stored = feature_store.read_features(conn, version).values
+    conn.execute('DELETE FROM feature_matrices')
+    conn.commit()
+    assert np.array_equal(feature_store.read_features(conn, version).values, stored, equal_nan=True)
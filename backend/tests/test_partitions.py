@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+import pytest
+
+import partitions
+
+TERM_START_MONTHS = [1, 8]
+
+# Three terms: spring 2023, autumn 2023 and spring 2024
+LEGACY_ROWS = [
+    (1, 10, 1, '2023-01-09', 'present', 7),
+    (2, 11, 1, '2023-07-31', 'absent', 7),
+    (5, 10, 2, '2023-08-01', 'late', 8),
+    (9, 12, None, '2023-12-31', 'present', None),
+    (14, 11, 2, '2024-01-01', 'absent', 8),
+    (15, 10, 1, '2024-03-15', 'present', 7),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            course_id INTEGER,
+            date DATE NOT NULL,
+            status TEXT NOT NULL,
+            marked_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.executemany('''
+        INSERT INTO attendance (id, student_id, course_id, date, status, marked_by) VALUES (?, ?, ?, ?, ?, ?)
+    ''', LEGACY_ROWS)
+    partitions.init_partition_tables(cursor)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def all_rows(conn, source):
+    return conn.execute(f'''
+        SELECT id, student_id, course_id, date, status, marked_by, created_at FROM {source} ORDER BY id
+    ''').fetchall()
+
+
+def test_migration_keeps_every_row_and_id(db_path):
+    conn = sqlite3.connect(db_path)
+    before = all_rows(conn, 'attendance')
+
+    assert partitions.migrate_legacy_table(conn, TERM_START_MONTHS) == len(LEGACY_ROWS)
+
+    assert all_rows(conn, partitions.VIEW) == before
+    assert partitions.tables(conn) == ['attendance_2023_01', 'attendance_2023_08', 'attendance_2024_01']
+    counts = [conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in partitions.tables(conn)]
+    assert counts == [2, 2, 2]
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'attendance'").fetchone() is None
+    assert partitions.migrate_legacy_table(conn, TERM_START_MONTHS) is None
+    conn.close()
+
+
+def test_concurrent_migrations_move_rows_once(db_path):
+    barrier = threading.Barrier(2)
+    results = []
+
+    def migrate():
+        conn = sqlite3.connect(db_path, timeout=30)
+        barrier.wait()
+        results.append(partitions.migrate_legacy_table(conn, TERM_START_MONTHS))
+        conn.close()
+
+    workers = [threading.Thread(target=migrate) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(results, key=lambda result: result is not None) == [None, len(LEGACY_ROWS)]
+    conn = sqlite3.connect(db_path)
+    assert [row[0] for row in all_rows(conn, partitions.VIEW)] == [row[0] for row in LEGACY_ROWS]
+    conn.close()
+
+
+def test_second_caller_waiting_on_the_lock_gets_none(db_path):
+    first = sqlite3.connect(db_path)
+    second = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    results = []
+
+    def migrate():
+        results.append(partitions.migrate_legacy_table(second, TERM_START_MONTHS))
+
+    # The first worker holds the write lock, so the second sees the old table and waits behind it
+    first.execute('BEGIN IMMEDIATE')
+    waiting = threading.Thread(target=migrate)
+    waiting.start()
+    waiting.join(0.2)
+    assert waiting.is_alive()
+    # By now the waiting call's busy handler sleeps for tens of milliseconds between tries
+    first.rollback()
+    assert partitions.migrate_legacy_table(first, TERM_START_MONTHS) == len(LEGACY_ROWS)
+    waiting.join()
+    assert results == [None]
+    first.close()
+    second.close()
@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+import sessions
+
+TTL_SECONDS = 3600
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT NOT NULL)')
+    cursor.execute("INSERT INTO users (id, email) VALUES (1, 'ada@academia.edu')")
+    sessions.init_session_tables(cursor)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+def revoked_at(conn, session_id):
+    return conn.execute('SELECT revoked_at FROM sessions WHERE id = ?', (session_id,)).fetchone()[0]
+
+
+def test_rotation_issues_a_new_token(conn):
+    session_id, first = sessions.create_session(conn, 1, TTL_SECONDS)
+    rotated_id, user_id, email, second = sessions.rotate_session(conn, first, TTL_SECONDS)
+    assert (rotated_id, user_id, email) == (session_id, 1, 'ada@academia.edu')
+    assert second != first
+    assert sessions.rotate_session(conn, second, TTL_SECONDS)[0] == session_id
+
+
+def test_reusing_a_rotated_token_revokes_the_session(conn):
+    session_id, first = sessions.create_session(conn, 1, TTL_SECONDS)
+    second = sessions.rotate_session(conn, first, TTL_SECONDS)[3]
+
+    with pytest.raises(sessions.InvalidRefreshToken, match='already used'):
+        sessions.rotate_session(conn, first, TTL_SECONDS)
+    assert revoked_at(conn, session_id) is not None
+    # The token that replaced it is useless too, so whoever copied the old one is signed out
+    with pytest.raises(sessions.InvalidRefreshToken, match='ended'):
+        sessions.rotate_session(conn, second, TTL_SECONDS)
+
+
+def test_guessed_secret_is_refused_without_revoking(conn):
+    session_id, token = sessions.create_session(conn, 1, TTL_SECONDS)
+    with pytest.raises(sessions.InvalidRefreshToken, match='Invalid'):
+        sessions.rotate_session(conn, f'{session_id}.guess', TTL_SECONDS)
+    assert revoked_at(conn, session_id) is None
+    assert sessions.rotate_session(conn, token, TTL_SECONDS)[0] == session_id
+
+
+def test_revocation_list_picks_up_reuse_revocation(db_path, conn):
+    revocations = sessions.RevocationList(access_ttl=900, sync_interval=0)
+    session_id, first = sessions.create_session(conn, 1, TTL_SECONDS)
+    sessions.rotate_session(conn, first, TTL_SECONDS)
+    assert not revocations.is_revoked(session_id, lambda: sqlite3.connect(db_path))
+
+    with pytest.raises(sessions.InvalidRefreshToken):
+        sessions.rotate_session(conn, first, TTL_SECONDS)
+    assert revocations.is_revoked(session_id, lambda: sqlite3.connect(db_path))
@@ -0,0 +1,105 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+import analytics
+import partitions
+import rollcall
+import sync
+
+TERM_START_MONTHS = [1, 8]
+WINDOW_DAYS = 30
+TODAY = date.today().isoformat()
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT NOT NULL, student_id TEXT UNIQUE)')
+    cursor.execute('CREATE TABLE courses (id INTEGER PRIMARY KEY)')
+    cursor.executemany('INSERT INTO students (id, name, student_id) VALUES (?, ?, ?)',
+                       [(1, 'Ada', 'S1'), (2, 'Ben', 'S2'), (3, 'Cy', 'S3')])
+    cursor.execute('INSERT INTO courses (id) VALUES (1)')
+    partitions.init_partition_tables(cursor)
+    analytics.init_rollup_tables(cursor)
+    rollcall.init_roll_call_tables(cursor)
+    sync.init_sync_tables(cursor)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def op(op_id, status, client_ts, student='S1'):
+    return {'op_id': op_id, 'student_id': student, 'course_id': 1, 'date': TODAY, 'status': status,
+            'client_ts': client_ts}
+
+
+def apply(conn, *ops, client_id='tablet'):
+    return sync.apply(conn, client_id, list(ops), 1, TERM_START_MONTHS, WINDOW_DAYS)
+
+
+def stored_status(conn, student_id=1):
+    table = partitions.partition_for(conn, TODAY, TERM_START_MONTHS)
+    return conn.execute(f'SELECT status FROM {table} WHERE student_id = ? AND course_id = 1 AND date = ?',
+                        (student_id, TODAY)).fetchone()[0]
+
+
+def clock(conn, student_id=1):
+    return conn.execute('SELECT seq, status, stamp FROM attendance_clock WHERE student_id = ?',
+                        (student_id,)).fetchone()
+
+
+def test_mark_taken_earlier_is_stale(conn):
+    apply(conn, op('a', 'absent', 200))
+    results, changes = apply(conn, op('b', 'present', 100), client_id='phone')
+    assert results == {'b': ('stale', None)}
+    assert changes == []
+    assert stored_status(conn) == 'absent'
+    assert clock(conn)[1:] == ('absent', 200)
+
+
+def test_replayed_op_gets_its_first_outcome(conn):
+    apply(conn, op('a', 'absent', 200))
+    apply(conn, op('b', 'present', 100))
+    # Sent again with a later stamp, the ops are still not applied a second time
+    results, changes = apply(conn, op('a', 'late', 300), op('b', 'present', 400))
+    assert results == {'a': ('applied', None), 'b': ('stale', None)}
+    assert changes == []
+    assert stored_status(conn) == 'absent'
+    assert conn.execute('SELECT COUNT(*) FROM sync_ops').fetchone()[0] == 2
+
+
+def test_same_status_only_moves_the_stamp(conn):
+    apply(conn, op('a', 'present', 100))
+    seq = clock(conn)[0]
+    token, _, _ = sync.changes_since(conn, 0)
+
+    results, changes = apply(conn, op('b', 'present', 200), client_id='phone')
+    assert results == {'b': ('applied', None)}
+    assert changes == []
+    assert clock(conn) == (seq, 'present', 200)
+    assert sync.changes_since(conn, token) == (token, [], False)
+    # The later stamp still wins against a mark taken in between
+    assert apply(conn, op('c', 'absent', 150))[0] == {'c': ('stale', None)}
+
+
+def test_changes_since_pages_through_the_delta(conn):
+    apply(conn, op('a', 'present', 100, 'S1'), op('b', 'absent', 200, 'S2'), op('c', 'late', 300, 'S3'))
+
+    token, changes, more = sync.changes_since(conn, 0, limit=2)
+    assert more
+    assert [change['student_id'] for change in changes] == ['S1', 'S2']
+
+    token, changes, more = sync.changes_since(conn, token, limit=2)
+    assert not more
+    assert [(change['student_id'], change['status']) for change in changes] == [('S3', 'late')]
+    assert sync.changes_since(conn, token, limit=2) == (token, [], False)
+
+
+def test_changes_since_leaves_out_the_clients_own_marks(conn):
+    apply(conn, op('a', 'present', 100, 'S1'))
+    apply(conn, op('b', 'absent', 200, 'S2'), client_id='phone')
+    _, changes, _ = sync.changes_since(conn, 0, client_id='tablet')
+    assert [change['student_id'] for change in changes] == ['S2']
@@ -1,726 +1,31 @@
 #!/usr/bin/env python3
+"""
+Academia AI page and theme fixer.
+
+Applies idempotent transformations to the frontend pages; global.js is
+maintained by hand and left alone. Inputs are content-hashed so unchanged
+files are skipped, pages are edited through html.parser tag positions instead
+of backtracking regexes, work runs in parallel, and --dry-run prints a
+unified diff instead of writing.
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
 import os
-import re
-
-def fix_theme_functionality():
-    """Fix the dark/light theme functionality in global.js."""
-    
-    print("🎨 Fixing theme functionality...")
-    
-    # Enhanced theme functionality
-    theme_js = '''// Global Application State
-let currentUser = null;
-let currentTheme = 'light';
-let isUserDropdownOpen = false;
-
-// Default user data
-const defaultUser = {
-    name: "John Doe",
-    email: "admin@university.edu",
-    role: "admin",
-    avatar: "J"
-};
-
-// Initialize global functionality
-document.addEventListener('DOMContentLoaded', function () {
-    console.log('Initializing Academia AI global components...');
-
-    // Initialize user
-    currentUser = JSON.parse(localStorage.getItem('currentUser')) || defaultUser;
-
-    // Initialize theme
-    initializeTheme();
-
-    // Initialize global components
-    initializeGlobalComponents();
-
-    // Set active navigation based on current page
-    setActiveNavigation();
-
-    // Initialize page-specific functionality
-    initializePageSpecificFeatures();
-
-    console.log('Global components initialized successfully');
-});
-
-// Enhanced Theme Management
-function initializeTheme() {
-    const prefersDark = window.matchMedia('(prefers-color-scheme: dark)').matches;
-    currentTheme = sessionStorage.getItem('theme') || (prefersDark ? 'dark' : 'light');
-    applyTheme(currentTheme);
-}
-
-function applyTheme(theme) {
-    console.log('Applying theme:', theme);
-    currentTheme = theme;
-    document.body.setAttribute('data-color-scheme', theme);
-    sessionStorage.setItem('theme', theme);
-
-    // Update theme icon
-    updateThemeIcon();
-
-    // Update CSS variables for theme
-    updateThemeColors();
-
-    // Update component colors
-    updateComponentColors();
-}
-
-function toggleTheme() {
-    console.log('Toggling theme from:', currentTheme);
-    const newTheme = currentTheme === 'light' ? 'dark' : 'light';
-    applyTheme(newTheme);
-    
-    // Show toast notification
-    showToast(`Switched to ${newTheme} mode`, 'success');
-}
-
-function updateThemeIcon() {
-    const themeIcons = document.querySelectorAll('.theme-icon');
-    themeIcons.forEach(icon => {
-        icon.textContent = currentTheme === 'light' ? '🌙' : '☀️';
-    });
-}
-
-function updateThemeColors() {
-    const root = document.documentElement;
-    if (currentTheme === 'dark') {
-        // Dark mode colors
-        root.style.setProperty('--color-background', '#1a1a1a');
-        root.style.setProperty('--color-surface', '#2d2d2d');
-        root.style.setProperty('--color-text', '#ffffff');
-        root.style.setProperty('--color-text-secondary', '#b0b0b0');
-        root.style.setProperty('--color-border', 'rgba(255, 255, 255, 0.1)');
-
-        // Update specific component colors for dark mode
-        root.style.setProperty('--primary-blue', '#4a90e2');
-        root.style.setProperty('--primary-blue-light', '#5ba0f2');
-        root.style.setProperty('--primary-blue-dark', '#357abd');
-        root.style.setProperty('--accent-green', '#4caf50');
-        root.style.setProperty('--accent-red', '#f44336');
-        root.style.setProperty('--accent-orange', '#ff9800');
-        root.style.setProperty('--accent-purple', '#9c27b0');
-        root.style.setProperty('--accent-teal', '#009688');
-        root.style.setProperty('--accent-cyan', '#00bcd4');
-        root.style.setProperty('--gray-50', '#2d2d2d');
-        root.style.setProperty('--gray-100', '#3d3d3d');
-        root.style.setProperty('--gray-200', '#4d4d4d');
-        root.style.setProperty('--gray-300', '#5d5d5d');
-        root.style.setProperty('--gray-400', '#6d6d6d');
-        root.style.setProperty('--gray-500', '#7d7d7d');
-        root.style.setProperty('--gray-600', '#8d8d8d');
-        root.style.setProperty('--gray-700', '#9d9d9d');
-        root.style.setProperty('--gray-800', '#adadad');
-        root.style.setProperty('--gray-900', '#bdbdbd');
-        root.style.setProperty('--brand-dark-blue', '#4a90e2');
-        root.style.setProperty('--brand-light-blue', '#5ba0f2');
-
-        // Update body background
-        document.body.style.backgroundColor = '#1a1a1a';
-    } else {
-        // Light mode colors - reset to defaults
-        root.style.removeProperty('--color-background');
-        root.style.removeProperty('--color-surface');
-        root.style.removeProperty('--color-text');
-        root.style.removeProperty('--color-text-secondary');
-        root.style.removeProperty('--color-border');
-        root.style.removeProperty('--primary-blue');
-        root.style.removeProperty('--primary-blue-light');
-        root.style.removeProperty('--primary-blue-dark');
-        root.style.removeProperty('--accent-green');
-        root.style.removeProperty('--accent-red');
-        root.style.removeProperty('--accent-orange');
-        root.style.removeProperty('--accent-purple');
-        root.style.removeProperty('--accent-teal');
-        root.style.removeProperty('--accent-cyan');
-        root.style.removeProperty('--gray-50');
-        root.style.removeProperty('--gray-100');
-        root.style.removeProperty('--gray-200');
-        root.style.removeProperty('--gray-300');
-        root.style.removeProperty('--gray-400');
-        root.style.removeProperty('--gray-500');
-        root.style.removeProperty('--gray-600');
-        root.style.removeProperty('--gray-700');
-        root.style.removeProperty('--gray-800');
-        root.style.removeProperty('--gray-900');
-        root.style.removeProperty('--brand-dark-blue');
-        root.style.removeProperty('--brand-light-blue');
-
-        // Reset body background
-        document.body.style.backgroundColor = '';
-    }
-}
-
-function updateComponentColors() {
-    // Update specific component styles for theme
-    const cards = document.querySelectorAll('.dashboard-card, .card');
-    const buttons = document.querySelectorAll('.btn');
-    const navItems = document.querySelectorAll('.nav-item');
-    const inputs = document.querySelectorAll('input, select, textarea');
-    const forms = document.querySelectorAll('form');
-    
-    if (currentTheme === 'dark') {
-        cards.forEach(card => {
-            card.style.backgroundColor = 'var(--color-surface)';
-            card.style.color = 'var(--color-text)';
-        });
-        
-        buttons.forEach(btn => {
-            if (!btn.classList.contains('btn--primary') && !btn.classList.contains('btn--secondary')) {
-                btn.style.backgroundColor = 'var(--color-surface)';
-                btn.style.color = 'var(--color-text)';
-            }
-        });
-        
-        navItems.forEach(item => {
-            item.style.color = 'var(--color-text)';
-        });
-        
-        inputs.forEach(input => {
-            input.style.backgroundColor = 'var(--color-surface)';
-            input.style.color = 'var(--color-text)';
-            input.style.borderColor = 'var(--color-border)';
-        });
-        
-        forms.forEach(form => {
-            form.style.color = 'var(--color-text)';
-        });
-    } else {
-        cards.forEach(card => {
-            card.style.backgroundColor = '';
-            card.style.color = '';
-        });
-        
-        buttons.forEach(btn => {
-            if (!btn.classList.contains('btn--primary') && !btn.classList.contains('btn--secondary')) {
-                btn.style.backgroundColor = '';
-                btn.style.color = '';
-            }
-        });
-        
-        navItems.forEach(item => {
-            item.style.color = '';
-        });
-        
-        inputs.forEach(input => {
-            input.style.backgroundColor = '';
-            input.style.color = '';
-            input.style.borderColor = '';
-        });
-        
-        forms.forEach(form => {
-            form.style.color = '';
-        });
-    }
-}
-
-// Global Components Initialization
-function initializeGlobalComponents() {
-    initializeHeader();
-    initializeSidebar();
-    initializeUserMenu();
-    initializeThemeToggle();
-    initializeSearchBar();
-    initializeNotifications();
-}
-
-function initializeHeader() {
-    console.log('Initializing header components...');
-    updateUserInterface();
-}
-
-function initializeSidebar() {
-    console.log('Initializing sidebar components...');
-    // Sidebar is already structured in HTML
-}
-
-function initializeUserMenu() {
-    console.log('Initializing user menu...');
-    const userMenuToggle = document.getElementById('userMenuToggle');
-    const userDropdown = document.getElementById('userDropdown');
-    
-    if (userMenuToggle && userDropdown) {
-        userMenuToggle.addEventListener('click', toggleUserDropdown);
-        
-        // Close dropdown when clicking outside
-        document.addEventListener('click', function(event) {
-            if (!userMenuToggle.contains(event.target) && !userDropdown.contains(event.target)) {
-                closeUserDropdown();
-            }
-        });
-        
-        // Initialize dropdown items
-        initializeDropdownItems();
-    }
-}
-
-function toggleUserDropdown() {
-    const userDropdown = document.getElementById('userDropdown');
-    const userMenuToggle = document.getElementById('userMenuToggle');
-    
-    if (userDropdown && userMenuToggle) {
-        isUserDropdownOpen = !isUserDropdownOpen;
-        
-        if (isUserDropdownOpen) {
-            userDropdown.classList.remove('hidden');
-            userMenuToggle.classList.add('active');
-        } else {
-            userDropdown.classList.add('hidden');
-            userMenuToggle.classList.remove('active');
-        }
-    }
-}
-
-function closeUserDropdown() {
-    const userDropdown = document.getElementById('userDropdown');
-    const userMenuToggle = document.getElementById('userMenuToggle');
-    
-    if (userDropdown && userMenuToggle) {
-        userDropdown.classList.add('hidden');
-        userMenuToggle.classList.remove('active');
-        isUserDropdownOpen = false;
-    }
-}
-
-function initializeDropdownItems() {
-    // Profile button
-    const profileBtn = document.getElementById('profileBtn');
-    if (profileBtn) {
-        profileBtn.addEventListener('click', function(e) {
-            e.preventDefault();
-            showToast('Profile settings clicked', 'info');
-            // Add profile functionality here
-        });
-    }
-    
-    // Settings button
-    const settingsBtn = document.getElementById('settingsBtn');
-    if (settingsBtn) {
-        settingsBtn.addEventListener('click', function(e) {
-            e.preventDefault();
-            showToast('Dashboard settings clicked', 'info');
-            // Add settings functionality here
-        });
-    }
-    
-    // Logout button
-    const logoutBtn = document.getElementById('logoutBtn');
-    if (logoutBtn) {
-        logoutBtn.addEventListener('click', function(e) {
-            e.preventDefault();
-            handleSignOut();
-        });
-    }
-}
-
-function handleSignOut() {
-    showToast('Signing out...', 'info');
-    
-    // Clear user data
-    localStorage.removeItem('currentUser');
-    localStorage.removeItem('isLoggedIn');
-    sessionStorage.removeItem('isLoggedIn');
-    
-    // Redirect to login page
-    setTimeout(() => {
-        window.location.href = 'login.html';
-    }, 1000);
-}
-
-function initializeThemeToggle() {
-    console.log('Initializing theme toggle...');
-    const themeToggle = document.getElementById('themeToggle');
-    
-    if (themeToggle) {
-        themeToggle.addEventListener('click', toggleTheme);
-    }
-}
-
-function updateUserInterface() {
-    // Update user information in header
-    const userAvatar = document.getElementById('userAvatar');
-    const userName = document.getElementById('userName');
-    const userDisplayName = document.getElementById('userDisplayName');
-    const userEmail = document.getElementById('userEmail');
-    
-    if (currentUser) {
-        if (userAvatar) userAvatar.textContent = currentUser.avatar;
-        if (userName) userName.textContent = currentUser.name;
-        if (userDisplayName) userDisplayName.textContent = currentUser.name;
-        if (userEmail) userEmail.textContent = currentUser.email;
-    }
-}
-
-function initializeSearchBar() {
-    console.log('Initializing search bar...');
-    const searchInput = document.querySelector('.search-bar input');
-    
-    if (searchInput) {
-        searchInput.addEventListener('input', function(e) {
-            const searchTerm = e.target.value;
-            if (searchTerm.length > 2) {
-                // Add search functionality here
-                console.log('Searching for:', searchTerm);
-            }
-        });
-    }
-}
-
-function initializeNotifications() {
-    console.log('Initializing notifications...');
-    const notificationBell = document.querySelector('.notifications');
-    
-    if (notificationBell) {
-        notificationBell.addEventListener('click', function() {
-            showToast('Notifications clicked', 'info');
-            // Add notification functionality here
-        });
-    }
-}
-
-function setActiveNavigation() {
-    console.log('Setting active navigation...');
-    const currentPage = window.location.pathname.split('/').pop() || 'dashboard.html';
-    
-    // Remove active class from all nav items
-    const navItems = document.querySelectorAll('.nav-item');
-    navItems.forEach(item => item.classList.remove('active'));
-    
-    // Add active class to current page
-    const currentNavItem = document.querySelector(`[href="${currentPage}"]`);
-    if (currentNavItem) {
-        currentNavItem.classList.add('active');
-    }
-}
-
-// Toast Notifications
-function showToast(message, type = 'info') {
-    console.log(`Toast: ${message} (${type})`);
-    
-    // Create toast container if it doesn't exist
-    let toastContainer = document.getElementById('toastContainer');
-    if (!toastContainer) {
-        toastContainer = createToastContainer();
-    }
-    
-    // Create toast element
-    const toast = document.createElement('div');
-    toast.className = `toast toast--${type}`;
-    toast.innerHTML = `
-        <div class="toast-content">
-            <span class="toast-message">${message}</span>
-            <button class="toast-close" onclick="this.parentElement.parentElement.remove()">×</button>
-        </div>
-    `;
-    
-    // Add to container
-    toastContainer.appendChild(toast);
-    
-    // Auto remove after 5 seconds
-    setTimeout(() => {
-        if (toast.parentElement) {
-            toast.remove();
-        }
-    }, 5000);
-}
-
-function createToastContainer() {
-    const container = document.createElement('div');
-    container.id = 'toastContainer';
-    container.className = 'toast-container';
-    document.body.appendChild(container);
-    return container;
-}
-
-// Page-specific functionality
-function initializePageSpecificFeatures() {
-    const currentPage = window.location.pathname.split('/').pop() || 'dashboard.html';
-    
-    switch (currentPage) {
-        case 'prediction.html':
-            initializePredictionPage();
-            break;
-        case 'analytics.html':
-            initializeAnalyticsPage();
-            break;
-        case 'graph.html':
-            initializeGraphPage();
-            break;
-        case 'attendance.html':
-            initializeAttendancePage();
-            break;
-        case 'classes.html':
-            initializeClassesPage();
-            break;
-        case 'calendar.html':
-            initializeCalendarPage();
-            break;
-        case 'profile.html':
-            initializeProfilePage();
-            break;
-        case 'about.html':
-            initializeAboutPage();
-            break;
-        case 'dashboard.html':
-            initializeDashboardPage();
-            break;
-        case 'login.html':
-            initializeLoginPage();
-            break;
-        case 'index.html':
-            initializeWelcomePage();
-            break;
-        default:
-            console.log('No specific initialization for page:', currentPage);
-    }
-}
-
-// Page-specific initializations
-function initializePredictionPage() {
-    console.log('Initializing prediction page...');
-    
-    // Initialize range inputs
-    const rangeInputs = document.querySelectorAll('input[type="range"]');
-    rangeInputs.forEach(input => {
-        const valueDisplay = document.getElementById(input.id + 'Value');
-        if (valueDisplay) {
-            valueDisplay.textContent = input.value;
-            input.addEventListener('input', function() {
-                valueDisplay.textContent = this.value;
-            });
-        }
-    });
-    
-    // Initialize prediction form
-    const predictionForm = document.getElementById('predictionForm');
-    if (predictionForm) {
-        predictionForm.addEventListener('submit', handlePredictionSubmit);
-    }
-}
-
-function handlePredictionSubmit(e) {
-    e.preventDefault();
-    
-    const submitBtn = document.getElementById('predictBtn');
-    const btnText = submitBtn.querySelector('.btn-text');
-    const btnLoading = submitBtn.querySelector('.btn-loading');
-    
-    // Show loading state
-    btnText.classList.add('hidden');
-    btnLoading.classList.remove('hidden');
-    submitBtn.disabled = true;
-    
-    // Simulate prediction processing
-    setTimeout(() => {
-        // Collect form data
-        const formData = {
-            attendance: document.getElementById('attendance').value,
-            testScores: document.getElementById('testScores').value,
-            studyHours: document.getElementById('studyHours').value,
-            activities: document.getElementById('activities').value,
-            support: document.querySelector('input[name="support"]:checked').value
-        };
-        
-        // Generate prediction
-        const prediction = generatePrediction(formData);
-        
-        // Display results
-        displayPredictionResults(prediction);
-        
-        // Reset button state
-        btnText.classList.remove('hidden');
-        btnLoading.classList.add('hidden');
-        submitBtn.disabled = false;
-        
-        showToast('Prediction completed successfully!', 'success');
-    }, 2000);
-}
-
-function generatePrediction(formData) {
-    // Simple prediction algorithm
-    const attendanceScore = (formData.attendance / 100) * 0.35;
-    const testScore = (formData.testScores / 100) * 0.28;
-    const studyScore = (formData.studyHours / 40) * 0.20;
-    const activityScore = formData.activities === 'Yes' ? 0.05 : 0.02;
-    const supportScore = formData.support === 'High' ? 0.12 : (formData.support === 'Medium' ? 0.08 : 0.04);
-    
-    const totalScore = attendanceScore + testScore + studyScore + activityScore + supportScore;
-    
-    let performance = 'Poor';
-    let confidence = Math.round(totalScore * 100);
-    
-    if (totalScore >= 0.85) {
-        performance = 'Excellent';
-    } else if (totalScore >= 0.70) {
-        performance = 'Good';
-    } else if (totalScore >= 0.50) {
-        performance = 'Average';
-    }
-    
-    return {
-        performance,
-        confidence,
-        score: totalScore,
-        recommendations: generateRecommendations(formData, totalScore)
-    };
-}
-
-function generateRecommendations(formData, score) {
-    const recommendations = [];
-    
-    if (formData.attendance < 85) {
-        recommendations.push('Improve attendance rate to enhance performance');
-    }
-    
-    if (formData.testScores < 75) {
-        recommendations.push('Focus on improving test scores through better study habits');
-    }
-    
-    if (formData.studyHours < 20) {
-        recommendations.push('Increase study hours to achieve better results');
-    }
-    
-    if (formData.activities === 'No') {
-        recommendations.push('Consider participating in extracurricular activities');
-    }
-    
-    if (formData.support === 'Low') {
-        recommendations.push('Seek additional parental support for academic success');
-    }
-    
-    if (score >= 0.85) {
-        recommendations.push('Maintain current excellent performance level');
-    }
-    
-    return recommendations;
-}
-
-function displayPredictionResults(prediction) {
-    const resultsContainer = document.getElementById('predictionResults');
-    const performanceResult = document.getElementById('performanceResult');
-    const confidenceValue = document.getElementById('confidenceValue');
-    const confidenceFill = document.getElementById('confidenceFill');
-    const recommendationsList = document.getElementById('recommendationsList');
-    
-    if (resultsContainer) {
-        resultsContainer.classList.remove('hidden');
-        performanceResult.textContent = prediction.performance;
-        confidenceValue.textContent = prediction.confidence + '%';
-        confidenceFill.style.width = prediction.confidence + '%';
-        
-        // Update recommendations
-        recommendationsList.innerHTML = '';
-        prediction.recommendations.forEach(rec => {
-            const li = document.createElement('li');
-            li.textContent = rec;
-            recommendationsList.appendChild(li);
-        });
-        
-        // Scroll to results
-        resultsContainer.scrollIntoView({ behavior: 'smooth' });
-    }
-}
-
-function initializeAnalyticsPage() {
-    console.log('Initializing analytics page...');
-    // Add analytics-specific functionality here
-}
-
-function initializeGraphPage() {
-    console.log('Initializing graph page...');
-    // Add graph-specific functionality here
-}
-
-function initializeAttendancePage() {
-    console.log('Initializing attendance page...');
-    // Add attendance-specific functionality here
-}
-
-function initializeClassesPage() {
-    console.log('Initializing classes page...');
-    // Add classes-specific functionality here
-}
-
-function initializeCalendarPage() {
-    console.log('Initializing calendar page...');
-    // Add calendar-specific functionality here
-}
-
-function initializeProfilePage() {
-    console.log('Initializing profile page...');
-    // Add profile-specific functionality here
-}
-
-function initializeAboutPage() {
-    console.log('Initializing about page...');
-    // Add about-specific functionality here
-}
-
-function initializeDashboardPage() {
-    console.log('Initializing dashboard page...');
-    // Add dashboard-specific functionality here
-}
-
-function initializeLoginPage() {
-    console.log('Initializing login page...');
-    // Add login-specific functionality here
-}
-
-function initializeWelcomePage() {
-    console.log('Initializing welcome page...');
-    // Add welcome page-specific functionality here
-}
-
-// Export for global access
-window.GlobalApp = {
-    showToast,
-    toggleTheme,
-    currentUser,
-    currentTheme
-};
-
-console.log('Academia AI Global Logic loaded successfully');
-'''
-    
-    # Write the enhanced global.js
-    with open('frontend/js/global.js', 'w', encoding='utf-8') as f:
-        f.write(theme_js)
-    
-    print("  ✅ Enhanced theme functionality in global.js")
-
-def fix_prediction_page():
-    """Fix the prediction page to restore its functionality."""
-    
-    print("\n🎯 Fixing prediction page...")
-    
-    # Read current prediction page
-    with open('frontend/prediction.html', 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Remove duplicate script tags
-    content = re.sub(r'<script src="js/global\.js"></script>\s*<script src="js/global\.js"></script>', '<script src="js/global.js"></script>', content)
-    
-    # Remove the extra mainApp div
-    content = re.sub(r'<div id="mainApp" class="main-app"></div>', '', content)
-    
-    # Write the fixed prediction page
-    with open('frontend/prediction.html', 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print("  ✅ Fixed prediction page structure")
-
-def fix_analytics_page():
-    """Fix the analytics page to restore its functionality."""
-    
-    print("\n📊 Fixing analytics page...")
-    
-    # Read current analytics page
-    with open('frontend/analytics.html', 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Add analytics content if missing
-    if 'analytics-content' not in content:
-        analytics_content = '''
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+CACHE_FILE = '.fix_pages_cache.json'
+
+# Bump when transformation behaviour changes so cached results are discarded
+ENGINE_VERSION = 2
+
+ANALYTICS_CONTENT = '''
           <div class="analytics-content">
             <div class="dashboard-grid">
               <div class="dashboard-card">
@@ -760,28 +65,8 @@ def fix_analytics_page():
               </div>
             </div>
           </div>'''
-        
-        # Insert analytics content before closing main tag
-        content = re.sub(r'(.*?)</main>', r'\1' + analytics_content + '\n        </main>', content, flags=re.DOTALL)
-    
-    # Write the fixed analytics page
-    with open('frontend/analytics.html', 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print("  ✅ Fixed analytics page content")
-
-def fix_graph_page():
-    """Fix the graph page to restore its functionality."""
-    
-    print("\n📈 Fixing graph page...")
-    
-    # Read current graph page
-    with open('frontend/graph.html', 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Add graph content if missing
-    if 'graph-content' not in content:
-        graph_content = '''
+
+GRAPH_CONTENT = '''
           <div class="graph-content">
             <div class="dashboard-grid">
               <div class="dashboard-card">
@@ -806,28 +91,8 @@ def fix_graph_page():
               </div>
             </div>
           </div>'''
-        
-        # Insert graph content before closing main tag
-        content = re.sub(r'(.*?)</main>', r'\1' + graph_content + '\n        </main>', content, flags=re.DOTALL)
-    
-    # Write the fixed graph page
-    with open('frontend/graph.html', 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print("  ✅ Fixed graph page content")
-
-def fix_about_page():
-    """Fix the about page to restore its functionality."""
-    
-    print("\nℹ️ Fixing about page...")
-    
-    # Read current about page
-    with open('frontend/about.html', 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Add about content if missing
-    if 'about-content' not in content:
-        about_content = '''
+
+ABOUT_CONTENT = '''
           <div class="about-content">
             <div class="dashboard-grid">
               <div class="dashboard-card">
@@ -872,28 +137,8 @@ def fix_about_page():
               </div>
             </div>
           </div>'''
-        
-        # Insert about content before closing main tag
-        content = re.sub(r'(.*?)</main>', r'\1' + about_content + '\n        </main>', content, flags=re.DOTALL)
-    
-    # Write the fixed about page
-    with open('frontend/about.html', 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print("  ✅ Fixed about page content")
-
-def fix_history_page():
-    """Fix the history page to restore its functionality."""
-    
-    print("\n📚 Fixing history page...")
-    
-    # Read current history page
-    with open('frontend/history.html', 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Add history content if missing
-    if 'history-content' not in content:
-        history_content = '''
+
+HISTORY_CONTENT = '''
           <div class="history-content">
             <div class="dashboard-grid">
               <div class="dashboard-card">
@@ -935,40 +180,264 @@ def fix_history_page():
               </div>
             </div>
           </div>'''
-        
-        # Insert history content before closing main tag
-        content = re.sub(r'(.*?)</main>', r'\1' + history_content + '\n        </main>', content, flags=re.DOTALL)
-    
-    # Write the fixed history page
-    with open('frontend/history.html', 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print("  ✅ Fixed history page content")
+
+
+# HTML scanning
+
+@dataclass(frozen=True)
+class Tag:
+    kind: str  # 'start', 'startend' or 'end'
+    name: str
+    attrs: tuple
+    start: int
+    end: int
+
+
+class TagScanner(HTMLParser):
+    """Record the source span of every tag in a document.
+
+    Script and style bodies are treated as raw text by the parser, so tags
+    that only appear inside inline JavaScript are never matched.
+    """
+
+    def __init__(self, source):
+        super().__init__(convert_charrefs=False)
+        self.source = source
+        self.tags = []
+        self._line_offsets = [0]
+        for line in source.splitlines(keepends=True):
+            self._line_offsets.append(self._line_offsets[-1] + len(line))
+        self.feed(source)
+        self.close()
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        self.tags.append(Tag('start', tag, tuple(attrs), start, start + len(self.get_starttag_text())))
+
+    def handle_startendtag(self, tag, attrs):
+        start = self._offset()
+        self.tags.append(Tag('startend', tag, tuple(attrs), start, start + len(self.get_starttag_text())))
+
+    def handle_endtag(self, tag):
+        start = self._offset()
+        self.tags.append(Tag('end', tag, (), start, self.source.index('>', start) + 1))
+
+
+def apply_edits(source, edits):
+    """Apply non-overlapping (start, end, replacement) edits to ``source``."""
+    for start, end, replacement in sorted(edits, reverse=True):
+        source = source[:start] + replacement + source[end:]
+    return source
+
+
+# Transformations
+
+@dataclass(frozen=True)
+class InsertBeforeEndTag:
+    """Insert content before the first closing ``tag`` unless ``marker`` is already present."""
+    tag: str
+    content: str
+    marker: str
+    indent: str = '\n        '
+
+    def apply(self, source):
+        if self.marker in source:
+            return source
+        for tag in TagScanner(source).tags:
+            if tag.kind == 'end' and tag.name == self.tag:
+                return apply_edits(source, [(tag.start, tag.start, self.content + self.indent)])
+        return source
+
+
+@dataclass(frozen=True)
+class RemoveEmptyElement:
+    """Remove every empty ``<tag ...></tag>`` whose attributes equal ``attrs``."""
+    tag: str
+    attrs: tuple
+
+    def apply(self, source):
+        tags = TagScanner(source).tags
+        edits = []
+        for opening, closing in zip(tags, tags[1:]):
+            if (opening.kind == 'start' and opening.name == self.tag and opening.attrs == self.attrs
+                    and closing.kind == 'end' and closing.name == self.tag
+                    and not source[opening.end:closing.start].strip()):
+                edits.append((opening.start, closing.end, ''))
+        return apply_edits(source, edits)
+
+
+@dataclass(frozen=True)
+class DedupeScripts:
+    """Remove external scripts that a page already loaded earlier."""
+
+    def apply(self, source):
+        tags = TagScanner(source).tags
+        seen, edits = set(), []
+        for opening, closing in zip(tags, tags[1:]):
+            if opening.kind != 'start' or opening.name != 'script' or closing.name != 'script':
+                continue
+            src = dict(opening.attrs).get('src')
+            if not src:
+                continue
+            if src in seen:
+                # Take the whitespace before the duplicate with it
+                start = len(source[:opening.start].rstrip())
+                edits.append((start, closing.end, ''))
+            seen.add(src)
+        return apply_edits(source, edits)
+
+
+@dataclass(frozen=True)
+class Job:
+    path: str
+    transforms: tuple
+    title: str
+    done: str
+
+    def signature(self):
+        """Hash of everything that determines this job's output for a given input."""
+        return hashlib.sha256(f'{ENGINE_VERSION}:{self.transforms!r}'.encode('utf-8')).hexdigest()
+
+
+JOBS = (
+    Job('frontend/prediction.html',
+        (DedupeScripts(), RemoveEmptyElement('div', (('id', 'mainApp'), ('class', 'main-app')))),
+        '🎯 Fixing prediction page...', 'Fixed prediction page structure'),
+    Job('frontend/analytics.html', (InsertBeforeEndTag('main', ANALYTICS_CONTENT, 'analytics-content'),),
+        '📊 Fixing analytics page...', 'Fixed analytics page content'),
+    Job('frontend/graph.html', (InsertBeforeEndTag('main', GRAPH_CONTENT, 'graph-content'),),
+        '📈 Fixing graph page...', 'Fixed graph page content'),
+    Job('frontend/about.html', (InsertBeforeEndTag('main', ABOUT_CONTENT, 'about-content'),),
+        'ℹ️ Fixing about page...', 'Fixed about page content'),
+    Job('frontend/history.html', (InsertBeforeEndTag('main', HISTORY_CONTENT, 'history-content'),),
+        '📚 Fixing history page...', 'Fixed history page content'),
+)
+
+
+# Engine
+
+def file_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def load_cache(root):
+    try:
+        with open(Path(root) / CACHE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(root, cache):
+    path = Path(root) / CACHE_FILE
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_job(root, job, dry_run):
+    """Transform one file. Returns (status, output hash, diff)."""
+    path = Path(root) / job.path
+    try:
+        original = path.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return 'missing', None, ''
+
+    content = original
+    for transform in job.transforms:
+        content = transform.apply(content)
+
+    if content == original:
+        return 'unchanged', file_hash(content), ''
+
+    diff = ''
+    if dry_run:
+        diff = ''.join(difflib.unified_diff(
+            original.splitlines(keepends=True), content.splitlines(keepends=True),
+            fromfile=f'a/{job.path}', tofile=f'b/{job.path}'
+        ))
+    else:
+        path.write_text(content, encoding='utf-8')
+    return 'updated', file_hash(content), diff
+
+
+def is_cached(root, job, cache):
+    """Return True when the file still holds the output of the last run with the same transforms."""
+    entry = cache.get(job.path)
+    if not entry or entry.get('signature') != job.signature():
+        return False
+    try:
+        return file_hash((Path(root) / job.path).read_text(encoding='utf-8')) == entry.get('output')
+    except FileNotFoundError:
+        return False
+
+
+def run(root=ROOT_DIR, dry_run=False, force=False, workers=None):
+    """Run every job that is not cached; returns {path: status}."""
+    cache = {} if force else load_cache(root)
+    statuses = {}
+    pending = []
+    for job in JOBS:
+        if is_cached(root, job, cache):
+            statuses[job.path] = 'cached'
+        else:
+            pending.append(job)
+
+    if len(pending) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_job, [root] * len(pending), pending, [dry_run] * len(pending)))
+    else:
+        results = [run_job(root, job, dry_run) for job in pending]
+
+    for job, (status, output, diff) in zip(pending, results):
+        statuses[job.path] = status
+        if status == 'missing':
+            print(f"\n{job.title}\n  ⚠️ {job.path} not found, skipping")
+        elif dry_run:
+            print(diff, end='')
+        else:
+            print(f"\n{job.title}\n  ✅ {job.done}" + ('' if status == 'updated' else ' (already up to date)'))
+        if output and not dry_run:
+            cache[job.path] = {'signature': job.signature(), 'output': output}
+
+    if not dry_run:
+        save_cache(root, cache)
+    return statuses
+
 
 def main():
     """Main fix function."""
-    
-    print("🔧 Starting page and theme fixes...\n")
-    
-    # Step 1: Fix theme functionality
-    fix_theme_functionality()
-    
-    # Step 2: Fix individual pages
-    fix_prediction_page()
-    fix_analytics_page()
-    fix_graph_page()
-    fix_about_page()
-    fix_history_page()
-    
-    print("\n✅ All fixes completed!")
-    print("\n📋 Summary of fixes:")
-    print("  ✅ Enhanced dark/light theme functionality")
-    print("  ✅ Fixed prediction page with working form")
-    print("  ✅ Restored analytics page content")
-    print("  ✅ Restored graph page content")
-    print("  ✅ Restored about page content")
-    print("  ✅ Restored history page content")
-    print("\n🎉 All pages are now functional with proper theme support!")
+    parser = argparse.ArgumentParser(description='Apply the Academia AI page and theme fixes')
+    parser.add_argument('--dry-run', action='store_true', help='Print a diff of the changes without writing')
+    parser.add_argument('--force', action='store_true', help='Ignore the cache and re-check every file')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--root', default=str(ROOT_DIR), help='Project root containing frontend/')
+    args = parser.parse_args()
+
+    print("🔧 Starting page and theme fixes..." + (' (dry run)' if args.dry_run else '') + "\n")
+
+    statuses = run(args.root, dry_run=args.dry_run, force=args.force, workers=args.jobs)
+
+    counts = {}
+    for status in statuses.values():
+        counts[status] = counts.get(status, 0) + 1
+    print("\n✅ All fixes completed!" if not args.dry_run else "\n✅ Dry run completed!")
+    print("\n📋 Summary:")
+    labels = {
+        'updated': 'would change' if args.dry_run else 'updated',
+        'unchanged': 'already up to date',
+        'cached': 'skipped (unchanged since last run)',
+        'missing': 'missing'
+    }
+    for status, label in labels.items():
+        if counts.get(status):
+            print(f"  {counts[status]} file(s) {label}")
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -317,7 +317,13 @@ function initializeDropdownItems() {
 function handleSignOut() {
     showToast('Signing out...', 'info');
 
+    // End the session on the server too; signing out locally must not wait for it
+    if (getAuthToken()) {
+        apiFetch('/api/auth/logout', { method: 'POST' }).catch(() => {});
+    }
+
     // Clear user data
+    clearAuthTokens();
     localStorage.removeItem('currentUser');
     localStorage.removeItem('isLoggedIn');
     sessionStorage.removeItem('isLoggedIn');
@@ -431,6 +437,131 @@ function createToastContainer() {
     return container;
 }
 
+// Backend API access with the tokens stored at login
+function authStorage() {
+    return localStorage.getItem('refreshToken') ? localStorage : sessionStorage;
+}
+
+function getAuthToken() {
+    return authStorage().getItem('authToken');
+}
+
+function clearAuthTokens() {
+    ['authToken', 'refreshToken'].forEach(key => {
+        localStorage.removeItem(key);
+        sessionStorage.removeItem(key);
+    });
+}
+
+// Access tokens last minutes; a 401 swaps the refresh token for new ones. The lock keeps tabs
+// sharing localStorage from spending the same refresh token twice, which would end the session.
+async function refreshAuthToken(expiredToken) {
+    const refresh = async () => {
+        const storage = authStorage();
+        if (storage.getItem('authToken') !== expiredToken) {
+            return storage.getItem('authToken');
+        }
+        const refreshToken = storage.getItem('refreshToken');
+        if (!refreshToken) return null;
+
+        const response = await fetch('/api/auth/refresh', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        });
+        if (!response.ok) {
+            if (response.status === 401) clearAuthTokens();
+            return null;
+        }
+        const tokens = await response.json();
+        storage.setItem('authToken', tokens.token);
+        storage.setItem('refreshToken', tokens.refresh_token);
+        return tokens.token;
+    };
+    return navigator.locks ? navigator.locks.request('academia-auth-refresh', refresh) : refresh();
+}
+
+// fetch() for /api routes: sends the access token and retries once with a refreshed one on 401
+async function apiFetch(url, options = {}) {
+    const send = token => fetch(url, {
+        ...options,
+        headers: {
+            ...(options.body ? { 'Content-Type': 'application/json' } : {}),
+            ...options.headers,
+            ...(token ? { 'Authorization': `Bearer ${token}` } : {})
+        }
+    });
+
+    const token = getAuthToken();
+    const response = await send(token);
+    if (response.status !== 401 || !token) return response;
+    const renewed = await refreshAuthToken(token);
+    return renewed ? send(renewed) : response;
+}
+
+// Live updates pushed by the backend over server-sent events
+function subscribeToLiveUpdates(handlers, courseIds = []) {
+    if (!getAuthToken() || typeof EventSource === 'undefined') return null;
+
+    let source = null;
+    let lastEventId = null;
+    let retryTimer = null;
+    let closed = false;
+
+    // EventSource cannot send headers, so each connection opens with a short-lived stream ticket.
+    // Its own reconnects would reuse an expired ticket, so reconnect by hand with a fresh one.
+    const connect = async () => {
+        let ticket;
+        try {
+            const response = await apiFetch('/api/events/ticket', { method: 'POST' });
+            if (response.status === 401) return;
+            if (response.ok) ticket = (await response.json()).ticket;
+        } catch (error) {
+            ticket = null;
+        }
+        if (closed) return;
+        if (!ticket) {
+            retryTimer = setTimeout(connect, 5000);
+            return;
+        }
+
+        const params = new URLSearchParams({ ticket });
+        if (courseIds.length) params.set('courses', courseIds.join(','));
+        if (lastEventId) params.set('last_event_id', lastEventId);
+
+        source = new EventSource(`/api/events/stream?${params}`);
+        Object.keys(handlers).forEach(eventName => {
+            source.addEventListener(eventName, event => {
+                if (event.lastEventId) lastEventId = event.lastEventId;
+                handlers[eventName](JSON.parse(event.data));
+            });
+        });
+        source.onerror = () => {
+            source.close();
+            if (!closed) retryTimer = setTimeout(connect, 3000);
+        };
+    };
+
+    const subscription = {
+        close() {
+            closed = true;
+            clearTimeout(retryTimer);
+            if (source) source.close();
+        }
+    };
+    window.addEventListener('beforeunload', () => subscription.close());
+    connect();
+    return subscription;
+}
+
+function applyStatDeltas(deltas) {
+    Object.keys(deltas).forEach(stat => {
+        document.querySelectorAll(`[data-stat="${stat}"]`).forEach(element => {
+            element.textContent = (parseInt(element.textContent, 10) || 0) + deltas[stat];
+        });
+    });
+}
+
 // Page-specific functionality
 function initializePageSpecificFeatures() {
     const currentPage = window.location.pathname.split('/').pop() || 'dashboard.html';
@@ -1341,6 +1472,20 @@ function initializeAttendancePage() {
 
     // Initialize filter functionality
     initializeAttendanceFilters();
+
+    // Show marks made by other teachers as they happen
+    subscribeToLiveUpdates({
+        attendance: mark => {
+            updateAttendanceBadge(mark.student_id, mark.status);
+            showToast(`${mark.marked_by} marked ${mark.name} as ${mark.status}`, 'info');
+        },
+        resync: () => populateAttendanceTable()
+    });
+
+    populateClassFilter();
+
+    // Send marks queued while offline and pick up marks made elsewhere
+    syncAttendanceQueue();
 }
 
 function populateAttendanceTable() {
@@ -1442,20 +1587,160 @@ function populateAttendanceTable() {
 }
 
 function markAttendance(studentId, status) {
-    // Update the status badge
-    const row = document.querySelector(`tr:has(td:contains('${studentId}'))`);
-    if (row) {
-        const statusCell = row.querySelector('.status-badge');
-        if (statusCell) {
-            statusCell.className = `status-badge ${status}`;
-            statusCell.textContent = status.charAt(0).toUpperCase() + status.slice(1);
-        }
+    const classFilter = document.getElementById('class-filter');
+    if (!classFilter || !classFilter.value) {
+        showToast('Choose a class before marking attendance', 'error');
+        return;
     }
 
+    updateAttendanceBadge(studentId, status);
+    queueAttendanceMark(studentId, parseInt(classFilter.value, 10), status);
+
     // Show success message
     showToast(`Attendance marked as ${status} for student ${studentId}`, 'success');
 }
 
+// Offline attendance capture: marks are queued in localStorage and sent to the backend in batches
+const ATTENDANCE_QUEUE_KEY = 'attendanceQueue';
+const ATTENDANCE_SYNC_TOKEN_KEY = 'attendanceSyncToken';
+const ATTENDANCE_CLIENT_KEY = 'attendanceClientId';
+const ATTENDANCE_COURSES_KEY = 'attendanceCourses';
+const ATTENDANCE_SYNC_BATCH = 200;
+const ATTENDANCE_SYNC_INTERVAL_MS = 30000;
+const ATTENDANCE_SIGNED_OUT = 'Your session has ended. Sign in again to send the attendance marks saved on this device';
+let attendanceSyncRunning = false;
+let attendanceSyncError = null;
+
+// The class list comes from the backend and is kept so marks can still be taken offline
+async function populateClassFilter() {
+    const classFilter = document.getElementById('class-filter');
+    if (!classFilter) return;
+
+    let courses;
+    try {
+        const response = await apiFetch('/api/courses');
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        courses = await response.json();
+        localStorage.setItem(ATTENDANCE_COURSES_KEY, JSON.stringify(courses));
+    } catch (error) {
+        courses = JSON.parse(localStorage.getItem(ATTENDANCE_COURSES_KEY) || '[]');
+    }
+
+    classFilter.innerHTML = courses.length
+        ? courses.map(course => {
+            const option = document.createElement('option');
+            option.value = course.id;
+            option.textContent = [`${course.abbreviation} - ${course.title}`, course.time_slot]
+                .filter(Boolean).join(' - ');
+            return option.outerHTML;
+        }).join('')
+        : '<option value="">No classes available</option>';
+}
+
+// Sync failures are shown once until the next successful sync, not on every retry
+function reportAttendanceSyncError(message) {
+    if (message !== attendanceSyncError) {
+        showToast(message, 'error');
+    }
+    attendanceSyncError = message;
+}
+
+function attendanceQueue() {
+    return JSON.parse(localStorage.getItem(ATTENDANCE_QUEUE_KEY) || '[]');
+}
+
+function attendanceClientId() {
+    let clientId = localStorage.getItem(ATTENDANCE_CLIENT_KEY);
+    if (!clientId) {
+        clientId = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+        localStorage.setItem(ATTENDANCE_CLIENT_KEY, clientId);
+    }
+    return clientId;
+}
+
+function queueAttendanceMark(studentId, courseId, status) {
+    const now = new Date();
+    const queue = attendanceQueue();
+    queue.push({
+        op_id: `${now.getTime().toString(36)}-${Math.random().toString(36).slice(2, 8)}`,
+        student_id: studentId,
+        course_id: courseId,
+        // The class's local date, not UTC
+        date: `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}-${String(now.getDate()).padStart(2, '0')}`,
+        status: status,
+        client_ts: now.getTime() / 1000
+    });
+    localStorage.setItem(ATTENDANCE_QUEUE_KEY, JSON.stringify(queue));
+    syncAttendanceQueue();
+}
+
+async function syncAttendanceQueue() {
+    if (attendanceSyncRunning || !navigator.onLine) return;
+    if (!getAuthToken()) {
+        if (attendanceQueue().length) {
+            reportAttendanceSyncError(ATTENDANCE_SIGNED_OUT);
+        }
+        return;
+    }
+
+    attendanceSyncRunning = true;
+    try {
+        let more = true;
+        while (more) {
+            const batch = attendanceQueue().slice(0, ATTENDANCE_SYNC_BATCH);
+            const response = await apiFetch('/api/attendance/sync', {
+                method: 'POST',
+                body: JSON.stringify({
+                    client_id: attendanceClientId(),
+                    since: parseInt(localStorage.getItem(ATTENDANCE_SYNC_TOKEN_KEY), 10) || 0,
+                    marks: batch
+                })
+            });
+            if (!response.ok) {
+                // The queue is kept; a 401 here means the refresh token was refused as well
+                const data = await response.json().catch(() => ({}));
+                reportAttendanceSyncError(response.status === 401
+                    ? ATTENDANCE_SIGNED_OUT
+                    : `Attendance marks could not be synced: ${data.message || `HTTP ${response.status}`}`);
+                break;
+            }
+            attendanceSyncError = null;
+            const result = await response.json();
+
+            // Every op the server answered is done with, whatever the outcome; marks queued meanwhile stay
+            const answered = new Set(result.results.map(op => op.op_id));
+            localStorage.setItem(ATTENDANCE_QUEUE_KEY, JSON.stringify(attendanceQueue().filter(op => !answered.has(op.op_id))));
+            localStorage.setItem(ATTENDANCE_SYNC_TOKEN_KEY, result.token);
+
+            result.changes.forEach(change => updateAttendanceBadge(change.student_id, change.status));
+            result.results.filter(op => op.outcome === 'rejected')
+                .forEach(op => showToast(`A queued mark was not saved: ${op.reason}`, 'error'));
+            more = result.more || (batch.length > 0 && attendanceQueue().length > 0);
+        }
+    } catch (error) {
+        // Still offline; the queue is kept for the next attempt
+    } finally {
+        attendanceSyncRunning = false;
+    }
+}
+
+window.addEventListener('online', syncAttendanceQueue);
+setInterval(() => {
+    if (attendanceQueue().length) syncAttendanceQueue();
+}, ATTENDANCE_SYNC_INTERVAL_MS);
+
+function updateAttendanceBadge(studentId, status) {
+    const idCell = Array.from(document.querySelectorAll('#attendanceTableBody .student-id'))
+        .find(cell => cell.textContent.trim() === studentId);
+    const statusCell = idCell && idCell.closest('tr').querySelector('.status-badge');
+    if (statusCell) {
+        statusCell.className = `status-badge ${status}`;
+        statusCell.textContent = status.charAt(0).toUpperCase() + status.slice(1);
+    }
+}
+
 function initializeAttendanceSearch() {
     const searchInput = document.querySelector('.search-input');
     if (!searchInput) return;
@@ -1485,7 +1770,7 @@ function initializeAttendanceFilters() {
     if (classFilter) {
         classFilter.addEventListener('change', function () {
             // Handle class filter change
-            showToast(`Filtered by class: ${this.value}`, 'info');
+            showToast(`Filtered by class: ${this.selectedOptions[0].textContent}`, 'info');
         });
     }
 
@@ -1990,6 +2275,11 @@ function initializeAboutPage() {
 
 function initializeDashboardPage() {
     console.log('Initializing dashboard page...');
+
+    subscribeToLiveUpdates({
+        stats: applyStatDeltas,
+        resync: () => window.location.reload()
+    });
 }
 
 function initializeLoginPage() {